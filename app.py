@@ -1,5 +1,6 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory, redirect, url_for
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, redirect, url_for, stream_with_context, g, abort
 import os
+import hmac
 from pathlib import Path
 from dotenv import load_dotenv
 from twilio.twiml.voice_response import VoiceResponse, Gather
@@ -13,38 +14,171 @@ load_dotenv()
 import config
 
 # Import chatbot components
-from chatbot import KnowledgeBase, ChatService, VoiceService
+from chatbot import (ConversationMemory, VoiceService, QuickAccessService, VoiceJobQueue, S3JobResults, VoicePrompts,
+                     CircuitBreaker, ElevenLabsClient, PriorityScheduler, TokenBucket, TenantRegistry,
+                     TenantPrefixMiddleware, BatchRunner, read_batch, get_http_session, get_s3_client,
+                     create_chat_service, create_context_builder, create_knowledge_base, tenant_store_dir)
+from chatbot.metrics import REGISTRY, REQUEST_SECONDS, start_trace
 
-# Initialize Flask app
+# Initialize Flask app; /t/<tenant>/... serves the same routes for another college
 app = Flask(__name__)
+app.wsgi_app = TenantPrefixMiddleware(app.wsgi_app)
+
+# Extraction workers are spawned processes, which import the main module as __mp_main__ when the app runs
+# as "python app.py"; background work is only started in the serving process
+SERVING = __name__ != '__mp_main__'
 
 # Initialize knowledge base
-knowledge_base = KnowledgeBase(
-    data_dir=config.DATA_DIR,
-    vector_store_dir=config.VECTOR_STORE_DIR,
-    openai_api_key=config.OPENAI_API_KEY
-)
+knowledge_base = create_knowledge_base(config, config.DATA_DIR, config.VECTOR_STORE_DIR)
 
-# Load or create vector store
+# Serve the published vector store; building and updating it happens in the background
 try:
-    vector_store = knowledge_base.create_or_load_vector_store()
+    knowledge_base.load_current()
 except Exception as e:
-    print(f"Error initializing vector store: {str(e)}")
-    print("Will attempt to create vector store on first query")
-    vector_store = None
+    print(f"Error loading vector store: {str(e)}")
+if SERVING:
+    knowledge_base.start_watcher(config.INDEX_WATCH_INTERVAL, auto_rebuild=config.INDEX_AUTO_REBUILD)
+
+# Upstream calls are admitted by channel priority within the API quotas
+llm_scheduler = PriorityScheduler(
+    "llm",
+    max_concurrent=config.LLM_MAX_CONCURRENT,
+    max_queue=config.SCHEDULER_MAX_QUEUE,
+    max_wait=config.SCHEDULER_MAX_WAIT,
+    bucket=TokenBucket(config.OPENAI_TOKENS_PER_MINUTE) if config.OPENAI_TOKENS_PER_MINUTE else None
+)
+tts_scheduler = PriorityScheduler(
+    "tts",
+    max_concurrent=config.TTS_MAX_CONCURRENT,
+    max_queue=config.SCHEDULER_MAX_QUEUE,
+    max_wait=config.SCHEDULER_MAX_WAIT,
+    bucket=TokenBucket(config.ELEVENLABS_CHARACTERS_PER_MINUTE) if config.ELEVENLABS_CHARACTERS_PER_MINUTE else None
+)
+
+# Shared by every tenant's chat service
+context_builder = create_context_builder(config)
+conversation_memory = ConversationMemory(
+    max_conversations=config.CONVERSATION_MAX,
+    ttl_seconds=config.CONVERSATION_TTL,
+    max_turns=config.CONVERSATION_TURNS
+)
+
+def _create_chat_service(knowledge_base, institution):
+    """Create a chat service over a knowledge base, sharing the app's scheduler, context builder and memory."""
+    return create_chat_service(config, knowledge_base, institution, llm_scheduler,
+                               context_builder=context_builder, memory=conversation_memory)
 
 # Initialize chat service
-chat_service = ChatService(
-    knowledge_base=knowledge_base,
-    openai_api_key=config.OPENAI_API_KEY
+chat_service = _create_chat_service(knowledge_base, config.TENANTS[config.DEFAULT_TENANT]["name"])
+
+def _create_tenant(tenant_id, tenant):
+    """Create another college's knowledge base and chat service; its index loads on the first query."""
+    tenant_knowledge_base = create_knowledge_base(config, Path(tenant["data_dir"]), tenant_store_dir(config, tenant_id))
+    tenant_knowledge_base.start_watcher(config.INDEX_WATCH_INTERVAL, auto_rebuild=config.INDEX_AUTO_REBUILD)
+    return _create_chat_service(tenant_knowledge_base, tenant.get("name", tenant_id))
+
+tenants = TenantRegistry(config.TENANTS, _create_tenant, config.DEFAULT_TENANT, config.TENANT_MEMORY_BUDGET)
+tenants.add(config.DEFAULT_TENANT, chat_service)
+
+# Shared outbound clients: one keep-alive pool for ElevenLabs and one long-lived S3 client
+elevenlabs_client = ElevenLabsClient(
+    api_key=config.ELEVENLABS_API_KEY,
+    base_url=config.ELEVENLABS_API_URL,
+    session=get_http_session(config.HTTP_POOL_SIZE, config.HTTP_RETRIES, config.HTTP_BACKOFF),
+    connect_timeout=config.ELEVENLABS_CONNECT_TIMEOUT,
+    read_timeout=config.ELEVENLABS_READ_TIMEOUT,
+    breaker=CircuitBreaker(config.ELEVENLABS_BREAKER_FAILURES, config.ELEVENLABS_BREAKER_RESET),
+    retries=config.HTTP_RETRIES,
+    backoff=config.HTTP_BACKOFF,
+    pool_size=config.HTTP_POOL_SIZE
 )
+s3_client = get_s3_client(
+    aws_access_key=config.AWS_ACCESS_KEY_ID,
+    aws_secret_key=config.AWS_SECRET_ACCESS_KEY,
+    endpoint_url=config.S3_ENDPOINT_URL,
+    region=config.AWS_REGION,
+    pool_size=config.HTTP_POOL_SIZE
+) if config.USE_S3 else None
 
 # Initialize voice service
 voice_service = VoiceService(
     api_key=config.ELEVENLABS_API_KEY,
     voice_id=config.ELEVENLABS_VOICE_ID,
-    cache_dir=config.AUDIO_CACHE_DIR
+    cache_dir=config.AUDIO_CACHE_DIR,
+    cache_max_bytes=config.AUDIO_CACHE_MAX_BYTES,
+    stream_dir=config.TTS_STREAM_DIR,
+    stream_workers=config.TTS_STREAM_WORKERS,
+    tts_client=elevenlabs_client,
+    s3_client=s3_client,
+    s3_bucket=config.S3_BUCKET_NAME if config.USE_S3 else None,
+    s3_public_url=config.S3_PUBLIC_URL,
+    scheduler=tts_scheduler
+)
+
+# Precompute quick access answers in the background and serve them from memory
+quick_access_service = QuickAccessService(
+    chat_service=chat_service,
+    queries=config.QUICK_ACCESS_QUERIES,
+    ttl_seconds=config.QUICK_ACCESS_TTL,
+    voice_service=voice_service if config.QUICK_ACCESS_PRECOMPUTE_AUDIO else None
 )
+if SERVING:
+    quick_access_service.start()
+
+# Voice calls answer in the background and play pre-synthesized prompts
+voice_prompts = VoicePrompts(voice_service, config.VOICE_PROMPTS)
+if SERVING:
+    voice_prompts.warm_in_background()
+voice_jobs = VoiceJobQueue(
+    chat_service=chat_service,
+    voice_service=voice_service,
+    results_dir=config.VOICE_JOBS_DIR,
+    max_workers=config.VOICE_JOB_WORKERS,
+    stream_audio=config.VOICE_STREAM_AUDIO,
+    results_store=S3JobResults(s3_client, config.S3_BUCKET_NAME) if config.USE_S3 else None
+)
+
+# Request tracing: every stage timed while handling a request is added to its trace
+@app.before_request
+def begin_trace():
+    g.trace = start_trace(request.headers.get('X-Trace-Id') or request.headers.get('X-Request-ID'))
+
+@app.after_request
+def end_trace(response):
+    trace = g.get('trace')
+    if trace is None:
+        return response
+    
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(trace.elapsed, route=route, method=request.method, status=response.status_code)
+    
+    if config.TRACE_HEADERS:
+        response.headers['X-Trace-Id'] = trace.trace_id
+        if trace.stages:
+            response.headers['Server-Timing'] = trace.server_timing()
+    
+    # Slow requests are logged with their stage breakdown
+    if trace.elapsed >= config.SLOW_REQUEST_SECONDS:
+        print(f"Slow request {request.method} {request.path}: {trace.summary()}")
+    return response
+
+def _tenant_id():
+    """Return the tenant of the request: its /t/<tenant> prefix, else the Twilio number called, else the default."""
+    return tenants.resolve(request.script_root, request.form.get('To'))
+
+def _chat_service():
+    """Return the chat service of the request's tenant."""
+    tenant_chat_service = tenants.chat_service(_tenant_id())
+    if tenant_chat_service is None:
+        abort(404)
+    return tenant_chat_service
+
+def _conversation_id(tenant_id, channel, key):
+    """Return the conversation memory key for a tenant's web session id or phone number, or None."""
+    # Session ids come from the browser, so only accept short printable ones
+    if not key or len(key) > 64 or not key.replace("-", "").replace("+", "").isalnum():
+        return None
+    return f"{tenant_id}:{channel}:{key}"
 
 # Routes
 @app.route('/')
@@ -68,28 +202,59 @@ def chat():
     if not user_message:
         return jsonify({"error": "No message provided"}), 400
     
-    # Get response from chat service
-    response_data = chat_service.get_response(user_message)
+    # Get response from the tenant's chat service
+    conversation_id = _conversation_id(_tenant_id(), "web", data.get('session_id'))
+    response_data = _chat_service().get_response(user_message, conversation_id=conversation_id)
     
     return jsonify(response_data)
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream a chat response as Server-Sent Events."""
+    data = request.json
+    user_message = data.get('message', '')
+    
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+    
+    tenant_chat_service = _chat_service()
+    conversation_id = _conversation_id(_tenant_id(), "web", data.get('session_id'))
+    
+    def generate():
+        try:
+            for event in tenant_chat_service.stream_response(user_message, conversation_id=conversation_id):
+                # Tokens go out as they arrive, the final event carries the full payload
+                event_name = "done" if event.get("done") else "token"
+                yield f"event: {event_name}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            print(f"Error streaming chat response: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Failed to generate response'})}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Stop nginx from buffering the stream
+        }
+    )
+
 @app.route('/api/quick-access/<category>', methods=['GET'])
 def quick_access(category):
     """Handle quick access requests."""
-    # Create a query based on the category
-    if category == "Admission Process":
-        query = "What is the admission process at Pune University?"
-    elif category == "Exam Schedule":
-        query = "Tell me about the exam schedule at Pune University."
-    elif category == "Fee Structure":
-        query = "What is the fee structure at Pune University?"
-    elif category == "Scholarship Info":
-        query = "What scholarships are available at Pune University?"
-    else:
-        return jsonify({"error": "Invalid category"}), 400
+    tenant_chat_service = _chat_service()
+    if tenant_chat_service is not chat_service:
+        # Only the default tenant's answers are precomputed; others go through the answer cache
+        query = config.QUICK_ACCESS_QUERIES.get(category)
+        if query is None:
+            return jsonify({"error": "Invalid category"}), 400
+        return jsonify(tenant_chat_service.get_response(query))
     
-    # Get response from chat service
-    response_data = chat_service.get_response(query)
+    # Answers are precomputed and refreshed in the background
+    response_data = quick_access_service.get(category)
+    
+    if response_data is None:
+        return jsonify({"error": "Invalid category"}), 400
     
     return jsonify(response_data)
 
@@ -132,13 +297,45 @@ def speak():
         return jsonify({"error": "No text provided"}), 400
     
     # Convert text to speech
-    audio_url = voice_service.text_to_speech_for_twilio(text)
+    audio_url = voice_service.text_to_speech_for_twilio(text, channel="web")
     
     if audio_url:
         return jsonify({"audio_url": audio_url})
     else:
         return jsonify({"error": "Failed to convert text to speech"}), 500
 
+@app.route('/api/speak/stream', methods=['POST'])
+def speak_stream():
+    """Register text for streaming speech and return the URL that plays it."""
+    data = request.json
+    text = data.get('text', '')
+    
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+    
+    stream_id = voice_service.register_stream(text)
+    return jsonify({"stream_url": url_for('speak_stream_audio', stream_id=stream_id)})
+
+@app.route('/api/speak/stream/<stream_id>', methods=['GET', 'POST'])
+def speak_stream_audio(stream_id):
+    """Stream MP3 audio sentence by sentence as it is synthesized."""
+    text = voice_service.stream_text(stream_id)
+    
+    if text is None:
+        return jsonify({"error": "Unknown stream"}), 404
+    
+    # Streams played to callers are marked so their synthesis goes ahead of web requests
+    channel = "voice" if request.args.get('channel') == "voice" else "web"
+    
+    return Response(
+        stream_with_context(voice_service.stream_speech(text, channel)),
+        mimetype='audio/mpeg',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.route('/api/sms', methods=['POST'])
 def sms():
     """Handle incoming SMS messages."""
@@ -148,24 +345,37 @@ def sms():
     # Create Twilio response
     resp = MessagingResponse()
     
-    # Get response from chat service
-    response_text = chat_service.get_response_for_sms(incoming_msg)
+    # Get response from the chat service of the number texted
+    conversation_id = _conversation_id(_tenant_id(), "sms", request.form.get('From'))
+    response_text = _chat_service().get_response_for_sms(incoming_msg, conversation_id)
     
     # Add message to response
     resp.message(response_text)
     
     return str(resp)
 
+def _ask_another_question(response):
+    """Gather a follow-up question, then say goodbye if the caller stays silent."""
+    gather = Gather(
+        input='speech',
+        action='/api/voice/process',
+        method='POST',
+        speechTimeout='auto',
+        language='en-IN'
+    )
+    voice_prompts.add_to(gather, "another_question")
+    response.append(gather)
+    
+    # If no response after gather
+    voice_prompts.add_to(response, "goodbye")
+
 @app.route('/api/voice/welcome', methods=['POST'])
 def voice_welcome():
     """Handle incoming voice calls."""
     response = VoiceResponse()
     
     # Add a welcome message
-    response.say(
-        "Welcome to Pune University Support Hub. Please ask your question after the beep.",
-        voice="female"
-    )
+    voice_prompts.add_to(response, "welcome")
     
     # Gather speech input
     gather = Gather(
@@ -178,7 +388,7 @@ def voice_welcome():
     response.append(gather)
     
     # If user doesn't say anything
-    response.say("We didn't receive any input. Goodbye!", voice="female")
+    voice_prompts.add_to(response, "no_input")
     
     return str(response)
 
@@ -192,39 +402,129 @@ def voice_process():
     response = VoiceResponse()
     
     if speech_result:
-        # Get response from chat service
-        chat_response = chat_service.get_response(speech_result)
-        response_text = chat_response["response"]
-        
-        # Generate voice response
-        audio_url = voice_service.text_to_speech_for_twilio(response_text)
-        
-        if audio_url:
-            # Play the generated audio
-            response.play(audio_url)
-        else:
-            # Fallback to TTS if audio generation fails
-            response.say(response_text, voice="female")
-        
-        # Ask if user wants to ask another question
-        gather = Gather(
-            input='speech',
-            action='/api/voice/process',
-            method='POST',
-            speechTimeout='auto',
-            language='en-IN'
-        )
-        gather.say("Do you have another question? If so, please ask after the beep.", voice="female")
-        response.append(gather)
-        
-        # If no response after gather
-        response.say("Thank you for using Pune University Support Hub. Goodbye!", voice="female")
+        # Answer in the background so the webhook returns well within Twilio's timeout
+        conversation_id = _conversation_id(_tenant_id(), "voice", request.form.get('From'))
+        job_id = voice_jobs.submit(speech_result, conversation_id, _chat_service())
+        _hold_for_answer(response, job_id)
     else:
         # If no speech was detected
-        response.say("I'm sorry, I couldn't understand what you said. Goodbye!", voice="female")
+        voice_prompts.add_to(response, "not_understood")
+    
+    return str(response)
+
+def _hold_for_answer(response, job_id):
+    """Play the hold prompt and redirect to the endpoint that polls the job."""
+    voice_prompts.add_to(response, "hold")
+    response.redirect(f"/api/voice/result?job={job_id}&attempt=0", method='POST')
+
+@app.route('/api/voice/result', methods=['POST'])
+def voice_result():
+    """Play the answer of a background voice job, or keep the caller on hold."""
+    job_id = request.args.get('job', '')
+    attempt = request.args.get('attempt', 0, type=int)
+    
+    response = VoiceResponse()
+    result = voice_jobs.result(job_id)
+    
+    if result is None:
+        if attempt < config.VOICE_MAX_POLLS:
+            # Still generating: wait a moment and check again
+            response.pause(length=1)
+            response.redirect(f"/api/voice/result?job={job_id}&attempt={attempt + 1}", method='POST')
+            return str(response)
+        result = {"error": "Timed out waiting for answer"}
+    
+    if result.get("error"):
+        voice_prompts.add_to(response, "failed")
+    elif result.get("audio_url"):
+        # Play the generated audio
+        response.play(result["audio_url"])
+    else:
+        # Fallback to TTS if audio generation fails
+        response.say(result["response"], voice="female")
+    
+    # Ask if user wants to ask another question
+    _ask_another_question(response)
     
     return str(response)
 
+@app.route('/api/cache-stats')
+def cache_stats():
+    """Return hit/miss counts for the answer and audio caches."""
+    return jsonify({
+        "answer_cache": chat_service.answer_cache.stats(),
+        "query_embedding_cache": knowledge_base.query_embedding_cache.stats(),
+        "audio_cache": voice_service.twilio_cache.stats(),
+        "conversations": chat_service.memory.stats(),
+        "schedulers": {"llm": llm_scheduler.stats(), "tts": tts_scheduler.stats()},
+        "tenants": tenants.stats()
+    })
+
+def _is_admin():
+    """Return True if the request carries the configured admin token."""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(config.ADMIN_TOKEN) and hmac.compare_digest(token, config.ADMIN_TOKEN)
+
+@app.route('/api/admin/index')
+def index_status():
+    """Return the vector store version this worker serves and the state of background builds."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(_chat_service().knowledge_base.index_status())
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_index():
+    """Rebuild the vector store from the data directory in the background."""
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    # The current index keeps serving; every worker switches once the new one is published
+    tenant_knowledge_base = _chat_service().knowledge_base
+    tenant_knowledge_base.request_reload()
+    return jsonify({"status": "reload scheduled", **tenant_knowledge_base.index_status()}), 202
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """Answer a JSONL body of queries, streaming one JSON result per line as each finishes.
+    
+    ?channel= shapes the answers (default web), ?cache=0 forces fresh ones
+    and ?concurrency= bounds the LLM calls. Answers are cached, so this
+    also warms this worker's answer cache.
+    """
+    if not _is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    try:
+        items = read_batch(request.get_data(as_text=True).splitlines(), config.BATCH_MAX_QUERIES)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    channel = request.args.get('channel', 'web')
+    if channel not in config.CHANNEL_PROFILES:
+        return jsonify({"error": "Unknown channel"}), 400
+    use_cache = request.args.get('cache', '1') != '0'
+    concurrency = request.args.get('concurrency', config.BATCH_CONCURRENCY, type=int)
+    runner = BatchRunner(
+        _chat_service(),
+        batch_size=config.BATCH_SIZE,
+        max_concurrency=max(1, min(concurrency, config.BATCH_MAX_CONCURRENCY))
+    )
+    
+    def generate():
+        for result in runner.run(items, channel=channel, use_cache=use_cache):
+            yield json.dumps(result) + "\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+@app.route('/metrics')
+def metrics():
+    """Expose stage latencies, cache hits, token counts and errors for Prometheus."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/static/audio_cache/<filename>')
 def serve_audio(filename):
     """Serve audio files from the cache directory."""
@@ -0,0 +1,180 @@
+"""ASGI entry point for the async serving mode.
+
+The routes that wait on upstream services (the LLM, embeddings and
+ElevenLabs/S3) are served by Quart handlers that await them, so one process
+can hold hundreds of conversations open. Every other route is delegated to the
+Flask app in app.py, which also remains the WSGI entry point (gunicorn app:app).
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import json
+
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, Response, request, jsonify, g, abort
+from twilio.twiml.voice_response import VoiceResponse
+from twilio.twiml.messaging_response import MessagingResponse
+
+# Importing app builds the shared knowledge base and services once
+import app as wsgi
+import config
+from chatbot.metrics import REQUEST_SECONDS, start_trace
+from chatbot.tenants import split_tenant_prefix
+
+chat_service = wsgi.chat_service
+voice_service = wsgi.voice_service
+voice_jobs = wsgi.voice_jobs
+voice_prompts = wsgi.voice_prompts
+
+async_app = Quart(__name__)
+
+# Paths served natively by async_app; everything else goes to Flask
+ASYNC_PATHS = {"/api/chat", "/api/chat/stream", "/api/sms", "/api/speak", "/api/voice/process"}
+
+
+def _tenant(form=None):
+    """Return (tenant id, chat service) for the request, by /t/<tenant> prefix or Twilio number called."""
+    tenant_id = wsgi.tenants.resolve(request.scope.get("root_path", ""), form.get('To') if form else None)
+    tenant_chat_service = wsgi.tenants.chat_service(tenant_id)
+    if tenant_chat_service is None:
+        abort(404)
+    return tenant_id, tenant_chat_service
+
+
+@async_app.before_request
+async def begin_trace():
+    g.trace = start_trace(request.headers.get('X-Trace-Id') or request.headers.get('X-Request-ID'))
+
+
+@async_app.after_request
+async def end_trace(response):
+    """Same request metrics and trace headers as the Flask app."""
+    trace = g.get('trace')
+    if trace is None:
+        return response
+
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(trace.elapsed, route=route, method=request.method, status=response.status_code)
+
+    if config.TRACE_HEADERS:
+        response.headers['X-Trace-Id'] = trace.trace_id
+        if trace.stages:
+            response.headers['Server-Timing'] = trace.server_timing()
+
+    if trace.elapsed >= config.SLOW_REQUEST_SECONDS:
+        print(f"Slow request {request.method} {request.path}: {trace.summary()}")
+    return response
+
+
+@async_app.route('/api/chat', methods=['POST'])
+async def chat():
+    """Handle chat API requests."""
+    data = await request.get_json()
+    user_message = data.get('message', '')
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+
+    tenant_id, tenant_chat_service = _tenant()
+    response_data = await tenant_chat_service.aget_response(
+        user_message, conversation_id=wsgi._conversation_id(tenant_id, "web", data.get('session_id')))
+
+    return jsonify(response_data)
+
+
+@async_app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Stream a chat response as Server-Sent Events."""
+    data = await request.get_json()
+    user_message = data.get('message', '')
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+
+    tenant_id, tenant_chat_service = _tenant()
+    conversation_id = wsgi._conversation_id(tenant_id, "web", data.get('session_id'))
+
+    async def generate():
+        try:
+            async for event in tenant_chat_service.astream_response(user_message, conversation_id=conversation_id):
+                event_name = "done" if event.get("done") else "token"
+                yield f"event: {event_name}\ndata: {json.dumps(event)}\n\n".encode("utf-8")
+        except Exception as e:
+            print(f"Error streaming chat response: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Failed to generate response'})}\n\n".encode("utf-8")
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+@async_app.route('/api/speak', methods=['POST'])
+async def speak():
+    """Convert text to speech and return audio URL."""
+    data = await request.get_json()
+    text = data.get('text', '')
+
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+
+    audio_url = await voice_service.atext_to_speech_for_twilio(text, channel="web")
+
+    if audio_url:
+        return jsonify({"audio_url": audio_url})
+    else:
+        return jsonify({"error": "Failed to convert text to speech"}), 500
+
+
+@async_app.route('/api/sms', methods=['POST'])
+async def sms():
+    """Handle incoming SMS messages."""
+    form = await request.form
+    incoming_msg = form.get('Body', '').strip()
+
+    tenant_id, tenant_chat_service = _tenant(form)
+    resp = MessagingResponse()
+    resp.message(await tenant_chat_service.aget_response_for_sms(
+        incoming_msg, wsgi._conversation_id(tenant_id, "sms", form.get('From'))))
+
+    return str(resp)
+
+
+@async_app.route('/api/voice/process', methods=['POST'])
+async def voice_process():
+    """Process speech input from voice call."""
+    form = await request.form
+    speech_result = form.get('SpeechResult', '')
+
+    response = VoiceResponse()
+
+    if speech_result:
+        # The answer is generated by a task on this event loop
+        tenant_id, tenant_chat_service = _tenant(form)
+        job_id = voice_jobs.asubmit(
+            speech_result, wsgi._conversation_id(tenant_id, "voice", form.get('From')), tenant_chat_service)
+        wsgi._hold_for_answer(response, job_id)
+    else:
+        voice_prompts.add_to(response, "not_understood")
+
+    return str(response)
+
+
+flask_application = WsgiToAsgi(wsgi.app)
+
+
+async def application(scope, receive, send):
+    """Dispatch async routes to Quart and the rest to the Flask app."""
+    if scope["type"] == "http":
+        # /t/<tenant>/... moves into root_path, like SCRIPT_NAME under WSGI
+        tenant, path = split_tenant_prefix(scope["path"])
+        if tenant is not None:
+            scope = dict(scope, root_path=scope.get("root_path", "") + f"/t/{tenant}")
+        if path not in ASYNC_PATHS:
+            await flask_application(scope, receive, send)
+            return
+    await async_app(scope, receive, send)
@@ -0,0 +1,120 @@
+"""Answer a JSONL file of questions in bulk, for regression evaluation and cache warming.
+
+Each input line is {"id": ..., "query": ...} or just a JSON string. Results
+are written as JSON lines in the order they finish, each with the answer,
+the retrieved sources and their scores, and per-stage timings in ms:
+
+    python batch_query.py questions.jsonl --output results.jsonl --concurrency 8
+
+By default the questions are answered in this process against the published
+vector store of --tenant. With --url they are posted to a running server's
+/api/batch instead (ADMIN_TOKEN must be set), which also warms the answer
+cache of the worker that serves the request:
+
+    python batch_query.py questions.jsonl --url http://localhost:5000
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import requests
+
+import config
+from chatbot import (ChatService, PriorityScheduler, TokenBucket, BatchRunner, read_batch, create_chat_service,
+                     create_knowledge_base, tenant_store_dir)
+
+
+def create_tenant_service(tenant_id: str, concurrency: int) -> ChatService:
+    """Build a tenant's knowledge base and chat service with the app's factory, without the web app."""
+    tenant = config.TENANTS[tenant_id]
+    knowledge_base = create_knowledge_base(config, Path(tenant["data_dir"]), tenant_store_dir(config, tenant_id))
+    knowledge_base.create_or_load_vector_store()
+
+    # Nothing else shares this process, so only the rate limit needs enforcing; wait for it rather than shed
+    scheduler = PriorityScheduler(
+        "llm",
+        max_concurrent=concurrency,
+        max_wait={"background": 600.0},
+        bucket=TokenBucket(config.OPENAI_TOKENS_PER_MINUTE) if config.OPENAI_TOKENS_PER_MINUTE else None
+    )
+    return create_chat_service(config, knowledge_base, tenant.get("name", tenant_id), scheduler)
+
+
+def run_local(items: List[Dict[str, Any]], args) -> Iterator[Dict[str, Any]]:
+    runner = BatchRunner(create_tenant_service(args.tenant, args.concurrency),
+                         batch_size=config.BATCH_SIZE, max_concurrency=args.concurrency)
+    return runner.run(items, channel=args.channel, use_cache=not args.no_cache)
+
+
+def run_remote(items: List[Dict[str, Any]], args) -> Iterator[Dict[str, Any]]:
+    """Post the batch to a running server and yield its results as they stream back."""
+    body = "\n".join(json.dumps(item) for item in items)
+    response = requests.post(
+        args.url.rstrip("/") + "/api/batch",
+        params={"channel": args.channel, "cache": "0" if args.no_cache else "1", "concurrency": args.concurrency},
+        data=body.encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson", "X-Admin-Token": config.ADMIN_TOKEN or ""},
+        stream=True,
+        timeout=(10, None)
+    )
+    if response.status_code != 200:
+        raise SystemExit(f"Batch request failed with {response.status_code}: {response.text}")
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            yield json.loads(line)
+
+
+def write_results(results: Iterator[Dict[str, Any]], output: IO[str], total: int):
+    """Write results as they arrive and print progress and a summary to stderr."""
+    totals, errors, cached, shed = [], 0, 0, 0
+    for count, result in enumerate(results, start=1):
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+
+        errors += "error" in result
+        cached += bool(result.get("cached"))
+        shed += bool(result.get("shed"))
+        if "timings_ms" in result:
+            totals.append(result["timings_ms"]["total"])
+        if count % 50 == 0 or count == total:
+            print(f"{count}/{total} answered", file=sys.stderr)
+
+    summary = {"queries": total, "errors": errors, "cached": cached, "shed": shed}
+    if totals:
+        summary.update({
+            "p50_ms": round(float(np.percentile(totals, 50)), 1),
+            "p95_ms": round(float(np.percentile(totals, 95)), 1)
+        })
+    print(f"Batch finished: {summary}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions in bulk.")
+    parser.add_argument("input", help="JSONL file of queries, or - for stdin")
+    parser.add_argument("--output", help="where to write JSONL results (default: stdout)")
+    parser.add_argument("--channel", default="web", choices=sorted(config.CHANNEL_PROFILES))
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_CONCURRENCY, help="parallel LLM calls")
+    parser.add_argument("--no-cache", action="store_true", help="generate fresh answers instead of cached ones")
+    parser.add_argument("--tenant", default=config.DEFAULT_TENANT, choices=sorted(config.TENANTS))
+    parser.add_argument("--url", help="post to this running server instead of answering in-process")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        items = read_batch(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            items = read_batch(f)
+
+    results = run_remote(items, args) if args.url else run_local(items, args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            write_results(results, output, len(items))
+    else:
+        write_results(results, sys.stdout, len(items))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Recall-vs-latency benchmark of the vector index options in chatbot/ann_index.py.
+
+Synthetic corpora of clustered unit vectors (shaped like OpenAI embeddings)
+are indexed with every configured index type and storage, and each is
+compared with an exact flat index over the same vectors:
+
+  * recall@k: share of the exact k nearest neighbours the index returns,
+  * single-query search latency (p50/p95/p99 in ms), as the app searches,
+  * index size on disk, which is what a worker maps into memory,
+  * build time (training and adding).
+
+IVF and HNSW are measured at several nprobe / efSearch values, so the
+results trace each index's recall-vs-latency curve. Results are written as
+JSON like benchmarks/run.py. Run from the project root:
+
+    python -m benchmarks.ann --output ann.json
+    python -m benchmarks.ann --sizes 10000,100000,1000000 --configs ivf:pq,hnsw:float16
+
+A million 1536-dimensional vectors take 6 GB as float32 and the flat
+baseline as much again; use --dim to scale down on smaller machines.
+"""
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from benchmarks.run import git_commit, parse_int_list, peak_rss_mb
+from chatbot.ann_index import build_index, set_search_params
+
+DEFAULT_CONFIGS = ["flat:float16", "flat:pq", "ivf:float32", "ivf:float16", "ivf:pq",
+                   "hnsw:float32", "hnsw:float16", "hnsw:pq"]
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, rng: np.random.Generator,
+                      centers: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (unit vectors around random topic centers, centers), generated in blocks to bound memory."""
+    if centers is None:
+        centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 65536):
+        end = min(count, start + 65536)
+        block = centers[rng.integers(0, len(centers), end - start)]
+        block += rng.standard_normal(block.shape, dtype=np.float32) * 0.6
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        vectors[start:end] = block
+    return vectors, centers
+
+
+def search_latencies(index: faiss.Index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, List[float]]:
+    """Search one query at a time and return (neighbour positions, per-query seconds)."""
+    positions = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, found = index.search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+        positions[i] = found[0]
+    return positions, latencies
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Mean share of the exact neighbours among those found."""
+    hits = sum(len(set(row[row != -1]) & set(expected)) for row, expected in zip(found, truth))
+    return hits / truth.size
+
+
+def index_bytes(index: faiss.Index, workspace: Path) -> int:
+    """Size of the index as saved, i.e. what load_native maps into memory."""
+    path = workspace / "index.faiss"
+    faiss.write_index(index, str(path))
+    size = os.path.getsize(path)
+    path.unlink()
+    return size
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    values = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3)
+    }
+
+
+def parse_config(value: str) -> Dict[str, Any]:
+    index_type, _, storage = value.partition(":")
+    return {"type": index_type, "storage": storage or "float32"}
+
+
+def bench_size(count: int, args, workspace: Path) -> Dict[str, Any]:
+    """Measure every index configuration over one corpus size."""
+    rng = np.random.default_rng(args.seed)
+    vectors, centers = synthetic_vectors(count, args.dim, args.clusters, rng)
+    queries, _ = synthetic_vectors(args.queries, args.dim, args.clusters, rng, centers)
+
+    # Exact neighbours from the flat index the app builds by default
+    start = time.perf_counter()
+    flat = faiss.IndexFlatL2(args.dim)
+    flat.add(vectors)
+    build_seconds = time.perf_counter() - start
+    _, truth = flat.search(queries, args.k)
+    _, flat_latencies = search_latencies(flat, queries, args.k)
+    flat_bytes = index_bytes(flat, workspace)
+    del flat
+
+    results = [{
+        "config": "flat:float32",
+        "factory": "Flat",
+        "recall_at_k": 1.0,
+        "index_bytes": flat_bytes,
+        "memory_ratio": 1.0,
+        "build_seconds": round(build_seconds, 3),
+        **latency_summary(flat_latencies)
+    }]
+    print(f"{count} vectors, flat:float32: {results[0]}")
+
+    for config in args.configs:
+        params = {**parse_config(config), "nlist": args.nlist, "hnsw_m": args.hnsw_m, "pq_m": args.pq_m}
+        start = time.perf_counter()
+        index, resolved = build_index(vectors, params)
+        build_seconds = time.perf_counter() - start
+        size = index_bytes(index, workspace)
+
+        # Sweep the query-time knob of approximate indexes; compressed flat indexes have none
+        if resolved["type"] == "ivf":
+            sweep = [("nprobe", nprobe) for nprobe in args.nprobe if nprobe <= resolved["nlist"]]
+        elif resolved["type"] == "hnsw":
+            sweep = [("ef_search", ef_search) for ef_search in args.ef_search]
+        else:
+            sweep = [(None, None)]
+
+        for knob, value in sweep:
+            if knob is not None:
+                set_search_params(index, {knob: value})
+            found, latencies = search_latencies(index, queries, args.k)
+            result = {
+                "config": config,
+                "factory": resolved["factory"],
+                **({knob: value} if knob else {}),
+                "recall_at_k": round(recall_at_k(found, truth), 4),
+                "index_bytes": size,
+                "memory_ratio": round(size / flat_bytes, 4),
+                "build_seconds": round(build_seconds, 3),
+                **latency_summary(latencies)
+            }
+            results.append(result)
+            print(f"{count} vectors, {config}: {result}")
+        del index
+
+    return {"vectors": count, "dim": args.dim, "results": results}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Recall@k, latency and size of approximate vector indexes.")
+    parser.add_argument("--output", default="ann_benchmark_results.json", help="where to write the JSON report")
+    parser.add_argument("--sizes", type=parse_int_list, default=[10000, 100000], help="vectors per corpus")
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension (text-embedding-ada-002: 1536)")
+    parser.add_argument("--configs", type=lambda value: value.split(","), default=DEFAULT_CONFIGS,
+                        help="comma separated <type>:<storage> pairs")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5, help="neighbours per query, as retrieved for a prompt")
+    parser.add_argument("--clusters", type=int, default=200, help="topics the synthetic vectors gather around")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists; 0 picks about 4 * sqrt(vectors)")
+    parser.add_argument("--nprobe", type=parse_int_list, default=[1, 4, 16, 64])
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-search", type=parse_int_list, default=[16, 64, 256])
+    parser.add_argument("--pq-m", type=int, default=0, help="PQ sub-quantizers; 0 picks dim / 16")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS threads; one query per worker thread in the app")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    faiss.omp_set_num_threads(args.threads)
+
+    report: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "faiss": faiss.__version__,
+        "cpus": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"}
+    }
+
+    with tempfile.TemporaryDirectory(prefix="chatbot-ann-bench-") as workspace:
+        report["corpora"] = [bench_size(count, args, Path(workspace)) for count in args.sizes]
+
+    report["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote benchmark report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Offline benchmark of the app's own overhead.
+
+OpenAI, ElevenLabs and S3 are replaced by the deterministic stubs in
+benchmarks/stubs.py, so results only move when our code does. The run:
+
+  * times load_documents and create_or_load_vector_store over synthetic
+    corpora of growing size (cold build, then a warm reload), and
+  * drives the HTTP endpoints through the Flask app at each concurrency level.
+
+Results (p50/p95/p99 latency in ms, throughput and RSS) are written as JSON so
+runs can be diffed. Run from the project root:
+
+    python -m benchmarks.run --output bench.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from docx import Document as DocxDocument
+
+from benchmarks import stubs
+
+TOPICS = ["admission", "examination", "hostel", "library", "scholarship", "fees", "placement",
+          "research", "sports", "canteen", "transport", "convocation", "syllabus", "results"]
+WORDS = ["students", "university", "department", "office", "application", "semester", "form",
+         "deadline", "eligibility", "certificate", "campus", "course", "faculty", "payment",
+         "portal", "notice", "schedule", "rules", "documents", "hall", "ticket", "merit"]
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def summarize(latencies: List[float], errors: int, wall_seconds: float) -> Dict[str, Any]:
+    """Latency percentiles (ms) and throughput for one load run."""
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "mean_ms": round(float(values.mean()), 2),
+        "throughput_rps": round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+        "rss_mb": round(rss_mb(), 1)
+    }
+
+
+def write_corpus(data_dir: Path, num_docs: int, words_per_doc: int, seed: int = 0):
+    """Write a reproducible mix of .txt and .docx files."""
+    rng = random.Random(seed)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(num_docs):
+        topic = TOPICS[i % len(TOPICS)]
+        paragraphs = []
+        for _ in range(max(1, words_per_doc // 80)):
+            words = [rng.choice(WORDS) for _ in range(80)]
+            paragraphs.append(f"The {topic} " + " ".join(words) + ".")
+        if i % 4 == 3:
+            document = DocxDocument()
+            document.add_heading(f"{topic.title()} notice {i}", level=1)
+            for paragraph in paragraphs:
+                document.add_paragraph(paragraph)
+            document.save(data_dir / f"{topic}_{i}.docx")
+        else:
+            (data_dir / f"{topic}_{i}.txt").write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+
+def bench_ingestion(workspace: Path, sizes: List[int], words_per_doc: int) -> List[Dict[str, Any]]:
+    """Time extraction and vector store builds over corpora of growing size."""
+    from chatbot import KnowledgeBase
+
+    results = []
+    for size in sizes:
+        root = workspace / f"corpus_{size}"
+        write_corpus(root / "data", size, words_per_doc)
+        knowledge_base = KnowledgeBase(
+            data_dir=root / "data",
+            vector_store_dir=root / "vector_stores",
+            openai_api_key="stub"
+        )
+
+        start = time.perf_counter()
+        documents = knowledge_base.load_documents()
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vector_store = knowledge_base.create_or_load_vector_store(force_reload=True)
+        build_seconds = time.perf_counter() - start
+
+        # A second instance loads what the first one saved
+        reloaded = KnowledgeBase(
+            data_dir=root / "data",
+            vector_store_dir=root / "vector_stores",
+            openai_api_key="stub"
+        )
+        start = time.perf_counter()
+        reloaded.create_or_load_vector_store()
+        reload_seconds = time.perf_counter() - start
+
+        results.append({
+            "documents": size,
+            "extracted": len(documents),
+            "chunks": vector_store.index.ntotal,
+            "load_documents_s": round(load_seconds, 3),
+            "build_vector_store_s": round(build_seconds, 3),
+            "load_vector_store_s": round(reload_seconds, 3),
+            "rss_mb": round(rss_mb(), 1)
+        })
+        print(f"Ingestion benchmark: {results[-1]}")
+    return results
+
+
+def run_load(request_fn: Callable[[int], bool], concurrency: int, total: int) -> Dict[str, Any]:
+    """Call request_fn(i) for i in range(total) from concurrency threads."""
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(i: int) -> Optional[float]:
+        start = time.perf_counter()
+        try:
+            ok = request_fn(i)
+        except Exception as e:
+            print(f"Benchmark request failed: {str(e)}")
+            ok = False
+        return time.perf_counter() - start if ok else None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency in executor.map(timed, range(total)):
+            if latency is None:
+                errors += 1
+            else:
+                latencies.append(latency)
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def make_question(i: int, salt: str, repeat_ratio: float, total: int) -> str:
+    """Deterministic question; repeat_ratio of them reuse earlier questions."""
+    unique = max(1, round(total * (1 - repeat_ratio)))
+    n = i % unique
+    return f"What about {TOPICS[n % len(TOPICS)]} {WORDS[n % len(WORDS)]} for case {n} ({salt})?"
+
+
+def bench_endpoints(workspace: Path, args) -> Dict[str, Any]:
+    """Drive the Flask endpoints at each concurrency level."""
+    import config
+
+    # Keep every file the app writes inside the workspace
+    root = workspace / "app"
+    write_corpus(root / "data", args.app_corpus, args.words_per_doc, seed=1)
+    config.DATA_DIR = root / "data"
+    config.VECTOR_STORE_DIR = root / "vector_stores"
+    config.EMBEDDING_CACHE_DIR = root / "vector_stores" / "embedding_cache"
+    config.AUDIO_CACHE_DIR = root / "audio_cache"
+    config.VOICE_JOBS_DIR = root / "voice_jobs"
+    config.TTS_STREAM_DIR = root / "tts_streams"
+    config.AUDIO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    config.VOICE_JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    config.USE_S3 = args.s3
+    config.S3_BUCKET_NAME = "benchmark-audio" if args.s3 else None
+
+    startup = time.perf_counter()
+    import app as web
+    startup_seconds = time.perf_counter() - startup
+
+    # Let the background precompute finish so quick access measures the steady state
+    deadline = time.time() + 120
+    while len(web.quick_access_service._answers) < len(config.QUICK_ACCESS_QUERIES) and time.time() < deadline:
+        time.sleep(0.05)
+
+    categories = list(config.QUICK_ACCESS_QUERIES)
+    local = threading.local()
+
+    def client():
+        # Flask test clients are not shared between threads
+        if not hasattr(local, "client"):
+            local.client = web.app.test_client()
+        return local.client
+
+    def chat(salt):
+        def request_fn(i):
+            message = make_question(i, salt, args.repeat_ratio, args.requests)
+            return client().post("/api/chat", json={"message": message}).status_code == 200
+        return request_fn
+
+    def quick_access(salt):
+        def request_fn(i):
+            return client().get(f"/api/quick-access/{categories[i % len(categories)]}").status_code == 200
+        return request_fn
+
+    def sms(salt):
+        def request_fn(i):
+            body = make_question(i, salt, args.repeat_ratio, args.requests)
+            return client().post("/api/sms", data={"Body": body}).status_code == 200
+        return request_fn
+
+    def voice_process(salt):
+        def request_fn(i):
+            speech = make_question(i, salt, args.repeat_ratio, args.requests)
+            return client().post("/api/voice/process", data={"SpeechResult": speech}).status_code == 200
+        return request_fn
+
+    def voice_answer(salt):
+        # Webhook plus the background job: how long a caller waits for the answer
+        def request_fn(i):
+            speech = make_question(i, salt, args.repeat_ratio, args.requests)
+            response = client().post("/api/voice/process", data={"SpeechResult": speech})
+            job_id = re.search(r"job=(\w+)", response.get_data(as_text=True)).group(1)
+            while (result := web.voice_jobs.result(job_id)) is None:
+                time.sleep(0.005)
+            return "error" not in result
+        return request_fn
+
+    def speak(salt):
+        def request_fn(i):
+            text = make_question(i, salt, args.repeat_ratio, args.requests)
+            return client().post("/api/speak", json={"text": text}).status_code == 200
+        return request_fn
+
+    scenarios = {
+        "chat": chat,
+        "quick_access": quick_access,
+        "sms": sms,
+        "voice_process": voice_process,
+        "voice_answer": voice_answer,
+        "speak": speak
+    }
+
+    results: Dict[str, Any] = {}
+    for name, scenario in scenarios.items():
+        results[name] = {}
+        for concurrency in args.concurrency:
+            # A fresh salt per run keeps caches from carrying over between levels
+            summary = run_load(scenario(f"{name}-{concurrency}"), concurrency, args.requests)
+            results[name][str(concurrency)] = summary
+            print(f"Endpoint benchmark {name} at concurrency {concurrency}: {summary}")
+
+    return {
+        "startup_s": round(startup_seconds, 3),
+        "scenarios": results,
+        "cache_stats": web.app.test_client().get("/api/cache-stats").get_json()
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline benchmark with stubbed OpenAI, ElevenLabs and S3.")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON report")
+    parser.add_argument("--concurrency", type=parse_int_list, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--repeat-ratio", type=float, default=0.2, help="share of repeated questions")
+    parser.add_argument("--corpus-sizes", type=parse_int_list, default=[50, 200, 800])
+    parser.add_argument("--words-per-doc", type=int, default=800)
+    parser.add_argument("--app-corpus", type=int, default=100, help="documents in the corpus the app serves")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--tts-latency", type=float, default=0.3)
+    parser.add_argument("--s3-latency", type=float, default=0.02)
+    parser.add_argument("--s3", action="store_true", help="store Twilio audio in the stub S3 bucket")
+    parser.add_argument("--skip-ingestion", action="store_true")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    args = parser.parse_args(argv)
+
+    stubs.install(
+        llm_latency=args.llm_latency,
+        embed_latency=args.embed_latency,
+        tts_latency=args.tts_latency,
+        s3_latency=args.s3_latency
+    )
+
+    report: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"}
+    }
+
+    with tempfile.TemporaryDirectory(prefix="chatbot-bench-") as workspace:
+        if not args.skip_ingestion:
+            report["ingestion"] = bench_ingestion(Path(workspace), args.corpus_sizes, args.words_per_doc)
+        if not args.skip_endpoints:
+            report["endpoints"] = bench_endpoints(Path(workspace), args)
+
+    report["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote benchmark report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
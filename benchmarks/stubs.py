@@ -0,0 +1,173 @@
+"""Deterministic local stand-ins for OpenAI, ElevenLabs and S3.
+
+Every stub sleeps for a configurable latency instead of calling the network,
+so a benchmark run measures the app's own overhead on top of a known,
+repeatable upstream cost.
+"""
+import time
+import asyncio
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import chatbot
+import chatbot.chat_service
+import chatbot.knowledge_base
+from chatbot.clients import CircuitBreaker
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that answers with deterministic text after a fixed latency."""
+
+    latency: float = 0.5
+    token_latency: float = 0.005
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _answer(self, messages: List[BaseMessage]) -> List[str]:
+        rng = np.random.default_rng(_seed(str(messages[-1].content)))
+        words = ["Pune", "University", "admission", "fees", "exam", "hostel", "library",
+                 "scholarship", "department", "students", "form", "office", "semester"]
+        tokens = [f"{words[i]} " for i in rng.integers(0, len(words), self.answer_words)]
+        tokens[-1] = tokens[-1].strip() + "."
+        return tokens
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._answer(messages))))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._answer(messages))))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # The fixed latency is time to first token; the rest trickles in per token
+        time.sleep(self.latency)
+        for token in self._answer(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            time.sleep(self.token_latency)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in self._answer(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            await asyncio.sleep(self.token_latency)
+
+
+class StubEmbeddings(Embeddings):
+    def __init__(self, dim: int = 1536, latency: float = 0.05, model: str = "stub-embedding"):
+        """Unit vectors seeded by the text hash; identical texts always get identical vectors."""
+        self.dim = dim
+        self.latency = latency
+        self.model = model
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.random.default_rng(_seed(text)).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._vector(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+
+class StubTTSClient:
+    def __init__(self, latency: float = 0.3, bytes_per_char: int = 200):
+        """Stands in for ElevenLabsClient; returns fake MP3 bytes sized like real clips."""
+        self.latency = latency
+        self.bytes_per_char = bytes_per_char
+        self.breaker = CircuitBreaker()
+
+    def _audio(self, text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest() * max(1, len(text) * self.bytes_per_char // 32)
+
+    def synthesize(self, voice_id: str, text: str, model_id: str, voice_settings: Dict[str, Any]) -> Optional[bytes]:
+        time.sleep(self.latency)
+        return self._audio(text)
+
+    async def asynthesize(self, voice_id: str, text: str, model_id: str,
+                          voice_settings: Dict[str, Any]) -> Optional[bytes]:
+        await asyncio.sleep(self.latency)
+        return self._audio(text)
+
+
+class _StubPaginator:
+    def __init__(self, client: "StubS3Client"):
+        self.client = client
+
+    def paginate(self, Bucket: str, Prefix: str = ""):
+        with self.client._lock:
+            contents = [
+                {"Key": key, "Size": len(body), "LastModified": modified}
+                for (bucket, key), (body, modified) in self.client.objects.items()
+                if bucket == Bucket and key.startswith(Prefix)
+            ]
+        yield {"Contents": contents}
+
+
+class StubS3Client:
+    def __init__(self, latency: float = 0.02):
+        """In-memory subset of the boto3 S3 client used by S3AudioStore."""
+        self.latency = latency
+        self.objects: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get_paginator(self, operation: str) -> _StubPaginator:
+        return _StubPaginator(self)
+
+    def head_object(self, Bucket: str, Key: str) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        with self._lock:
+            body, _ = self.objects[(Bucket, Key)]
+        return {"ContentLength": len(body)}
+
+    def put_object(self, Body: bytes, Bucket: str, Key: str, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.objects[(Bucket, Key)] = (Body, datetime.now(timezone.utc))
+
+    def delete_object(self, Bucket: str, Key: str):
+        time.sleep(self.latency)
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+
+
+def install(llm_latency: float = 0.5, embed_latency: float = 0.05, tts_latency: float = 0.3,
+            s3_latency: float = 0.02, answer_words: int = 60):
+    """Replace the OpenAI, ElevenLabs and S3 clients used by the chatbot package with stubs.
+
+    Must run before app.py is imported, since it builds its services at import.
+    """
+    chatbot.chat_service.ChatOpenAI = lambda **kwargs: StubChatModel(latency=llm_latency, answer_words=answer_words)
+    chatbot.knowledge_base.OpenAIEmbeddings = lambda **kwargs: StubEmbeddings(latency=embed_latency)
+    tts_client = StubTTSClient(latency=tts_latency)
+    chatbot.ElevenLabsClient = lambda *args, **kwargs: tts_client
+    s3_client = StubS3Client(latency=s3_latency)
+    chatbot.get_s3_client = lambda *args, **kwargs: s3_client
@@ -1,3 +1,15 @@
 from .knowledge_base import KnowledgeBase
+from .chunking import StructuredChunker
 from .chat_service import ChatService
-from .voice_service import VoiceService
\ No newline at end of file
+from .model_router import ModelRouter
+from .context_builder import ContextBuilder
+from .conversation_memory import ConversationMemory
+from .voice_service import VoiceService
+from .scheduler import Overloaded, PriorityScheduler, TokenBucket
+from .answer_cache import SemanticAnswerCache
+from .tenants import TenantRegistry, TenantPrefixMiddleware
+from .batch import BatchRunner, read_batch
+from .quick_access import QuickAccessService
+from .voice_calls import VoiceJobQueue, VoicePrompts, LocalJobResults, S3JobResults
+from .clients import CircuitBreaker, ElevenLabsClient, RateLimited, get_http_session, get_s3_client
+from .factory import create_chat_service, create_context_builder, create_knowledge_base, tenant_store_dir
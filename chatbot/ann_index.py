@@ -0,0 +1,143 @@
+import math
+from typing import Any, Dict, Tuple
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+STORAGE_TYPES = ("float32", "float16", "pq")
+
+# Parameters fixed when the index is built; nprobe and ef_search only affect searches
+BUILD_KEYS = ("type", "storage", "nlist", "hnsw_m", "pq_m")
+DEFAULT_INDEX_PARAMS = {
+    "type": "flat",         # flat (exact), ivf (inverted lists) or hnsw (graph)
+    "storage": "float32",   # how vectors are stored: float32, float16 or pq (product quantized)
+    "nlist": 0,             # IVF lists; 0 picks about 4 * sqrt(vectors)
+    "nprobe": 16,           # IVF lists searched per query
+    "hnsw_m": 32,           # HNSW neighbours per node
+    "ef_search": 64,        # HNSW candidates kept while searching
+    "pq_m": 0               # PQ sub-quantizers of 8 bits; 0 picks dim / 16
+}
+
+# k-means wants about 39 training points per centroid; 8-bit PQ has 256 centroids per sub-quantizer
+MIN_POINTS_PER_CENTROID = 39
+PQ_MIN_VECTORS = MIN_POINTS_PER_CENTROID * 256
+
+
+def make_index_params(params: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Fill in defaults and validate index parameters."""
+    params = {**DEFAULT_INDEX_PARAMS, **(params or {})}
+    if params["type"] not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {params['type']!r}; expected one of {', '.join(INDEX_TYPES)}.")
+    if params["storage"] not in STORAGE_TYPES:
+        raise ValueError(f"Unknown index storage {params['storage']!r}; expected one of {', '.join(STORAGE_TYPES)}.")
+    for key in ("nlist", "nprobe", "hnsw_m", "ef_search", "pq_m"):
+        params[key] = int(params[key])
+    return params
+
+
+def is_exact(params: Dict[str, Any]) -> bool:
+    """Return True if an index with these parameters stores full vectors and searches them all."""
+    return params.get("type", "flat") == "flat" and params.get("storage", "float32") == "float32"
+
+
+def build_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the parameters that require a rebuild when they change.
+
+    Settings the index type does not use (nlist outside IVF, hnsw_m
+    outside HNSW, pq_m without PQ storage) are zeroed, so changing them
+    does not rebuild.
+    """
+    params = make_index_params(params)
+    built = {key: params[key] for key in BUILD_KEYS}
+    if built["type"] != "ivf":
+        built["nlist"] = 0
+    if built["type"] != "hnsw":
+        built["hnsw_m"] = 0
+    if built["storage"] != "pq":
+        built["pq_m"] = 0
+    return built
+
+
+def _pq_m(dim: int, pq_m: int) -> int:
+    """Return the number of PQ sub-quantizers, which must divide the dimension."""
+    if pq_m:
+        if dim % pq_m:
+            raise ValueError(f"pq_m={pq_m} does not divide the embedding dimension {dim}.")
+        return pq_m
+    # Largest divisor of dim not above dim / 16, i.e. about 2 bytes per 32 dimensions
+    return next(m for m in range(max(1, dim // 16), 0, -1) if dim % m == 0)
+
+
+def resolve_index_params(params: Dict[str, Any], count: int, dim: int) -> Dict[str, Any]:
+    """Turn requested parameters into concrete ones for a corpus, plus the FAISS factory string.
+
+    Small corpora cannot train IVF centroids or PQ codebooks well, so IVF
+    falls back to a flat index and PQ to float16 storage until there are
+    enough vectors. The returned dict is what gets persisted with the index.
+    """
+    params = make_index_params(params)
+    index_type, storage = params["type"], params["storage"]
+
+    if storage == "pq" and count < PQ_MIN_VECTORS:
+        print(f"{count} vectors are too few to train product quantization; storing float16 vectors instead.")
+        storage = "float16"
+
+    nlist = 0
+    if index_type == "ivf":
+        nlist = params["nlist"] or int(4 * math.sqrt(count))
+        nlist = min(nlist, count // MIN_POINTS_PER_CENTROID)
+        if nlist < 2:
+            print(f"{count} vectors are too few for an IVF index; using a flat index instead.")
+            index_type, nlist = "flat", 0
+
+    pq_m = _pq_m(dim, params["pq_m"]) if storage == "pq" else 0
+    codes = {"float32": "Flat", "float16": "SQfp16", "pq": f"PQ{pq_m}"}[storage]
+    if index_type == "ivf":
+        factory = f"IVF{nlist},{codes}"
+    elif index_type == "hnsw":
+        factory = f"HNSW{params['hnsw_m']}" + ("" if storage == "float32" else f"_{codes}")
+    else:
+        factory = codes
+
+    return {
+        "requested": build_params(params),
+        "type": index_type,
+        "storage": storage,
+        "factory": factory,
+        "nlist": nlist,
+        "nprobe": min(params["nprobe"], nlist) if nlist else 0,
+        "hnsw_m": params["hnsw_m"] if index_type == "hnsw" else 0,
+        "ef_search": params["ef_search"] if index_type == "hnsw" else 0,
+        "pq_m": pq_m,
+        "count": count,
+        "dim": dim
+    }
+
+
+def build_index(vectors: np.ndarray, params: Dict[str, Any]) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """Build an L2 index of the configured type over exact float32 vectors.
+
+    Returns the index and its resolved parameters. Vector positions are
+    kept, so position i of the new index is row i of vectors.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    resolved = resolve_index_params(params, count, dim)
+
+    index = faiss.index_factory(dim, resolved["factory"], faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    set_search_params(index, resolved)
+    return index, resolved
+
+
+def set_search_params(index: faiss.Index, params: Dict[str, Any]):
+    """Apply query-time parameters (IVF nprobe, HNSW efSearch) to a built or loaded index."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and params.get("nprobe"):
+        ivf.nprobe = min(int(params["nprobe"]), ivf.nlist)
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None and params.get("ef_search"):
+        hnsw.efSearch = int(params["ef_search"])
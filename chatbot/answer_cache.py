@@ -0,0 +1,107 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query and collapse punctuation and whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+class SemanticAnswerCache:
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: int = 3600, max_entries: int = 1000):
+        """Initialize an answer cache that matches queries by embedding similarity.
+
+        Entries are kept per namespace (e.g. the channel the answer was
+        formatted for) and only match queries in the same namespace.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # (namespace, normalized query) -> (unit embedding, answer, stored at), least recently used first
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def _expire(self, now: float):
+        """Drop entries older than the TTL. Caller holds the lock."""
+        expired = [key for key, (_, _, stored_at) in self._entries.items()
+                   if now - stored_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup_exact(self, query: str, namespace: str = "") -> Optional[Dict[str, Any]]:
+        """Return a cached answer for the same normalized query without embedding it."""
+        key = (namespace, normalize_query(query))
+        with self._lock:
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def lookup(self, query: str, embedding: List[float], namespace: Optional[str] = "") -> Optional[Dict[str, Any]]:
+        """Return the cached answer of the most similar past query above the threshold.
+
+        namespace=None matches answers from every namespace.
+        """
+        vector = self._unit(embedding)
+        with self._lock:
+            self._expire(time.time())
+            keys = [key for key in self._entries if namespace is None or key[0] == namespace]
+            if not keys:
+                self.misses += 1
+                return None
+
+            matrix = np.stack([self._entries[key][0] for key in keys])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(keys[best])
+            self.hits += 1
+            return self._entries[keys[best]][1]
+
+    def store(self, query: str, embedding: List[float], answer: Dict[str, Any], namespace: str = ""):
+        """Cache an answer, evicting the least recently used entries past max_entries."""
+        key = (namespace, normalize_query(query))
+        with self._lock:
+            self._entries[key] = (self._unit(embedding), answer, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached answer, e.g. after the vector store changed."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counts and the current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "similarity_threshold": self.similarity_threshold
+            }
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        """Return the embedding as a unit-length float32 vector."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
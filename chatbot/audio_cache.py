@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+
+class LocalAudioStore:
+    def __init__(self, cache_dir: Path, base_url: str):
+        """Store audio clips in a local directory served under /static/audio_cache."""
+        self.cache_dir = cache_dir
+        self.base_url = base_url
+
+        # Create cache directory if it doesn't exist
+        if not self.cache_dir.exists():
+            self.cache_dir.mkdir(parents=True)
+
+    def list(self) -> Iterable[Tuple[str, int, float]]:
+        """Yield (filename, size, last access) for every cached clip."""
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.startswith("tts_") and entry.name.endswith(".mp3"):
+                stat = entry.stat()
+                yield entry.name, stat.st_size, stat.st_mtime
+
+    def size_of(self, filename: str) -> Optional[int]:
+        """Return the size of a clip, or None if it is not stored."""
+        try:
+            return (self.cache_dir / filename).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def write(self, filename: str, audio: bytes):
+        """Write a clip atomically so other workers never see a partial file."""
+        file_path = self.cache_dir / filename
+        tmp_path = file_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, file_path)
+
+    def touch(self, filename: str):
+        """Record an access; the file mtime is shared by all workers."""
+        try:
+            os.utime(self.cache_dir / filename)
+        except FileNotFoundError:
+            pass
+
+    def delete(self, filename: str):
+        """Remove a clip."""
+        try:
+            (self.cache_dir / filename).unlink()
+        except FileNotFoundError:
+            pass
+
+    def path(self, filename: str) -> Path:
+        """Return the local path of a clip."""
+        return self.cache_dir / filename
+
+    def url(self, filename: str) -> str:
+        """Return the public URL of a clip."""
+        return f"{self.base_url}/static/audio_cache/{filename}"
+
+
+class S3AudioStore:
+    def __init__(self, s3_client, bucket: str, public_url: Optional[str] = None):
+        """Store audio clips as public objects in an S3 bucket.
+
+        public_url overrides the default bucket URL, e.g. for a CDN or a
+        local S3-compatible server.
+        """
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.public_url = (public_url or f"https://{bucket}.s3.amazonaws.com").rstrip("/")
+
+    def list(self) -> Iterable[Tuple[str, int, float]]:
+        """Yield (key, size, last modified) for every cached clip."""
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix="tts_"):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["Size"], obj["LastModified"].timestamp()
+
+    def size_of(self, filename: str) -> Optional[int]:
+        """Return the size of a clip, or None if it is not stored."""
+        try:
+            head = self.s3.head_object(Bucket=self.bucket, Key=filename)
+            return head["ContentLength"]
+        except Exception:
+            return None
+
+    def write(self, filename: str, audio: bytes):
+        """Upload a clip."""
+        self.s3.put_object(
+            Body=audio,
+            Bucket=self.bucket,
+            Key=filename,
+            ContentType='audio/mpeg',
+            ACL='public-read'
+        )
+
+    def touch(self, filename: str):
+        """S3 has no cheap way to bump access time; tracked in memory only."""
+        pass
+
+    def delete(self, filename: str):
+        """Remove a clip."""
+        self.s3.delete_object(Bucket=self.bucket, Key=filename)
+
+    def url(self, filename: str) -> str:
+        """Return the public URL of a clip."""
+        return f"{self.public_url}/{filename}"
+
+
+class AudioCache:
+    def __init__(self, store, max_bytes: int, sync_interval: float = 60.0, sync_every: int = 32):
+        """Initialize a content-addressed, LRU-evicted audio cache on top of a store.
+
+        The store is shared by every worker, so the size budget is enforced
+        over a listing of what it holds rather than over what this worker
+        has written. Listing is slow on S3, so the index is only re-synced
+        every sync_interval seconds, every sync_every writes, or when this
+        worker's view exceeds the budget; hits are served from the index.
+        """
+        self.store = store
+        self.max_bytes = max_bytes
+        self.sync_interval = sync_interval
+        self.sync_every = sync_every
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # filename -> size, ordered from least to most recently used, as of the last listing
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        # filename -> last access seen by this worker (S3 keeps no access times)
+        self._accessed: Dict[str, float] = {}
+        self._total_bytes = 0
+        self._puts_since_sync = 0
+        self._synced_at = 0.0
+        self._sync()
+
+    @staticmethod
+    def make_key(text: str, voice_id: str, model_id: str, voice_settings: Dict[str, Any]) -> str:
+        """Return the cache filename for a synthesis request."""
+        payload = json.dumps(
+            {"text": text, "voice_id": voice_id, "model_id": model_id, "voice_settings": voice_settings},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"tts_{digest}.mp3"
+
+    def _sync(self, keep: Optional[str] = None):
+        """Rebuild the index from the store and evict least recently used clips past max_bytes.
+
+        keep (the clip just written) is never evicted.
+        """
+        with self._lock:
+            self._puts_since_sync = 0
+            self._synced_at = time.monotonic()
+        try:
+            entries = list(self.store.list())
+        except Exception as e:
+            print(f"Error listing audio cache: {str(e)}")
+            return
+
+        victims = []
+        with self._lock:
+            # Least recently used first, by the later of the store's and this worker's access time
+            entries.sort(key=lambda entry: max(entry[2], self._accessed.get(entry[0], 0.0)))
+            total = sum(size for _, size, _ in entries)
+            index = OrderedDict()
+            for filename, size, _ in entries:
+                if total > self.max_bytes and filename != keep:
+                    total -= size
+                    victims.append(filename)
+                else:
+                    index[filename] = size
+            self._index = index
+            self._total_bytes = total
+            self._accessed = {filename: accessed for filename, accessed in self._accessed.items()
+                              if filename in index}
+
+        for filename in victims:
+            try:
+                self.store.delete(filename)
+            except Exception as e:
+                print(f"Error evicting {filename} from audio cache: {str(e)}")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the URL of a cached clip, or None on a miss.
+
+        Clips in the index are served without asking the store, so a clip
+        another worker evicted may be served until the next sync.
+        """
+        with self._lock:
+            known = key in self._index
+            if known:
+                self._index.move_to_end(key)
+                self._accessed[key] = time.time()
+
+        if not known:
+            # Another worker may have produced the clip since the last sync
+            size = self.store.size_of(key)
+            with self._lock:
+                if size is None:
+                    self.misses += 1
+                    return None
+                if key not in self._index:
+                    self._index[key] = size
+                    self._total_bytes += size
+                self._accessed[key] = time.time()
+
+        self.store.touch(key)
+        with self._lock:
+            self.hits += 1
+        return self.store.url(key)
+
+    def put(self, key: str, audio: bytes) -> str:
+        """Store a clip, evict least recently used clips past the budget and return its URL."""
+        self.store.write(key, audio)
+        with self._lock:
+            if key in self._index:
+                self._total_bytes -= self._index.pop(key)
+            self._index[key] = len(audio)
+            self._total_bytes += len(audio)
+            self._accessed[key] = time.time()
+            self._puts_since_sync += 1
+            due = (self._total_bytes > self.max_bytes or self._puts_since_sync >= self.sync_every
+                   or time.monotonic() - self._synced_at >= self.sync_interval)
+        if due:
+            self._sync(keep=key)
+        return self.store.url(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit/miss counts."""
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
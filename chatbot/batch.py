@@ -0,0 +1,152 @@
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .chat_service import ChatService
+from .metrics import start_trace
+
+
+def read_batch(lines: Iterable[str], max_queries: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Parse JSONL batch input into [{"id", "query"}].
+
+    Each line is an object with "query" (or "message", as sent to
+    /api/chat) and an optional "id", or just a JSON string; blank lines are
+    skipped. Items without an id are numbered by line. Raises ValueError
+    naming the first bad line.
+    """
+    items = []
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e.msg}).")
+
+        if isinstance(record, str):
+            record = {"query": record}
+        query = (record.get("query") or record.get("message")) if isinstance(record, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError(f"Line {line_number}: expected a non-empty \"query\".")
+        items.append({"id": record.get("id", line_number), "query": query.strip()})
+
+        if max_queries is not None and len(items) > max_queries:
+            raise ValueError(f"At most {max_queries} queries per batch.")
+    return items
+
+
+def _batches(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BatchRunner:
+    def __init__(self, chat_service: ChatService, batch_size: int = 256, max_concurrency: int = 4,
+                 priority: str = "background"):
+        """Answer many queries for evaluation or cache warming.
+
+        Queries are embedded and retrieved batch_size at a time (one
+        embedding request and one FAISS search per batch), then up to
+        max_concurrency LLM calls run at once at the scheduler priority of
+        priority. The next batch is retrieved while the previous one is
+        still being answered.
+        """
+        self.chat_service = chat_service
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.priority = priority
+
+    def _retrieve(self, batch: List[Dict[str, Any]]):
+        """Return (embeddings, retrieved documents, stage seconds per query) for a batch."""
+        knowledge_base = self.chat_service.knowledge_base
+        queries = [item["query"] for item in batch]
+
+        start = time.perf_counter()
+        embeddings = knowledge_base.embed_queries(queries)
+        embedded = time.perf_counter()
+        retrieved = knowledge_base.query_knowledge_base_batch(
+            queries, k=self.chat_service.retrieval_candidates, embeddings=embeddings)
+
+        # Batched stages are shared, so each query is charged its share
+        stages = {
+            "embed": (embedded - start) / len(batch),
+            "retrieval": (time.perf_counter() - embedded) / len(batch)
+        }
+        return embeddings, retrieved, stages
+
+    def _answer(self, item: Dict[str, Any], embedding: List[float], relevant_docs: List[Dict[str, Any]],
+                stages: Dict[str, float], started: float, channel: str, use_cache: bool) -> Dict[str, Any]:
+        trace = start_trace()
+        result = {"id": item["id"], "query": item["query"]}
+        try:
+            response_data = self.chat_service.get_response_for_retrieved(
+                item["query"], relevant_docs, embedding, channel=channel, use_cache=use_cache,
+                priority=self.priority)
+            result.update({
+                "response": response_data["response"],
+                "prompt_tokens": response_data.get("prompt_tokens", 0),
+                "cached": not any(stage == "llm" for stage, _ in trace.stages) and not response_data.get("shed"),
+                "shed": bool(response_data.get("shed"))
+            })
+        except Exception as e:
+            print(f"Error answering batch query {item['id']}: {str(e)}")
+            result["error"] = str(e)
+
+        timings = dict(stages)
+        for stage, seconds in trace.stages:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+        timings["total"] = time.perf_counter() - started
+        result["sources"] = [{"source": doc["source"], "score": doc["score"]} for doc in relevant_docs]
+        result["timings_ms"] = {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+        return result
+
+    def run(self, items: Iterable[Dict[str, Any]], channel: str = "web",
+            use_cache: bool = True) -> Iterator[Dict[str, Any]]:
+        """Answer items ({"id", "query"}) and yield a result for each as soon as it finishes.
+
+        Results come in completion order, not input order; match them by id.
+        Each has the response, the retrieved sources with their scores and
+        per-stage timings in ms. use_cache=False forces fresh answers, which
+        are still stored in the answer cache.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="batch")
+        pending = set()
+        try:
+            for batch in _batches(items, self.batch_size):
+                started = time.perf_counter()
+                try:
+                    embeddings, retrieved, stages = self._retrieve(batch)
+                except Exception as e:
+                    print(f"Error retrieving a batch of {len(batch)} queries: {str(e)}")
+                    for item in batch:
+                        yield {"id": item["id"], "query": item["query"], "error": str(e)}
+                    continue
+
+                for item, embedding, relevant_docs in zip(batch, embeddings, retrieved):
+                    pending.add(executor.submit(self._answer, item, embedding, relevant_docs, stages,
+                                                started, channel, use_cache))
+
+                # Hand back what finished meanwhile, and keep at most one batch waiting ahead of the LLM
+                done = {future for future in pending if future.done()}
+                while len(pending) - len(done) > self.batch_size:
+                    finished, _ = wait(pending - done, return_when=FIRST_COMPLETED)
+                    done |= finished
+                pending -= done
+                for future in done:
+                    yield future.result()
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # The consumer may stop early (a client disconnecting); drop work not yet started
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,22 +1,80 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional
 import os
+import contextlib
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from .knowledge_base import KnowledgeBase
+from .answer_cache import SemanticAnswerCache, normalize_query
+from .context_builder import ContextBuilder
+from .conversation_memory import ConversationMemory, looks_like_follow_up
+from .metrics import LLM_REQUESTS, PROMPT_TOKENS, observe_stage, record_cache, record_token_usage, timed
+from .model_router import ModelRouter
+from .scheduler import Overloaded, PriorityScheduler
+from .single_flight import SingleFlight
+
+# Used when no profiles are configured: the original long-form web answer
+DEFAULT_PROFILES = {
+    "web": {
+        "max_tokens": None,
+        "temperature": 0.7,
+        "format_rules": "Format important information in a structured way with bullet points or numbered lists when appropriate."
+    }
+}
+
+# Answer when the language model is overloaded and nothing suitable is cached
+BUSY_MESSAGE = ("We're receiving a lot of questions right now and couldn't answer this one in time. "
+                "Please try again in a minute, or contact the university directly.")
 
 class ChatService:
-    def __init__(self, knowledge_base: KnowledgeBase, openai_api_key: str):
-        """Initialize chat service with knowledge base and OpenAI API key."""
+    def __init__(self, knowledge_base: KnowledgeBase, openai_api_key: str,
+                 answer_cache: Optional[SemanticAnswerCache] = None,
+                 profiles: Optional[Dict[str, Dict[str, Any]]] = None, router: Optional[ModelRouter] = None,
+                 context_builder: Optional[ContextBuilder] = None, retrieval_candidates: int = 8,
+                 memory: Optional[ConversationMemory] = None, scheduler: Optional[PriorityScheduler] = None,
+                 institution: str = "Savitribai Phule Pune University"):
+        """Initialize chat service with knowledge base and OpenAI API key.
+        
+        profiles maps a channel ("web", "sms", "voice") to its max_tokens,
+        temperature, format_rules and optionally a fixed model and
+        context_tokens budget; unknown channels use "web". router picks the
+        model when a profile does not. retrieval_candidates chunks are
+        retrieved and context_builder merges, diversifies and trims them to
+        the token budget. With memory, calls that pass a conversation_id
+        have follow-up questions rewritten as standalone ones before
+        retrieval, so the answer prompt, cache and coalescing stay history-free.
+        scheduler admits LLM calls by channel priority; a shed call is
+        answered from the cache or with the profile's busy_message.
+        institution names the college the assistant answers for.
+        """
         self.knowledge_base = knowledge_base
-        self.llm = ChatOpenAI(
-            openai_api_key=openai_api_key,
-            model_name="gpt-4",
-            temperature=0.7,
-        )
+        self.institution = institution
+        self.openai_api_key = openai_api_key
+        self.profiles = profiles or DEFAULT_PROFILES
+        self.router = router or ModelRouter("gpt-4", "gpt-4", enabled=False)
+        self._llms: Dict[tuple, ChatOpenAI] = {}
+        self._llms_lock = threading.Lock()
+        self.context_builder = context_builder or ContextBuilder()
+        self.retrieval_candidates = retrieval_candidates
+        self.scheduler = scheduler
+        
+        # Answers are only valid for the index they were generated from
+        self.answer_cache = answer_cache
+        if self.answer_cache is not None:
+            self.knowledge_base.add_index_listener(self.answer_cache.clear)
+        
+        # Identical questions asked at the same time share one retrieval and LLM call
+        self._in_flight = SingleFlight("chat")
+        
+        # Turns that drop out of a conversation's window are summarized off the request path, in order
+        self.memory = memory
+        self._summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-summary") if memory else None
         
         # Define system prompt
         self.system_prompt = """
-        You are a helpful assistant for Savitribai Phule Pune University Support Hub. You provide accurate information about 
+        You are a helpful assistant for {institution} Support Hub. You provide accurate information about 
         the university's courses, admissions, facilities, faculty, research, exams, fees, scholarships and student life.
         
         When answering:
@@ -26,7 +84,7 @@ class ChatService:
         - Do not make up information.
         - Maintain a professional, friendly tone.
         - Address the user respectfully.
-        - Format important information in a structured way with bullet points or numbered lists when appropriate.
+        - {format_rules}
         
         Here is relevant information from the university knowledge base to help answer the query:
         {context}
@@ -36,44 +94,426 @@ class ChatService:
         self.chat_prompt = ChatPromptTemplate.from_messages([
             ("system", self.system_prompt),
             ("human", "{question}")
+        ]).partial(institution=institution)
+        
+        # Prompts for resolving follow-ups and folding old turns into the rolling summary
+        self.condense_prompt = ChatPromptTemplate.from_messages([
+            ("system", "Rewrite the user's latest message as a standalone question about {institution} "
+                       "that can be understood without the conversation. Keep it short, keep the user's wording where "
+                       "possible and only output the question.\n\n"
+                       "Summary of the conversation so far: {summary}\n\nRecent turns:\n{turns}"),
+            ("human", "{question}")
+        ]).partial(institution=institution)
+        self.summary_prompt = ChatPromptTemplate.from_messages([
+            ("system", "Update the summary of a conversation with a university support assistant. Keep the topics, "
+                       "courses, dates and other facts the user may refer back to, in at most 80 words. "
+                       "Only output the summary."),
+            ("human", "Current summary: {summary}\n\nTurns to add:\n{turns}")
         ])
     
-    def get_response(self, user_query: str) -> Dict[str, Any]:
-        """Get response for user query."""
-        # Query knowledge base
-        relevant_docs = self.knowledge_base.query_knowledge_base(user_query, k=3)
+    def _profile(self, channel: str) -> Dict[str, Any]:
+        return self.profiles.get(channel) or self.profiles.get("web") or DEFAULT_PROFILES["web"]
+    
+    def _select_llm(self, user_query: str, channel: str) -> ChatOpenAI:
+        """Return the chat model for a query: the channel's fixed model or the router's choice."""
+        profile = self._profile(channel)
+        model = profile.get("model") or self.router.route(user_query)
+        LLM_REQUESTS.inc(channel=channel, model=model)
+        return self._get_llm(model, profile.get("max_tokens"), profile.get("temperature", 0.7))
+    
+    def _get_llm(self, model: str, max_tokens: Optional[int], temperature: float) -> ChatOpenAI:
+        """Return a shared client for a model and generation settings."""
+        key = (model, max_tokens, temperature)
+        with self._llms_lock:
+            llm = self._llms.get(key)
+            if llm is None:
+                llm = self._llms[key] = ChatOpenAI(
+                    openai_api_key=self.openai_api_key,
+                    model_name=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream_usage=True,  # Report token counts on streamed answers too
+                )
+        return llm
+    
+    def _llm_slot(self, channel: str, cost: float):
+        """Hold a scheduler slot for an LLM call; a no-op without a scheduler."""
+        return self.scheduler.slot(channel, cost) if self.scheduler is not None else contextlib.nullcontext()
+    
+    def _allm_slot(self, channel: str, cost: float):
+        return self.scheduler.aslot(channel, cost) if self.scheduler is not None else contextlib.nullcontext()
+    
+    def _llm_cost(self, prompt_tokens: int, channel: str) -> int:
+        """Estimate the tokens a call will use, as counted against the tokens-per-minute quota."""
+        return prompt_tokens + (self._profile(channel).get("max_tokens") or 500)
+    
+    def _shed_response(self, user_query: str, channel: str, embedding: Optional[List[float]]) -> Dict[str, Any]:
+        """Answer without the language model: a cached answer from any channel, else a canned one."""
+        if self.answer_cache is not None and embedding is not None:
+            cached = self.answer_cache.lookup(user_query, embedding, namespace=None)
+            if cached is not None:
+                return cached
+        return {
+            "response": self._profile(channel).get("busy_message", BUSY_MESSAGE),
+            "prompt_tokens": 0,
+            "shed": True
+        }
+    
+    def _conversation(self, conversation_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if self.memory is None or not conversation_id:
+            return None
+        return self.memory.get(conversation_id)
+    
+    def _format_turns(self, turns: List[tuple]) -> str:
+        return "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in turns)
+    
+    def _condense_messages(self, user_query: str, conversation: Optional[Dict[str, Any]]):
+        """Return the prompt that rewrites a follow-up as a standalone question, or None if not needed."""
+        if not conversation or not conversation["turns"] or not looks_like_follow_up(user_query):
+            return None
+        return self.condense_prompt.format_messages(
+            summary=conversation["summary"] or "(none)",
+            turns=self._format_turns(conversation["turns"]),
+            question=user_query
+        )
+    
+    def _standalone_question(self, user_query: str, conversation: Optional[Dict[str, Any]], channel: str) -> str:
+        """Rewrite a follow-up using the conversation so retrieval sees a self-contained question."""
+        messages = self._condense_messages(user_query, conversation)
+        if messages is None:
+            return user_query
+        try:
+            llm = self._get_llm(self.router.small_model, 100, 0)
+            with self._llm_slot(channel, 400), timed("condense"):
+                response = llm.invoke(messages)
+            record_token_usage(response)
+            return response.content.strip() or user_query
+        except Overloaded:
+            return user_query
+        except Exception as e:
+            print(f"Error condensing follow-up question: {str(e)}")
+            return user_query
+    
+    async def _astandalone_question(self, user_query: str, conversation: Optional[Dict[str, Any]], channel: str) -> str:
+        """Async _standalone_question."""
+        messages = self._condense_messages(user_query, conversation)
+        if messages is None:
+            return user_query
+        try:
+            llm = self._get_llm(self.router.small_model, 100, 0)
+            async with self._allm_slot(channel, 400):
+                with timed("condense"):
+                    response = await llm.ainvoke(messages)
+            record_token_usage(response)
+            return response.content.strip() or user_query
+        except Overloaded:
+            return user_query
+        except Exception as e:
+            print(f"Error condensing follow-up question: {str(e)}")
+            return user_query
+    
+    def _remember(self, conversation_id: Optional[str], question: str, response_data: Dict[str, Any]):
+        """Record a turn and fold turns that left the window into the summary in the background."""
+        if self.memory is None or not conversation_id or response_data.get("shed"):
+            return
+        overflow = self.memory.append(conversation_id, question, response_data["response"])
+        if overflow:
+            self._summarizer.submit(self._fold_into_summary, conversation_id, overflow)
+    
+    def _fold_into_summary(self, conversation_id: str, turns: List[tuple]):
+        conversation = self.memory.get(conversation_id)
+        if conversation is None:
+            return
+        summary = conversation["summary"]
+        try:
+            llm = self._get_llm(self.router.small_model, 150, 0)
+            with self._llm_slot("background", 600), timed("summarize"):
+                response = llm.invoke(self.summary_prompt.format_messages(
+                    summary=summary or "(none)", turns=self._format_turns(turns)))
+            record_token_usage(response)
+            summary = response.content.strip()
+        except Exception as e:
+            print(f"Error summarizing conversation: {str(e)}")
+            # Keep at least the topics so later follow-ups can still be resolved
+            topics = "; ".join(question for question, _ in turns)
+            summary = f"{summary} Earlier the user asked about: {topics}".strip()
+        self.memory.set_summary(conversation_id, summary)
+    
+    def _lookup_cached_answer(self, user_query: str, channel: str, embedding: Optional[List[float]] = None):
+        """Return (cached answer, query embedding); the answer is None on a miss."""
+        if self.answer_cache is None:
+            return None, embedding
         
-        # Prepare context from relevant documents
-        context = "\n\n".join([f"Source: {doc['source']}\nContent: {doc['content']}" 
-                              for doc in relevant_docs])
+        # Identical wording needs no embedding at all
+        cached = self.answer_cache.lookup_exact(user_query, namespace=channel)
+        if cached is not None:
+            record_cache("answer", True)
+            return cached, embedding
         
-        # If no relevant documents found
-        if not context:
-            context = "No specific information found in the knowledge base."
+        if embedding is None:
+            embedding = self.knowledge_base.embed_query(user_query)
+        with timed("answer_cache_lookup"):
+            cached = self.answer_cache.lookup(user_query, embedding, namespace=channel)
+        record_cache("answer", cached is not None)
+        return cached, embedding
+    
+    async def _alookup_cached_answer(self, user_query: str, channel: str):
+        """Async _lookup_cached_answer."""
+        if self.answer_cache is None:
+            return None, None
         
-        # Format prompt with context and question
-        formatted_prompt = self.chat_prompt.format(
-            context=context,
-            question=user_query
-        )
+        cached = self.answer_cache.lookup_exact(user_query, namespace=channel)
+        if cached is not None:
+            record_cache("answer", True)
+            return cached, None
         
-        # Get response from language model
-        response = self.llm.invoke(formatted_prompt)
+        embedding = await self.knowledge_base.aembed_query(user_query)
+        with timed("answer_cache_lookup"):
+            cached = self.answer_cache.lookup(user_query, embedding, namespace=channel)
+        record_cache("answer", cached is not None)
+        return cached, embedding
+    
+    def _prepare_prompt(self, user_query: str, channel: str, embedding: Optional[List[float]] = None):
+        """Retrieve relevant documents and build the prompt for a query.
         
+        Returns (documents used, prompt, prompt token count).
+        """
+        # Query knowledge base
+        with timed("retrieval"):
+            relevant_docs = self.knowledge_base.query_knowledge_base(
+                user_query, k=self.retrieval_candidates, embedding=embedding)
+        return self._format_prompt(user_query, relevant_docs, channel)
+    
+    async def _aprepare_prompt(self, user_query: str, channel: str, embedding: Optional[List[float]] = None):
+        """Async _prepare_prompt."""
+        with timed("retrieval"):
+            relevant_docs = await self.knowledge_base.aquery_knowledge_base(
+                user_query, k=self.retrieval_candidates, embedding=embedding)
+        return self._format_prompt(user_query, relevant_docs, channel)
+    
+    def _format_prompt(self, user_query: str, relevant_docs: List[Dict[str, Any]], channel: str = "web"):
+        """Build the prompt for a query from retrieved documents, within the channel's context budget."""
+        profile = self._profile(channel)
+        
+        with timed("prompt_build"):
+            # Merge overlapping chunks, diversify and trim to the token budget
+            context, used_docs, _ = self.context_builder.build(relevant_docs, profile.get("context_tokens"))
+            
+            # If no relevant documents found
+            if not context:
+                context = "No specific information found in the knowledge base."
+            
+            # Format prompt with context and question
+            formatted_prompt = self.chat_prompt.format(
+                context=context,
+                question=user_query,
+                format_rules=profile["format_rules"]
+            )
+            prompt_tokens = self.context_builder.count_tokens(formatted_prompt)
+        
+        PROMPT_TOKENS.observe(prompt_tokens, channel=channel)
+        return used_docs, formatted_prompt, prompt_tokens
+    
+    def _build_response(self, content: str, relevant_docs: List[Dict[str, Any]], prompt_tokens: int) -> Dict[str, Any]:
+        """Build the response payload shared by the blocking and streaming endpoints."""
         # Extract sources for citation
         sources = list(set([doc['source'] for doc in relevant_docs]))
         
         return {
-            "response": response.content,
+            "response": content,
+            "prompt_tokens": prompt_tokens,
             # "sources": sources
         }
     
-    def get_response_for_sms(self, user_query: str) -> str:
+    def get_response(self, user_query: str, use_cache: bool = True, channel: str = "web",
+                     conversation_id: Optional[str] = None) -> Dict[str, Any]:
+        """Get response for user query, shaped for the channel; use_cache=False forces a fresh answer.
+        
+        Concurrent calls for the same normalized query are coalesced into one.
+        conversation_id (e.g. "web:<session>" or "sms:<number>") enables follow-ups.
+        """
+        question = self._standalone_question(user_query, self._conversation(conversation_id), channel)
+        key = (channel, normalize_query(question), use_cache)
+        response_data = self._in_flight.do(key, self._get_response, question, use_cache, channel)
+        self._remember(conversation_id, question, response_data)
+        return response_data
+    
+    def _get_response(self, user_query: str, use_cache: bool, channel: str) -> Dict[str, Any]:
+        cached, embedding = self._lookup_cached_answer(user_query, channel) if use_cache else (None, None)
+        if cached is not None:
+            return cached
+        
+        relevant_docs, formatted_prompt, prompt_tokens = self._prepare_prompt(user_query, channel, embedding)
+        return self._generate(user_query, channel, embedding, relevant_docs, formatted_prompt, prompt_tokens)
+    
+    def get_response_for_retrieved(self, user_query: str, relevant_docs: List[Dict[str, Any]],
+                                   embedding: List[float], channel: str = "web", use_cache: bool = True,
+                                   priority: Optional[str] = None) -> Dict[str, Any]:
+        """Answer a query whose embedding and retrieval the caller already did (see BatchRunner).
+        
+        Cached answers and coalescing work as in get_response; there is no
+        conversation memory. priority is the scheduler channel of the LLM
+        call, e.g. "background" so bulk jobs yield to live users.
+        """
+        key = (channel, normalize_query(user_query), use_cache)
+        return self._in_flight.do(key, self._get_retrieved_response, user_query, relevant_docs, embedding,
+                                  channel, use_cache, priority)
+    
+    def _get_retrieved_response(self, user_query: str, relevant_docs: List[Dict[str, Any]], embedding: List[float],
+                                channel: str, use_cache: bool, priority: Optional[str]) -> Dict[str, Any]:
+        if use_cache:
+            cached, _ = self._lookup_cached_answer(user_query, channel, embedding)
+            if cached is not None:
+                return cached
+        
+        used_docs, formatted_prompt, prompt_tokens = self._format_prompt(user_query, relevant_docs, channel)
+        return self._generate(user_query, channel, embedding, used_docs, formatted_prompt, prompt_tokens, priority)
+    
+    def _generate(self, user_query: str, channel: str, embedding: Optional[List[float]],
+                  relevant_docs: List[Dict[str, Any]], formatted_prompt: str, prompt_tokens: int,
+                  priority: Optional[str] = None) -> Dict[str, Any]:
+        """Get the answer to a built prompt from the language model and cache it."""
+        llm = self._select_llm(user_query, channel)
+        try:
+            with self._llm_slot(priority or channel, self._llm_cost(prompt_tokens, channel)), timed("llm"):
+                response = llm.invoke(formatted_prompt)
+        except Overloaded:
+            return self._shed_response(user_query, channel, embedding)
+        record_token_usage(response)
+        
+        response_data = self._build_response(response.content, relevant_docs, prompt_tokens)
+        if self.answer_cache is not None:
+            if embedding is None:
+                embedding = self.knowledge_base.embed_query(user_query)
+            self.answer_cache.store(user_query, embedding, response_data, namespace=channel)
+        return response_data
+    
+    def stream_response(self, user_query: str, channel: str = "web",
+                        conversation_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the response for a user query as token events followed by a final event.
+        
+        Yields {"token": str} as the language model produces output, then
+        {"done": True, **payload} where payload matches get_response().
+        """
+        user_query = self._standalone_question(user_query, self._conversation(conversation_id), channel)
+        cached, embedding = self._lookup_cached_answer(user_query, channel)
+        if cached is not None:
+            self._remember(conversation_id, user_query, cached)
+            yield {"token": cached["response"]}
+            yield {"done": True, **cached}
+            return
+        
+        relevant_docs, formatted_prompt, prompt_tokens = self._prepare_prompt(user_query, channel, embedding)
+        
+        parts = []
+        llm = self._select_llm(user_query, channel)
+        start = time.perf_counter()
+        try:
+            with self._llm_slot(channel, self._llm_cost(prompt_tokens, channel)), timed("llm"):
+                for chunk in llm.stream(formatted_prompt):
+                    record_token_usage(chunk)
+                    if chunk.content:
+                        if not parts:
+                            observe_stage("llm_first_token", time.perf_counter() - start)
+                        parts.append(chunk.content)
+                        yield {"token": chunk.content}
+        except Overloaded:
+            shed = self._shed_response(user_query, channel, embedding)
+            yield {"token": shed["response"]}
+            yield {"done": True, **shed}
+            return
+        
+        response_data = self._build_response("".join(parts), relevant_docs, prompt_tokens)
+        if self.answer_cache is not None:
+            self.answer_cache.store(user_query, embedding, response_data, namespace=channel)
+        self._remember(conversation_id, user_query, response_data)
+        yield {"done": True, **response_data}
+    
+    async def aget_response(self, user_query: str, use_cache: bool = True, channel: str = "web",
+                            conversation_id: Optional[str] = None) -> Dict[str, Any]:
+        """Async get_response: embedding, retrieval and the LLM call are awaited."""
+        question = await self._astandalone_question(user_query, self._conversation(conversation_id), channel)
+        key = (channel, normalize_query(question), use_cache)
+        response_data = await self._in_flight.ado(key, self._aget_response, question, use_cache, channel)
+        self._remember(conversation_id, question, response_data)
+        return response_data
+    
+    async def _aget_response(self, user_query: str, use_cache: bool, channel: str) -> Dict[str, Any]:
+        cached, embedding = await self._alookup_cached_answer(user_query, channel) if use_cache else (None, None)
+        if cached is not None:
+            return cached
+        
+        relevant_docs, formatted_prompt, prompt_tokens = await self._aprepare_prompt(user_query, channel, embedding)
+        
+        # Get response from language model
+        llm = self._select_llm(user_query, channel)
+        try:
+            async with self._allm_slot(channel, self._llm_cost(prompt_tokens, channel)):
+                with timed("llm"):
+                    response = await llm.ainvoke(formatted_prompt)
+        except Overloaded:
+            return self._shed_response(user_query, channel, embedding)
+        record_token_usage(response)
+        
+        response_data = self._build_response(response.content, relevant_docs, prompt_tokens)
+        if self.answer_cache is not None:
+            if embedding is None:
+                embedding = await self.knowledge_base.aembed_query(user_query)
+            self.answer_cache.store(user_query, embedding, response_data, namespace=channel)
+        return response_data
+    
+    async def astream_response(self, user_query: str, channel: str = "web",
+                               conversation_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async stream_response."""
+        user_query = await self._astandalone_question(user_query, self._conversation(conversation_id), channel)
+        cached, embedding = await self._alookup_cached_answer(user_query, channel)
+        if cached is not None:
+            self._remember(conversation_id, user_query, cached)
+            yield {"token": cached["response"]}
+            yield {"done": True, **cached}
+            return
+        
+        relevant_docs, formatted_prompt, prompt_tokens = await self._aprepare_prompt(user_query, channel, embedding)
+        
+        parts = []
+        llm = self._select_llm(user_query, channel)
+        start = time.perf_counter()
+        try:
+            async with self._allm_slot(channel, self._llm_cost(prompt_tokens, channel)):
+                with timed("llm"):
+                    async for chunk in llm.astream(formatted_prompt):
+                        record_token_usage(chunk)
+                        if chunk.content:
+                            if not parts:
+                                observe_stage("llm_first_token", time.perf_counter() - start)
+                            parts.append(chunk.content)
+                            yield {"token": chunk.content}
+        except Overloaded:
+            shed = self._shed_response(user_query, channel, embedding)
+            yield {"token": shed["response"]}
+            yield {"done": True, **shed}
+            return
+        
+        response_data = self._build_response("".join(parts), relevant_docs, prompt_tokens)
+        if self.answer_cache is not None:
+            self.answer_cache.store(user_query, embedding, response_data, namespace=channel)
+        self._remember(conversation_id, user_query, response_data)
+        yield {"done": True, **response_data}
+    
+    def get_response_for_sms(self, user_query: str, conversation_id: Optional[str] = None) -> str:
         """Get response formatted for SMS - shorter and more concise."""
-        response_data = self.get_response(user_query)
+        return self._format_for_sms(self.get_response(user_query, channel="sms", conversation_id=conversation_id))
+    
+    async def aget_response_for_sms(self, user_query: str, conversation_id: Optional[str] = None) -> str:
+        """Async get_response_for_sms."""
+        return self._format_for_sms(
+            await self.aget_response(user_query, channel="sms", conversation_id=conversation_id))
+    
+    def _format_for_sms(self, response_data: Dict[str, Any]) -> str:
+        """Fit a response into an SMS."""
         response_text = response_data["response"]
         
-        # Truncate if too long for SMS (keep under 1600 characters)
+        # The SMS profile keeps answers short; truncation is only a safety net (keep under 1600 characters)
         if len(response_text) > 1500:
             response_text = response_text[:1450] + "... [Response truncated due to length]"
         
@@ -0,0 +1,144 @@
+import re
+from typing import Any, Dict, List, Tuple
+
+from langchain.docstore.document import Document
+
+from .tokens import get_encoding
+from .ingestion import render_table_row
+
+# Bump when chunk boundaries or content change, so stores built with older chunks are rebuilt
+CHUNKER_VERSION = 1
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class StructuredChunker:
+    def __init__(self, chunk_tokens: int = 256, overlap_tokens: int = 32, model: str = "gpt-4"):
+        """Split extracted blocks (see ingestion.extract_blocks) into token-sized chunks.
+
+        Chunks never cross a heading, and each starts with its heading path
+        (e.g. "Fee Structure 2025-26 > Undergraduate Programs") so a single
+        row or bullet can be retrieved and answered from on its own. Text is
+        split on line, then sentence boundaries, with overlap_tokens of
+        trailing lines repeated in the next chunk of the same section. Table
+        rows are never split; every chunk of a table repeats its header row.
+        The heading path, table header and PDF page are kept as metadata.
+        """
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding = get_encoding(model)
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Settings that change the chunks; stored in the manifest to detect when a rebuild is needed."""
+        return {
+            "method": "structured",
+            "version": CHUNKER_VERSION,
+            "chunk_tokens": self.chunk_tokens,
+            "overlap_tokens": self.overlap_tokens
+        }
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text))
+
+    def split(self, blocks: List[Dict[str, Any]], source: str) -> List[Document]:
+        """Return the chunks of one document's blocks, in document order."""
+        chunks: List[Document] = []
+        headings: List[Tuple[int, str]] = []
+
+        for block in blocks:
+            if block["kind"] == "heading":
+                # A heading closes every open heading at its level or deeper
+                while headings and headings[-1][0] >= block["level"]:
+                    headings.pop()
+                headings.append((block["level"], block["text"]))
+                continue
+
+            section = " > ".join(text for _, text in headings)
+            metadata = {"source": source, "section": section}
+            if "page" in block:
+                metadata["page"] = block["page"]
+
+            if block["kind"] == "table":
+                chunks.extend(self._split_table(block["rows"], section, metadata))
+            else:
+                chunks.extend(self._split_text(block["text"], section, metadata))
+        return chunks
+
+    def _chunk(self, section: str, lines: List[str], metadata: Dict[str, Any]) -> Document:
+        content = "\n".join(([section] if section else []) + lines)
+        return Document(page_content=content, metadata=dict(metadata))
+
+    def _units(self, text: str, budget: int) -> List[Tuple[str, int]]:
+        """Return (piece, tokens) of text, one per line; lines longer than budget are split at sentences or tokens.
+
+        Pieces that continue a line start with a space rather than a newline.
+        """
+        units = []
+        for line in text.split("\n"):
+            if not line.strip():
+                continue
+            tokens = self.count_tokens(line)
+            if tokens <= budget:
+                units.append(("\n" + line, tokens))
+                continue
+            separator = "\n"
+            for sentence in SENTENCE_END.split(line):
+                encoded = self.encoding.encode(sentence)
+                for start in range(0, len(encoded), budget):
+                    units.append((separator + self.encoding.decode(encoded[start:start + budget]),
+                                  min(budget, len(encoded) - start)))
+                    separator = " "
+        return units
+
+    def _join(self, section: str, units: List[Tuple[str, int]], metadata: Dict[str, Any]) -> Document:
+        text = "".join(piece for piece, _ in units)[1:]
+        return self._chunk(section, [text], metadata)
+
+    def _split_text(self, text: str, section: str, metadata: Dict[str, Any]) -> List[Document]:
+        budget = max(16, self.chunk_tokens - (self.count_tokens(section) + 1 if section else 0))
+        chunks = []
+        current: List[Tuple[str, int]] = []
+        current_tokens = 0
+
+        for unit in self._units(text, budget):
+            if current and current_tokens + unit[1] + 1 > budget:
+                chunks.append(self._join(section, current, metadata))
+                # Carry whole trailing lines, up to overlap_tokens, into the next chunk
+                overlap: List[Tuple[str, int]] = []
+                overlap_tokens = 0
+                for previous in reversed(current):
+                    if overlap_tokens + previous[1] + 1 > self.overlap_tokens or len(overlap) + 1 == len(current):
+                        break
+                    overlap.insert(0, previous)
+                    overlap_tokens += previous[1] + 1
+                current, current_tokens = overlap, overlap_tokens
+            current.append(unit)
+            current_tokens += unit[1] + 1
+
+        if current:
+            chunks.append(self._join(section, current, metadata))
+        return chunks
+
+    def _split_table(self, rows: List[List[str]], section: str, metadata: Dict[str, Any]) -> List[Document]:
+        header = render_table_row(rows[0])
+        metadata = {**metadata, "table_header": header}
+        lines = [render_table_row(row) for row in rows[1:]]
+        if not lines:
+            return [self._chunk(section, [header], metadata)]
+
+        budget = max(16, self.chunk_tokens - self.count_tokens(header)
+                     - (self.count_tokens(section) + 1 if section else 0))
+        chunks = []
+        current: List[str] = []
+        current_tokens = 0
+        for line in lines:
+            tokens = self.count_tokens(line) + 1
+            if current and current_tokens + tokens > budget:
+                chunks.append(self._chunk(section, [header] + current, metadata))
+                current, current_tokens = [], 0
+            current.append(line)
+            current_tokens += tokens
+        chunks.append(self._chunk(section, [header] + current, metadata))
+        return chunks
+
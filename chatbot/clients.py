@@ -0,0 +1,238 @@
+import time
+import asyncio
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+import boto3
+import httpx
+import requests
+from botocore.config import Config as BotoConfig
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Statuses worth retrying and counting against the upstream's health
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RateLimited(Exception):
+    """Raised when an upstream still answers 429 after retries, so a scheduler slot can drain its bucket."""
+    status_code = 429
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Fail fast after failure_threshold consecutive failures, retrying after reset_timeout."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Return True if a call may go through; half-open lets a single probe call in."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+_session_lock = threading.Lock()
+_sessions: Dict[Tuple, requests.Session] = {}
+_s3_lock = threading.Lock()
+_s3_clients: Dict[Tuple, Any] = {}
+
+
+def get_http_session(pool_size: int = 20, retries: int = 2, backoff: float = 0.5) -> requests.Session:
+    """Return a shared keep-alive session with a bounded connection pool and retry policy."""
+    key = (pool_size, retries, backoff)
+    with _session_lock:
+        session = _sessions.get(key)
+        if session is None:
+            retry = Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(["GET", "POST", "PUT", "HEAD"]),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[key] = session
+        return session
+
+
+def get_s3_client(aws_access_key: Optional[str] = None, aws_secret_key: Optional[str] = None,
+                  endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                  pool_size: int = 20, retries: int = 3, connect_timeout: float = 3.0, read_timeout: float = 10.0):
+    """Return a long-lived S3 client shared by the whole process.
+
+    endpoint_url points the client at S3-compatible servers such as MinIO or
+    moto for local testing.
+    """
+    key = (aws_access_key, endpoint_url, region, pool_size, retries, connect_timeout, read_timeout)
+    with _s3_lock:
+        client = _s3_clients.get(key)
+        if client is None:
+            client = boto3.client(
+                's3',
+                aws_access_key_id=aws_access_key,
+                aws_secret_access_key=aws_secret_key,
+                endpoint_url=endpoint_url,
+                region_name=region,
+                config=BotoConfig(
+                    max_pool_connections=pool_size,
+                    connect_timeout=connect_timeout,
+                    read_timeout=read_timeout,
+                    retries={"max_attempts": retries, "mode": "standard"}
+                )
+            )
+            _s3_clients[key] = client
+        return client
+
+
+class ElevenLabsClient:
+    def __init__(self, api_key: str, base_url: str = "https://api.elevenlabs.io",
+                 session: Optional[requests.Session] = None, connect_timeout: float = 3.0,
+                 read_timeout: float = 30.0, breaker: Optional[CircuitBreaker] = None,
+                 retries: int = 2, backoff: float = 0.5, pool_size: int = 20):
+        """HTTP client for the ElevenLabs text-to-speech API.
+
+        Calls share a pooled keep-alive session, are bounded by timeouts and
+        retried by the session's retry policy. A circuit breaker refuses calls
+        while the API is failing so callers can fall back immediately. The
+        async variant uses a pooled httpx client with the same retries.
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.session = session or get_http_session()
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop = None
+
+    def _request_parts(self, voice_id: str, text: str, model_id: str, voice_settings: Dict[str, Any]):
+        url = f"{self.base_url}/v1/text-to-speech/{voice_id}"
+
+        headers = {
+            "Accept": "audio/mpeg",
+            "Content-Type": "application/json",
+            "xi-api-key": self.api_key
+        }
+
+        data = {
+            "text": text,
+            "model_id": model_id,
+            "voice_settings": voice_settings
+        }
+        return url, headers, data
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the pooled async client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    def synthesize(self, voice_id: str, text: str, model_id: str, voice_settings: Dict[str, Any]) -> Optional[bytes]:
+        """Render text and return MP3 bytes, or None on failure or while the circuit is open.
+
+        Raises RateLimited if ElevenLabs still answers 429 after retries.
+        """
+        if not self.breaker.allow():
+            print("ElevenLabs circuit open; skipping synthesis.")
+            return None
+
+        url, headers, data = self._request_parts(voice_id, text, model_id, voice_settings)
+
+        try:
+            response = self.session.post(url, json=data, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            print(f"Error calling ElevenLabs API: {str(e)}")
+            return None
+
+        if response.status_code != 200:
+            # Only upstream trouble trips the breaker; a bad request is our problem
+            if response.status_code in RETRY_STATUSES:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            print(f"Error from ElevenLabs API: {response.text}")
+            if response.status_code == 429:
+                raise RateLimited(response.text)
+            return None
+
+        self.breaker.record_success()
+        return response.content
+
+    async def asynthesize(self, voice_id: str, text: str, model_id: str, voice_settings: Dict[str, Any]) -> Optional[bytes]:
+        """Async synthesize with bounded retries and backoff."""
+        if not self.breaker.allow():
+            print("ElevenLabs circuit open; skipping synthesis.")
+            return None
+
+        url, headers, data = self._request_parts(voice_id, text, model_id, voice_settings)
+        client = self._get_async_client()
+
+        status_code = None
+        for attempt in range(self.retries + 1):
+            try:
+                response = await client.post(url, json=data, headers=headers)
+            except httpx.HTTPError as e:
+                status_code = None
+                error = str(e)
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return response.content
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    print(f"Error from ElevenLabs API: {response.text}")
+                    return None
+                status_code = response.status_code
+                error = response.text
+
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+
+        self.breaker.record_failure()
+        print(f"Error calling ElevenLabs API: {error}")
+        if status_code == 429:
+            raise RateLimited(error)
+        return None
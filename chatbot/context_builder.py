@@ -0,0 +1,133 @@
+import math
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from .hybrid_search import tokenize
+from .tokens import get_encoding
+
+
+def _merge_overlap(first: str, second: str, min_overlap: int = 20) -> Optional[str]:
+    """Join two chunks if second starts with text that ends first; return None if they do not overlap."""
+    probe = second[:min_overlap]
+    if len(probe) < min_overlap:
+        return None
+    # Chunks repeat at most a few lines of overlap, so only the tail of first can match
+    start = first.find(probe, max(0, len(first) - 600))
+    while start != -1:
+        if second.startswith(first[start:]):
+            return first + second[len(first) - start:]
+        start = first.find(probe, start + 1)
+    return None
+
+
+def _split_heading(doc: Dict[str, Any]) -> Tuple[str, str]:
+    """Split a retrieved chunk into (heading path line, body); the line is empty if it has none."""
+    section = doc.get("section")
+    if section and doc["content"].startswith(section + "\n"):
+        return section + "\n", doc["content"][len(section) + 1:]
+    return "", doc["content"]
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    if not dot:
+        return 0.0
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm
+
+
+class ContextBuilder:
+    def __init__(self, token_budget: int = 800, max_chunks: int = 4, mmr_lambda: float = 0.7,
+                 model: str = "gpt-4"):
+        """Assemble retrieved chunks into a prompt context that fits a token budget.
+
+        Overlapping neighbours from the same document are merged, duplicates
+        dropped, and the rest ordered by maximal marginal relevance so
+        near-identical chunks do not crowd out other sources.
+        """
+        self.token_budget = token_budget
+        self.max_chunks = max_chunks
+        self.mmr_lambda = mmr_lambda
+        self.encoding = get_encoding(model)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text))
+
+    def merge_neighbours(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge chunks of the same source whose text overlaps and drop contained duplicates.
+
+        docs are in relevance order; a merged chunk keeps the best rank of its parts.
+        """
+        merged: List[Dict[str, Any]] = []
+        for doc in docs:
+            doc = dict(doc)
+            changed = True
+            while changed:
+                changed = False
+                for i, other in enumerate(merged):
+                    if other["source"] != doc["source"] or other.get("section", "") != doc.get("section", ""):
+                        continue
+                    # Chunks of a section all start with its heading path; compare what follows it
+                    heading, body = _split_heading(doc)
+                    _, other_body = _split_heading(other)
+                    if body in other_body:
+                        combined = other_body
+                    elif other_body in body:
+                        combined = body
+                    else:
+                        combined = (_merge_overlap(other_body, body)
+                                    or _merge_overlap(body, other_body))
+                    if combined is None:
+                        continue
+                    # Fold the earlier (better ranked) chunk into this one and look again
+                    doc = {**other, "content": heading + combined}
+                    del merged[i]
+                    changed = True
+                    break
+            merged.append(doc)
+            merged.sort(key=lambda item: item["rank"])
+        return merged
+
+    def select_mmr(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Order docs by maximal marginal relevance: relevance by rank, redundancy by term overlap."""
+        if not docs:
+            return []
+        vectors = [Counter(tokenize(doc["content"])) for doc in docs]
+        worst = max(doc["rank"] for doc in docs) + 1
+        relevance = [1 - doc["rank"] / worst for doc in docs]
+
+        selected: List[int] = []
+        remaining = list(range(len(docs)))
+        while remaining and len(selected) < self.max_chunks:
+            def score(i: int) -> float:
+                redundancy = max((_cosine(vectors[i], vectors[j]) for j in selected), default=0.0)
+                return self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+            best = max(remaining, key=score)
+            selected.append(best)
+            remaining.remove(best)
+        return [docs[i] for i in selected]
+
+    def build(self, docs: List[Dict[str, Any]], token_budget: Optional[int] = None) -> Tuple[str, List[Dict[str, Any]], int]:
+        """Return (context text, docs used, context tokens) for retrieved docs in relevance order."""
+        budget = token_budget or self.token_budget
+        ranked = [{**doc, "rank": rank} for rank, doc in enumerate(docs)]
+        candidates = self.select_mmr(self.merge_neighbours(ranked))
+
+        blocks, used, tokens = [], [], 0
+        for doc in candidates:
+            block = f"Source: {doc['source']}\nContent: {doc['content']}"
+            block_tokens = self.count_tokens(block) + 2  # Separator between blocks
+            if tokens + block_tokens <= budget:
+                blocks.append(block)
+                used.append(doc)
+                tokens += block_tokens
+                continue
+
+            # Trim the chunk that does not fit to what is left, if that is still worthwhile
+            remaining = budget - tokens - 2
+            if remaining >= 64:
+                blocks.append(self.encoding.decode(self.encoding.encode(block)[:remaining]))
+                used.append(doc)
+                tokens += remaining + 2
+            break
+        return "\n\n".join(blocks), used, tokens
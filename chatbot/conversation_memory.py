@@ -0,0 +1,87 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Wording that only makes sense with earlier turns ("and for that course?", "what about hostels?")
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(and|also|what about|how about|then|so)\b|"
+    r"\b(it|its|that|this|those|these|they|them|their|same|above|previous|earlier|else|mentioned)\b",
+    re.IGNORECASE
+)
+
+
+def looks_like_follow_up(question: str) -> bool:
+    """Return True if a question probably refers back to earlier turns."""
+    return len(question.split()) <= 3 or FOLLOW_UP_PATTERN.search(question) is not None
+
+
+class ConversationMemory:
+    def __init__(self, max_conversations: int = 5000, ttl_seconds: int = 1800, max_turns: int = 4,
+                 max_answer_chars: int = 500, max_summary_chars: int = 800):
+        """Recent turns per conversation (web session or phone number), bounded by TTL and LRU.
+
+        Only the last max_turns turns are kept verbatim; older ones are
+        handed back by append() to be folded into the rolling summary, so
+        what a conversation contributes to a prompt stays the same size.
+        Answers are stored truncated since only their gist is needed to
+        resolve follow-up questions.
+        """
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.max_answer_chars = max_answer_chars
+        self.max_summary_chars = max_summary_chars
+
+        self._lock = threading.Lock()
+        # conversation id -> {"summary": str, "turns": [(question, answer)], "updated": float}
+        self._conversations: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _expire(self, now: float):
+        """Drop conversations idle for longer than the TTL. Caller holds the lock."""
+        while self._conversations:
+            conversation_id, conversation = next(iter(self._conversations.items()))
+            if now - conversation["updated"] <= self.ttl_seconds:
+                break
+            del self._conversations[conversation_id]
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Return {"summary", "turns"} for a conversation, or None if it is new or expired."""
+        with self._lock:
+            self._expire(time.time())
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return None
+            return {"summary": conversation["summary"], "turns": list(conversation["turns"])}
+
+    def append(self, conversation_id: str, question: str, answer: str) -> List[Tuple[str, str]]:
+        """Record a turn and return the turns that fell out of the window, oldest first."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                conversation = self._conversations[conversation_id] = {"summary": "", "turns": [], "updated": now}
+
+            conversation["turns"].append((question, answer[:self.max_answer_chars]))
+            conversation["updated"] = now
+            self._conversations.move_to_end(conversation_id)
+
+            overflow = conversation["turns"][:-self.max_turns]
+            del conversation["turns"][:-self.max_turns]
+
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+            return overflow
+
+    def set_summary(self, conversation_id: str, summary: str):
+        """Replace the rolling summary of a conversation, if it is still held."""
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is not None:
+                conversation["summary"] = summary[:self.max_summary_chars]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"conversations": len(self._conversations), "max_conversations": self.max_conversations}
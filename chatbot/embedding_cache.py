@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are then only serialized within a process
+    fcntl = None
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+KEY_BYTES = 32  # raw SHA-256 digest
+
+
+class EmbeddingStore:
+    def __init__(self, cache_dir: Path, model_name: str):
+        """Open an append-only on-disk embedding store for one embedding model.
+
+        Vectors live in a memory-mapped float32 matrix (vectors.f32) and the
+        SHA-256 digests of their texts in a parallel key file (keys.bin), one
+        32-byte record per row. Every worker and tenant using the same
+        model shares the files, so appends take a file lock and rows
+        appended by other processes are picked up on a miss.
+        """
+        safe_name = re.sub(r"[^\w.-]", "_", model_name)
+        self.store_dir = Path(cache_dir) / safe_name
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+
+        self.vectors_path = self.store_dir / "vectors.f32"
+        self.keys_path = self.store_dir / "keys.bin"
+        self.meta_path = self.store_dir / "meta.json"
+        self.lock_path = self.store_dir / ".lock"
+
+        self._lock = threading.Lock()
+        self.dim: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+        # Rows of the files read into _rows so far
+        self._row_count = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._load()
+
+    @staticmethod
+    def key_for(text: str) -> bytes:
+        """Return the content key of a chunk of text."""
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold the lock that serializes appends across processes."""
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _disk_rows(self) -> int:
+        """Return the number of complete rows on disk."""
+        key_rows = os.path.getsize(self.keys_path) // KEY_BYTES if self.keys_path.exists() else 0
+        vector_rows = os.path.getsize(self.vectors_path) // (4 * self.dim) if self.vectors_path.exists() else 0
+        # Vectors are written before keys, so a crash can only leave extra vectors
+        return min(key_rows, vector_rows)
+
+    def _load(self):
+        """Read keys appended since the last load and map the vector matrix; call with _lock held."""
+        if self.dim is None:
+            if not self.meta_path.exists():
+                return
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+
+        rows = self._disk_rows()
+        if rows <= self._row_count:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._row_count * KEY_BYTES)
+            keys = f.read((rows - self._row_count) * KEY_BYTES)
+        for i in range(rows - self._row_count):
+            self._rows[keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]] = self._row_count + i
+        self._row_count = rows
+        self._remap(rows)
+
+    def _remap(self, rows: int):
+        """Memory-map the first rows of the vector file."""
+        if rows == 0:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return the stored vector for each text, or None where it is missing."""
+        with self._lock:
+            keys = [self.key_for(text) for text in texts]
+            if any(key not in self._rows for key in keys):
+                # Another process may have stored them since
+                self._load()
+            results = []
+            for key in keys:
+                row = self._rows.get(key)
+                results.append(None if row is None else self._matrix[row].tolist())
+            return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Append vectors for texts that are not stored yet."""
+        with self._lock, self._file_lock():
+            # Row numbers come from the files, which other processes may have appended to
+            self._load()
+            new_keys = []
+            new_vectors = []
+            seen = set()
+            for text, vector in zip(texts, vectors):
+                key = self.key_for(text)
+                if key in self._rows or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_vectors.append(vector)
+            if not new_keys:
+                return
+
+            matrix = np.asarray(new_vectors, dtype=np.float32)
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+
+            # Drop vectors left without keys by a crash, so the new rows line up with their keys
+            start = self._disk_rows()
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(start * 4 * self.dim)
+            with open(self.keys_path, "ab") as f:
+                f.truncate(start * KEY_BYTES)
+
+            # Append vectors first so every key on disk points at a complete row
+            with open(self.vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new_keys))
+
+            for offset, key in enumerate(new_keys):
+                self._rows[key] = start + offset
+            self._row_count = start + len(new_keys)
+            self._remap(self._row_count)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore, batch_size: int = 512):
+        """Wrap an embedder so document embeddings are served from an EmbeddingStore."""
+        self.embeddings = embeddings
+        self.store = store
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, sending only those not already stored to the embedder."""
+        results = self.store.get_many(texts)
+
+        # Deduplicate misses so repeated chunks are embedded once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, results) if vector is None))
+        self.hits += len(texts) - sum(1 for vector in results if vector is None)
+        self.misses += len(missing)
+
+        computed = {}
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            vectors = self.embeddings.embed_documents(batch)
+            self.store.put_many(batch, vectors)
+            computed.update(zip(batch, vectors))
+
+        if missing:
+            print(f"Embedding cache: {len(texts) - len(missing)} reused, {len(missing)} embedded.")
+
+        return [vector if vector is not None else computed[text] for text, vector in zip(texts, results)]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query; queries are not persisted."""
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries in one request; like embed_query, they are not persisted."""
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query without blocking the event loop."""
+        return await self.embeddings.aembed_query(text)
@@ -0,0 +1,73 @@
+from pathlib import Path
+from typing import Optional
+
+from .knowledge_base import KnowledgeBase
+from .chat_service import ChatService
+from .answer_cache import SemanticAnswerCache
+from .context_builder import ContextBuilder
+from .conversation_memory import ConversationMemory
+from .model_router import ModelRouter
+from .scheduler import PriorityScheduler
+
+# Both the web app and batch_query.py build their services here, from the config module passed as settings,
+# so a setting added for one is used by the other
+
+
+def tenant_store_dir(settings, tenant_id: str) -> Path:
+    """Return where a tenant's vector store is published."""
+    if tenant_id == settings.DEFAULT_TENANT:
+        return settings.VECTOR_STORE_DIR
+    return settings.TENANT_STORE_DIR / tenant_id
+
+
+def create_knowledge_base(settings, data_dir: Path, vector_store_dir: Path) -> KnowledgeBase:
+    """Create a knowledge base; every tenant shares the embedding cache."""
+    return KnowledgeBase(
+        data_dir=data_dir,
+        vector_store_dir=vector_store_dir,
+        openai_api_key=settings.OPENAI_API_KEY,
+        embedding_cache_dir=settings.EMBEDDING_CACHE_DIR,
+        ingest_workers=settings.INGEST_WORKERS,
+        embed_batch_size=settings.BATCH_SIZE,
+        retrieval_mode=settings.RETRIEVAL_MODE,
+        keyword_confidence=settings.KEYWORD_CONFIDENCE,
+        query_cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+        index_params=settings.INDEX_PARAMS,
+        chunk_tokens=settings.CHUNK_TOKENS,
+        chunk_overlap_tokens=settings.CHUNK_OVERLAP_TOKENS
+    )
+
+
+def create_context_builder(settings) -> ContextBuilder:
+    return ContextBuilder(
+        token_budget=settings.CONTEXT_TOKEN_BUDGET,
+        max_chunks=settings.CONTEXT_MAX_CHUNKS,
+        mmr_lambda=settings.CONTEXT_MMR_LAMBDA,
+        model=settings.CHAT_MODEL_LARGE
+    )
+
+
+def create_chat_service(settings, knowledge_base: KnowledgeBase, institution: str, scheduler: PriorityScheduler,
+                        context_builder: Optional[ContextBuilder] = None,
+                        memory: Optional[ConversationMemory] = None) -> ChatService:
+    """Create a chat service with its own answer cache over a knowledge base.
+
+    The web app passes the context builder and conversation memory its
+    tenants share; without them the service gets its own.
+    """
+    return ChatService(
+        knowledge_base=knowledge_base,
+        openai_api_key=settings.OPENAI_API_KEY,
+        answer_cache=SemanticAnswerCache(
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+            ttl_seconds=settings.ANSWER_CACHE_TTL,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+        ),
+        profiles=settings.CHANNEL_PROFILES,
+        router=ModelRouter(settings.CHAT_MODEL_SMALL, settings.CHAT_MODEL_LARGE, enabled=settings.MODEL_ROUTING),
+        context_builder=context_builder or create_context_builder(settings),
+        memory=memory,
+        scheduler=scheduler,
+        retrieval_candidates=settings.CONTEXT_CANDIDATES,
+        institution=institution
+    )
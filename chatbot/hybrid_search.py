@@ -0,0 +1,114 @@
+import re
+import math
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or please
+tell the their there this to what when where which who why will with you your about
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into alphanumeric terms, dropping stopwords."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        """Build an in-memory BM25 inverted index; document ids are positions in texts."""
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(texts)
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+        for position, text in enumerate(texts):
+            terms = Counter(tokenize(text))
+            self.doc_lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                self.postings[term].append((position, frequency))
+
+        self.avg_length = sum(self.doc_lengths) / self.doc_count if self.doc_count else 0.0
+        self.idf = {
+            term: math.log(1 + (self.doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return up to k (position, score) pairs, best first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, frequency in self.postings[term]:
+                norm = 1 - self.b + self.b * self.doc_lengths[position] / (self.avg_length or 1)
+                scores[position] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+    def max_score(self, query: str) -> float:
+        """Upper bound of a document's score for query, used to normalize scores to [0, 1]."""
+        return sum(self.idf.get(term, 0.0) * (self.k1 + 1) for term in set(tokenize(query)))
+
+    def is_confident(self, query: str, results: List[Tuple[int, float]], threshold: float) -> bool:
+        """Return True if the best keyword hit covers enough of the query's weighted terms.
+
+        Overlapping chunks often tie for the top spot, so only the normalized
+        score of the best hit is checked, not its margin over the next one.
+        """
+        if not results:
+            return False
+        upper = self.max_score(query)
+        return bool(upper) and results[0][1] / upper >= threshold
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked lists of ids into one list of (id, score), best first."""
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = 1024):
+        """Thread-safe LRU of query text -> embedding."""
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """Return the cached embedding for query, or None."""
+        key = self._key(query)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, query: str, embedding: List[float]):
+        """Cache an embedding, evicting the least recently used past max_entries."""
+        key = self._key(query)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,262 @@
+import os
+import re
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+import PyPDF2
+import docx
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+# Below this many files a process pool costs more than it saves
+MIN_FILES_FOR_POOL = 4
+
+# Workers fork from a single-threaded server process that has imported this module once; forking the
+# threaded app process could copy locks other threads hold (logging, the embedding cache, HTTP pools)
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _POOL_CONTEXT = multiprocessing.get_context("forkserver")
+    _POOL_CONTEXT.set_forkserver_preload([__name__])
+else:  # Windows
+    _POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+
+# A document is extracted as a list of blocks in reading order, picklable for the process pool:
+#   {"kind": "heading", "level": 1, "text": ...}, {"kind": "text", "text": ...} or {"kind": "table", "rows": [[...]]}
+# with "page" (1-based) added for PDFs.
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+
+
+def _heading_level(line: str, caps_headings: bool = False) -> Optional[Tuple[int, str]]:
+    """Return (level, text) if a line is a markdown heading, or with caps_headings a short ALL CAPS title."""
+    match = MARKDOWN_HEADING.match(line.strip())
+    if match:
+        return len(match.group(1)), match.group(2)
+    stripped = line.strip()
+    if (caps_headings and 3 <= len(stripped) <= 80 and stripped.isupper() and any(c.isalpha() for c in stripped)
+            and not stripped.endswith(('.', ',', ':', ';'))):
+        return 1, stripped
+    return None
+
+
+def _line_blocks(lines: Iterable[str], page: Optional[int] = None,
+                 caps_headings: bool = False) -> List[Dict[str, Any]]:
+    """Group plain text lines into heading and text blocks."""
+    blocks, paragraph = [], []
+
+    def flush():
+        if paragraph:
+            blocks.append({"kind": "text", "text": "\n".join(paragraph)})
+            paragraph.clear()
+
+    for line in lines:
+        line = line.rstrip()
+        heading = _heading_level(line, caps_headings) if line.strip() else None
+        if heading:
+            flush()
+            blocks.append({"kind": "heading", "level": heading[0], "text": heading[1]})
+        elif line.strip():
+            paragraph.append(line)
+        else:
+            flush()
+    flush()
+
+    if page is not None:
+        for block in blocks:
+            block["page"] = page
+    return blocks
+
+
+def extract_blocks_from_pdf(file_path: str) -> List[Dict[str, Any]]:
+    """Extract heading and text blocks from a PDF file, page by page.
+
+    PDFs carry no heading or table markup, so headings are recognised from
+    markdown markers and ALL CAPS lines, and table rows stay lines of text.
+    """
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        blocks = []
+        for page_number, page in enumerate(pdf_reader.pages, start=1):
+            blocks.extend(_line_blocks((page.extract_text() or "").splitlines(), page_number, caps_headings=True))
+    return blocks
+
+
+def _docx_heading_level(paragraph: Paragraph) -> Optional[int]:
+    """Return the heading level of a Word paragraph from its style (Title, Heading 1-9), if any."""
+    style = paragraph.style.name if paragraph.style is not None else ""
+    if style == "Title":
+        return 1
+    if style.startswith("Heading "):
+        level = style[len("Heading "):]
+        if level.isdigit():
+            return int(level)
+    return None
+
+
+def _docx_table_rows(table: Table) -> List[List[str]]:
+    """Return the non-empty rows of a table as cell texts; merged cells are kept once."""
+    rows = []
+    for row in table.rows:
+        cells, seen = [], set()
+        for cell in row.cells:
+            # python-docx repeats a merged cell once per grid column it spans
+            if id(cell._tc) in seen:
+                continue
+            seen.add(id(cell._tc))
+            cells.append(" ".join(cell.text.split()))
+        if any(cells):
+            rows.append(cells)
+    return rows
+
+
+def extract_blocks_from_docx(file_path: str) -> List[Dict[str, Any]]:
+    """Extract heading, text and table blocks from a DOCX file in document order.
+
+    Headings come from Word heading styles or markdown markers in the text.
+    """
+    doc = docx.Document(file_path)
+    blocks = []
+
+    # Walk the body so tables stay where they appear between paragraphs
+    for element in doc.element.body.iterchildren():
+        if element.tag == qn("w:p"):
+            paragraph = Paragraph(element, doc)
+            level = _docx_heading_level(paragraph)
+            if level is not None and paragraph.text.strip():
+                blocks.append({"kind": "heading", "level": level, "text": paragraph.text.strip()})
+            else:
+                blocks.extend(_line_blocks(paragraph.text.splitlines()))
+        elif element.tag == qn("w:tbl"):
+            rows = _docx_table_rows(Table(element, doc))
+            if rows:
+                blocks.append({"kind": "table", "rows": rows})
+
+    return _merge_text_blocks(blocks)
+
+
+def _merge_text_blocks(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Join consecutive text blocks (one per DOCX paragraph) into one."""
+    merged = []
+    for block in blocks:
+        if block["kind"] == "text" and merged and merged[-1]["kind"] == "text":
+            merged[-1] = {**merged[-1], "text": merged[-1]["text"] + "\n" + block["text"]}
+        else:
+            merged.append(block)
+    return merged
+
+
+def extract_blocks_from_txt(file_path: str) -> List[Dict[str, Any]]:
+    """Extract heading and text blocks from a plain text file."""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return _line_blocks(f.read().splitlines())
+
+
+def extract_blocks(file_path: str) -> List[Dict[str, Any]]:
+    """Extract the blocks of a supported file based on its extension."""
+    file = file_path.lower()
+    if file.endswith('.pdf'):
+        return extract_blocks_from_pdf(file_path)
+    if file.endswith('.docx'):
+        return extract_blocks_from_docx(file_path)
+    if file.endswith('.txt'):
+        return extract_blocks_from_txt(file_path)
+    raise ValueError(f"Unsupported file type: {file_path}")
+
+
+def render_table_row(cells: List[str]) -> str:
+    return " | ".join(cell for cell in cells if cell)
+
+
+def blocks_to_text(blocks: List[Dict[str, Any]]) -> str:
+    """Render blocks as plain text, with table rows joined by ' | '."""
+    lines = []
+    for block in blocks:
+        if block["kind"] == "table":
+            lines.extend(render_table_row(row) for row in block["rows"])
+        else:
+            lines.append(block["text"])
+    return "\n".join(lines)
+
+
+def extract_text(file_path: str) -> str:
+    """Extract text from a supported file based on its extension."""
+    return blocks_to_text(extract_blocks(file_path))
+
+
+def _block_chars(blocks: List[Dict[str, Any]]) -> int:
+    chars = 0
+    for block in blocks:
+        if block["kind"] == "table":
+            chars += sum(len(cell) for row in block["rows"] for cell in row)
+        else:
+            chars += len(block["text"])
+    return chars
+
+
+def _extract_worker(file_path: str) -> Tuple[str, List[Dict[str, Any]], float, Optional[str]]:
+    """Extract one file in a worker process; return (path, blocks, seconds, error)."""
+    start = time.perf_counter()
+    try:
+        blocks = extract_blocks(file_path)
+        return file_path, blocks, time.perf_counter() - start, None
+    except Exception as e:
+        return file_path, [], time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+class IngestStats:
+    def __init__(self):
+        """Collect per-file extraction timings and failures."""
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def record(self, file_path: str, seconds: float, chars: int, error: Optional[str]):
+        """Record the outcome of one file."""
+        self.files[file_path] = {"seconds": seconds, "chars": chars, "error": error}
+
+    def finish(self):
+        """Stop the wall clock."""
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def failures(self) -> Dict[str, str]:
+        return {path: info["error"] for path, info in self.files.items() if info["error"]}
+
+    def report(self) -> str:
+        """Return a printable summary with the slowest files and every failure."""
+        lines = []
+        total = len(self.files)
+        failed = self.failures
+        cpu_seconds = sum(info["seconds"] for info in self.files.values())
+        lines.append(f"Extracted {total - len(failed)}/{total} files in {self.elapsed:.2f}s "
+                     f"({cpu_seconds:.2f}s extraction time, {len(failed)} failed).")
+        for path, info in sorted(self.files.items(), key=lambda item: -item[1]["seconds"]):
+            status = f"FAILED {info['error']}" if info["error"] else f"{info['chars']} chars"
+            lines.append(f"  {os.path.basename(path)}: {info['seconds']:.2f}s, {status}")
+        return "\n".join(lines)
+
+
+def iter_extracted(file_paths: List[str], stats: IngestStats,
+                   max_workers: Optional[int] = None) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Yield (path, blocks) for each file as soon as it is extracted.
+
+    Extraction runs in a process pool so PDF parsing uses every core; files are
+    yielded in completion order. Failures are recorded in stats, not raised.
+    """
+    if len(file_paths) < MIN_FILES_FOR_POOL or max_workers == 1:
+        results = (_extract_worker(file_path) for file_path in file_paths)
+        for file_path, blocks, seconds, error in results:
+            stats.record(file_path, seconds, _block_chars(blocks), error)
+            if blocks:
+                yield file_path, blocks
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_POOL_CONTEXT) as executor:
+        futures = [executor.submit(_extract_worker, file_path) for file_path in file_paths]
+        for future in as_completed(futures):
+            file_path, blocks, seconds, error = future.result()
+            stats.record(file_path, seconds, _block_chars(blocks), error)
+            if blocks:
+                yield file_path, blocks
@@ -1,155 +1,718 @@
 import os
-import PyPDF2
-from typing import List, Dict, Any
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 from pathlib import Path
-import docx
-import re
+import json
+import time
+import uuid
+import hashlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are then only serialized within a process
+    fcntl = None
+
+import numpy as np
 
 # Import necessary LangChain components
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.docstore.document import Document
 
+from .embedding_cache import CachedEmbeddings, EmbeddingStore
+from .ingestion import IngestStats, blocks_to_text, iter_extracted
+from .chunking import StructuredChunker
+from .hybrid_search import BM25Index, QueryEmbeddingCache, reciprocal_rank_fusion
+from .vector_store_format import (current_store_path, index_params_of, is_native_store, load_native,
+                                  new_version_path, publish_version, read_meta, remove_old_versions, save_native)
+from .ann_index import build_params, make_index_params
+from .metrics import observe_stage, record_cache, timed
+
 class KnowledgeBase:
-    def __init__(self, data_dir: Path, vector_store_dir: Path, openai_api_key: str):
+    def __init__(self, data_dir: Path, vector_store_dir: Path, openai_api_key: str,
+                 embedding_cache_dir: Optional[Path] = None, ingest_workers: Optional[int] = None,
+                 embed_batch_size: int = 256, retrieval_mode: str = "hybrid",
+                 keyword_confidence: float = 0.6, query_cache_size: int = 1024,
+                 index_params: Optional[Dict[str, Any]] = None, chunk_tokens: int = 256,
+                 chunk_overlap_tokens: int = 32):
         """Initialize the knowledge base with data directory and vector store directory."""
         self.data_dir = data_dir
         self.vector_store_dir = vector_store_dir
-        self.embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
+        
+        # Chunk embeddings are persisted by content hash so rebuilds only embed new text
+        base_embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
+        self.embeddings = CachedEmbeddings(
+            base_embeddings,
+            EmbeddingStore(embedding_cache_dir or vector_store_dir / "embedding_cache", base_embeddings.model)
+        )
+        
+        # Extraction runs in a process pool; chunks are embedded in batches as they arrive
+        self.ingest_workers = ingest_workers
+        self.embed_batch_size = embed_batch_size
+        self.last_ingest_stats: Optional[IngestStats] = None
+        
+        # Documents are chunked by heading section and table, into chunks of at most chunk_tokens
+        self.chunker = StructuredChunker(chunk_tokens, chunk_overlap_tokens)
+        
+        # Retrieval: cached query embeddings plus a local BM25 index over the same chunks
+        self.retrieval_mode = retrieval_mode
+        self.keyword_confidence = keyword_confidence
+        self.query_embedding_cache = QueryEmbeddingCache(query_cache_size)
+        # BM25 index and the vector store it was built from
+        self._keyword_index: Optional[Tuple[FAISS, BM25Index]] = None
+        
+        # Index type and vector storage of saved versions (flat/ivf/hnsw, float32/float16/pq)
+        self.index_params = make_index_params(index_params)
+        
+        # Served store and the published version directory it was loaded from
         self.vector_store = None
+        self.vector_store_path = vector_store_dir / "pune_university_faiss"
+        self.loaded_version: Optional[Path] = None
+        self.last_update_report: Optional[Dict[str, Any]] = None
+        self.last_build_error: Optional[str] = None
+        self._index_listeners: List[Callable[[], None]] = []
         
-    def load_documents(self) -> List[Document]:
-        """Load documents from data directory."""
-        documents = []
+        # Background rebuilds: one per process, and one across workers via a lock file
+        self._build_mutex = threading.Lock()
+        self._building = False
+        self._watcher: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._reload_requested = False
+    
+    def add_index_listener(self, callback: Callable[[], None]):
+        """Register a callback run whenever the vector store is loaded or rebuilt."""
+        self._index_listeners.append(callback)
+    
+    def _notify_index_changed(self):
+        """Tell listeners (e.g. answer caches) that the index has changed."""
+        for callback in self._index_listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in index listener: {str(e)}")
+        
+    def _iter_data_files(self) -> List[str]:
+        """Return the paths of all supported files in the data directory."""
+        file_paths = []
         
         # Walk through the data directory
         for root, _, files in os.walk(self.data_dir):
             for file in files:
-                file_path = os.path.join(root, file)
-                
-                # Process PDF files
-                if file.lower().endswith('.pdf'):
-                    text = self._extract_text_from_pdf(file_path)
-                    if text:
-                        documents.append(Document(page_content=text, metadata={"source": file_path}))
-                
-                # Process DOCX files
-                elif file.lower().endswith('.docx'):
-                    text = self._extract_text_from_docx(file_path)
-                    if text:
-                        documents.append(Document(page_content=text, metadata={"source": file_path}))
-                
-                # Process TXT files
-                elif file.lower().endswith('.txt'):
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        text = f.read()
-                    if text:
-                        documents.append(Document(page_content=text, metadata={"source": file_path}))
+                if file.lower().endswith(('.pdf', '.docx', '.txt')):
+                    file_paths.append(os.path.join(root, file))
         
-        return documents
+        return sorted(file_paths)
     
-    def _extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from a PDF file."""
+    def _iter_blocks(self, file_paths: Optional[List[str]] = None) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Yield (path, blocks) as files are extracted, in parallel, from the data directory or the given files."""
+        if file_paths is None:
+            file_paths = self._iter_data_files()
+        
+        stats = IngestStats()
         try:
-            text = ""
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text() + "\n"
-            return text
-        except Exception as e:
-            print(f"Error extracting text from PDF {file_path}: {str(e)}")
-            return ""
+            yield from iter_extracted(file_paths, stats, self.ingest_workers)
+        finally:
+            stats.finish()
+            self.last_ingest_stats = stats
+            if stats.files:
+                print(stats.report())
+    
+    def iter_documents(self, file_paths: Optional[List[str]] = None) -> Iterator[Document]:
+        """Yield documents as they are extracted, in parallel, from the data directory or the given files."""
+        for file_path, blocks in self._iter_blocks(file_paths):
+            yield Document(page_content=blocks_to_text(blocks), metadata={"source": file_path})
+    
+    def load_documents(self, file_paths: Optional[List[str]] = None) -> List[Document]:
+        """Load documents from data directory, or only from the given files."""
+        return list(self.iter_documents(file_paths))
     
-    def _extract_text_from_docx(self, file_path: str) -> str:
-        """Extract text from a DOCX file."""
+    def _hash_file(self, file_path: str) -> str:
+        """Return the SHA-256 of a file's contents."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load_manifest(self, vector_store_path: Path) -> Optional[Dict[str, Any]]:
+        """Load the per-file manifest stored next to the index, if any."""
+        manifest_path = vector_store_path / "manifest.json"
+        if not manifest_path.exists():
+            return None
         try:
-            doc = docx.Document(file_path)
-            full_text = []
-            
-            # Extract text from paragraphs
-            for para in doc.paragraphs:
-                full_text.append(para.text)
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading manifest {manifest_path}: {str(e)}")
+            return None
+    
+    def _save_manifest(self, vector_store_path: Path, files: Dict[str, Any]):
+        """Write the per-file manifest atomically."""
+        manifest_path = vector_store_path / "manifest.json"
+        tmp_path = manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "chunking": self.chunker.params, "files": files}, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+    
+    def _index_files(self, file_paths: List[str], hashes: Dict[str, str], timings: Dict[str, float],
+                     vector_store: Optional[FAISS] = None):
+        """Stream files through extraction, splitting and embedding into a vector store.
+        
+        Documents are split as soon as they are extracted and chunks are
+        embedded in batches while the remaining files are still being parsed.
+        Returns (vector store or None if nothing was indexed, chunk count,
+        manifest entries keyed by relative path).
+        """
+        entries = {}
+        for file_path in file_paths:
+            relative_path = os.path.relpath(file_path, self.data_dir)
+            entries[relative_path] = {"sha256": hashes[file_path], "ids": []}
+        
+        timings.setdefault("split", 0.0)
+        timings.setdefault("embed", 0.0)
+        pending_chunks, pending_ids = [], []
+        chunk_count = 0
+        
+        def flush(vector_store):
+            start = time.perf_counter()
+            if vector_store is None:
+                vector_store = FAISS.from_documents(pending_chunks, self.embeddings, ids=pending_ids)
+            else:
+                vector_store.add_documents(pending_chunks, ids=pending_ids)
+            timings["embed"] += time.perf_counter() - start
+            pending_chunks.clear()
+            pending_ids.clear()
+            return vector_store
+        
+        start = time.perf_counter()
+        for file_path, blocks in self._iter_blocks(file_paths):
+            split_start = time.perf_counter()
+            chunks = self.chunker.split(blocks, file_path)
+            relative_path = os.path.relpath(file_path, self.data_dir)
             
-            # Extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = []
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            row_text.append(cell.text.strip())
-                    if row_text:
-                        full_text.append(' | '.join(row_text))
+            # Give every chunk a stable id so its vectors can be removed later
+            for chunk in chunks:
+                chunk_id = str(uuid.uuid4())
+                entries[relative_path]["ids"].append(chunk_id)
+                pending_chunks.append(chunk)
+                pending_ids.append(chunk_id)
+            chunk_count += len(chunks)
+            timings["split"] += time.perf_counter() - split_start
             
-            return '\n'.join(full_text)
-        except Exception as e:
-            print(f"Error extracting text from DOCX {file_path}: {str(e)}")
-            return ""
+            if len(pending_chunks) >= self.embed_batch_size:
+                vector_store = flush(vector_store)
+        
+        if pending_chunks:
+            vector_store = flush(vector_store)
+        timings["ingest_total"] = time.perf_counter() - start
+        
+        return vector_store, chunk_count, entries
+    
+    def load_current(self) -> Optional[FAISS]:
+        """Serve the published store if this worker is not serving it yet; return the served store.
+        
+        Loading is a memory map, so this is cheap enough to run whenever
+        another worker may have published a new version.
+        """
+        path = current_store_path(self.vector_store_path)
+        if path == self.loaded_version or not is_native_store(path):
+            return self.vector_store
+        
+        # Memory-mapped and read lazily, so workers share pages and nothing is unpickled
+        with timed("vector_store_load"):
+            vector_store = load_native(path, self.embeddings, search_params={
+                "nprobe": self.index_params["nprobe"], "ef_search": self.index_params["ef_search"]})
+        self._swap(vector_store, path)
+        print(f"Loaded vector store {path.name}.")
+        return vector_store
+    
+    def _swap(self, vector_store: FAISS, path: Path):
+        """Switch queries to another store; in-flight queries finish on the one they started with."""
+        self.vector_store = vector_store
+        self.loaded_version = path
+        self._notify_index_changed()
     
-    def create_or_load_vector_store(self, force_reload: bool = False) -> FAISS:
-        """Create or load the vector store."""
-        vector_store_path = self.vector_store_dir / "pune_university_faiss"
+    def create_or_load_vector_store(self, force_reload: bool = False, incremental: bool = True) -> FAISS:
+        """Create or load the vector store.
         
-        # If vector store exists and not forced to reload, load it
-        if vector_store_path.exists() and not force_reload:
+        With force_reload, the store is brought up to date with the data
+        directory (see rebuild()); otherwise the published store is loaded
+        and only built if there is none.
+        """
+        if not force_reload:
             try:
-                self.vector_store = FAISS.load_local(
-                    str(vector_store_path), 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True  # Add this line
-                )
-                print("Loaded existing vector store.")
-                return self.vector_store
+                vector_store = self.load_current()
+                if vector_store is not None:
+                    return vector_store
             except Exception as e:
                 print(f"Error loading vector store: {str(e)}. Creating new one.")
+        return self.rebuild(incremental)
+    
+    @contextmanager
+    def _build_lock(self) -> Iterator[None]:
+        """Hold the lock that lets only one worker build at a time."""
+        self.vector_store_dir.mkdir(parents=True, exist_ok=True)
+        with self._build_mutex, open(self.vector_store_dir / ".build.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._building = True
+            try:
+                yield
+            finally:
+                self._building = False
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def rebuild(self, incremental: bool = True) -> FAISS:
+        """Bring the store up to date with the data directory, publish it to every worker and serve it.
+        
+        The new version is built in its own directory while the current one
+        keeps serving, then published by replacing the pointer file. If a
+        manifest of file hashes exists and incremental is True, only added or
+        changed files are re-embedded and the vectors of deleted files are
+        removed; otherwise everything is rebuilt. Nothing is published if
+        the data has not changed.
+        """
+        self._build_and_publish(incremental)
+        return self.load_current()
+    
+    def _index_outdated(self, path: Path) -> bool:
+        """Return True if the store at path was built with other index parameters than configured."""
+        meta = read_meta(path)
+        return meta is not None and build_params(index_params_of(meta)["requested"]) != build_params(self.index_params)
+    
+    def _chunking_outdated(self, path: Path) -> bool:
+        """Return True if the store at path was chunked differently than configured (or before chunking was recorded)."""
+        manifest = self._load_manifest(path)
+        return manifest is not None and manifest.get("chunking") != self.chunker.params
+    
+    def _build_and_publish(self, incremental: bool = True):
+        with self._build_lock():
+            # Another worker may have published while this one waited for the lock
+            current_path = current_store_path(self.vector_store_path)
+            version_path = new_version_path(self.vector_store_path)
+            reindex = self._index_outdated(current_path)
+            
+            timings = {}
+            start = time.perf_counter()
+            file_paths = self._iter_data_files()
+            hashes = {file_path: self._hash_file(file_path) for file_path in file_paths}
+            timings["hash"] = time.perf_counter() - start
+            
+            manifest = self._load_manifest(current_path) if incremental else None
+            if manifest is not None and manifest.get("chunking") != self.chunker.params:
+                # Every chunk changes, so nothing can be kept
+                print("Chunking settings changed; rebuilding every file.")
+                manifest = None
+            if manifest is not None:
+                try:
+                    self._update_vector_store(current_path, version_path, manifest["files"],
+                                              file_paths, hashes, timings, reindex)
+                    return
+                except Exception as e:
+                    print(f"Error updating vector store incrementally: {str(e)}. Rebuilding.")
+            
+            # Create new vector store
+            print("Creating new vector store...")
+            vector_store, chunk_count, entries = self._index_files(file_paths, hashes, timings)
+            
+            if vector_store is None:
+                raise ValueError("No documents found in the data directory.")
+            print(f"Loaded {sum(1 for entry in entries.values() if entry['ids'])} documents.")
+            print(f"Split into {chunk_count} chunks.")
+            
+            # Save vector store
+            start = time.perf_counter()
+            save_native(vector_store, version_path, self.index_params)
+            self._save_manifest(version_path, entries)
+            timings["save"] = time.perf_counter() - start
+            print(f"Vector store saved to {version_path}.")
+            
+            self.last_update_report = {
+                "mode": "full",
+                "added": sorted(entries),
+                "changed": [],
+                "removed": [],
+                "unchanged": [],
+                "chunks_added": chunk_count,
+                "chunks_removed": 0,
+                "timings": timings
+            }
+            self._print_update_report()
+            self._publish(version_path)
+    
+    def _publish(self, version_path: Path):
+        """Point every worker at a newly saved version; each loads it on its next check or query."""
+        publish_version(self.vector_store_path, version_path)
+        remove_old_versions(self.vector_store_path)
+    
+    def _update_vector_store(self, current_path: Path, version_path: Path, manifest_files: Dict[str, Any],
+                             file_paths: List[str], hashes: Dict[str, str], timings: Dict[str, float],
+                             reindex: bool = False):
+        """Re-embed only added or changed files of the store at current_path and drop vectors of deleted ones.
+        
+        The store is only loaded if a file changed, since loading a
+        compressed index re-embeds every chunk. With reindex the index is
+        saved with the configured parameters even if no file changed.
+        """
+        current = {os.path.relpath(file_path, self.data_dir): file_path for file_path in file_paths}
+        
+        added = sorted(path for path in current if path not in manifest_files)
+        changed = sorted(path for path in current
+                         if path in manifest_files and manifest_files[path]["sha256"] != hashes[current[path]])
+        removed = sorted(path for path in manifest_files if path not in current)
+        unchanged = sorted(path for path in current if path in manifest_files and path not in changed)
+        
+        if not (added or changed or removed or reindex):
+            self.last_update_report = {
+                "mode": "incremental",
+                "added": [],
+                "changed": [],
+                "removed": [],
+                "unchanged": unchanged,
+                "chunks_added": 0,
+                "chunks_removed": 0,
+                "timings": timings
+            }
+            self._print_update_report()
+            return
+        
+        start = time.perf_counter()
+        vector_store = load_native(current_path, self.embeddings, mmap_index=False)
+        timings["load"] = time.perf_counter() - start
         
-        # Create new vector store
-        print("Creating new vector store...")
-        documents = self.load_documents()
-        print(f"Loaded {len(documents)} documents.")
+        # Remove vectors of deleted and changed files
+        start = time.perf_counter()
+        stale_ids = [chunk_id for path in changed + removed for chunk_id in manifest_files[path]["ids"]]
+        if stale_ids:
+            vector_store.delete(stale_ids)
+        timings["delete"] = time.perf_counter() - start
         
-        if not documents:
+        # Extract, split and embed only what is new
+        to_index = [current[path] for path in added + changed]
+        _, chunk_count, entries = self._index_files(to_index, hashes, timings, vector_store)
+        
+        if vector_store.index.ntotal == 0:
             raise ValueError("No documents found in the data directory.")
         
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        chunks = text_splitter.split_documents(documents)
-        print(f"Split into {len(chunks)} chunks.")
+        files = {path: manifest_files[path] for path in unchanged}
+        files.update(entries)
         
-        # Create vector store
-        self.vector_store = FAISS.from_documents(chunks, self.embeddings)
+        # Save vector store as a new version, unless nothing changed
+        start = time.perf_counter()
+        if stale_ids or chunk_count or reindex:
+            save_native(vector_store, version_path, self.index_params)
+            self._save_manifest(version_path, files)
+        timings["save"] = time.perf_counter() - start
         
-        # Save vector store
-        self.vector_store.save_local(str(vector_store_path))
-        print(f"Vector store saved to {vector_store_path}.")
+        self.last_update_report = {
+            "mode": "incremental",
+            "added": added,
+            "changed": changed,
+            "removed": removed,
+            "unchanged": unchanged,
+            "chunks_added": chunk_count,
+            "chunks_removed": len(stale_ids),
+            "timings": timings
+        }
+        self._print_update_report()
         
-        return self.vector_store
+        if stale_ids or chunk_count or reindex:
+            self._publish(version_path)
     
-    def query_knowledge_base(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Query the knowledge base for relevant information."""
-        if not self.vector_store:
-            self.create_or_load_vector_store()
-        
-        # Perform similarity search
-        docs_and_scores = self.vector_store.similarity_search_with_score(query, k=k)
+    def _data_signature(self) -> List[Tuple[str, int, int]]:
+        """Return (path, size, mtime) of every data file; cheap to compare without hashing."""
+        signature = []
+        for file_path in self._iter_data_files():
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            signature.append((file_path, stat.st_size, stat.st_mtime_ns))
+        return signature
+    
+    def start_watcher(self, interval: float = 30.0, auto_rebuild: bool = True):
+        """Keep this worker on the published store and rebuild in the background when data changes.
         
-        results = []
-        for doc, score in docs_and_scores:
-            # Extract filename from path
-            source = doc.metadata.get("source", "Unknown")
-            filename = os.path.basename(source) if source != "Unknown" else "Unknown"
+        Every interval seconds the pointer file is checked for a version
+        published by another worker. With auto_rebuild, a change in the data
+        directory (and the first check after startup) triggers an
+        incremental rebuild; request_reload() triggers one at any time.
+        """
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval, auto_rebuild),
+                                         name="index-watcher", daemon=True)
+        self._watcher.start()
+    
+    def request_reload(self):
+        """Ask the watcher to rebuild now; returns immediately."""
+        self._reload_requested = True
+        self._wake.set()
+    
+    def _watch(self, interval: float, auto_rebuild: bool):
+        seen_signature = None
+        while True:
+            self._wake.clear()
+            try:
+                signature = self._data_signature() if auto_rebuild else None
+                current_path = current_store_path(self.vector_store_path)
+                published = is_native_store(current_path)
+                if (self._reload_requested or not published or signature != seen_signature
+                        or self._index_outdated(current_path) or self._chunking_outdated(current_path)):
+                    self._reload_requested = False
+                    self._build_and_publish()
+                    self.last_build_error = None
+                seen_signature = signature
+                
+                # Switch to a newer version, unless the store was unloaded to save memory
+                if self.vector_store is not None:
+                    self.load_current()
+            except Exception as e:
+                self.last_build_error = str(e)
+                print(f"Error updating vector store in the background: {str(e)}")
             
-            # Add to results
-            results.append({
-                "content": doc.page_content,
-                "source": filename,
-                "score": float(score)  # Convert to float for JSON serialization
-            })
-        
-        return results
\ No newline at end of file
+            self._wake.wait(timeout=interval)
+    
+    def unload(self):
+        """Stop holding the store in memory; the next query loads it again."""
+        self.vector_store = None
+        self.loaded_version = None
+        self._keyword_index = None
+    
+    def estimated_memory_bytes(self) -> int:
+        """Estimate the memory the published store takes once loaded and searched."""
+        path = current_store_path(self.vector_store_path)
+        try:
+            index_bytes = os.path.getsize(path / "index.faiss")
+            chunk_bytes = os.path.getsize(path / "chunks.jsonl")
+        except OSError:
+            return 0
+        # The BM25 index holds roughly the chunk text again
+        return index_bytes + 2 * chunk_bytes
+    
+    def index_status(self) -> Dict[str, Any]:
+        """Return the served version and the state of background builds in this worker."""
+        vector_store = self.vector_store
+        loaded_version = self.loaded_version
+        report = self.last_update_report
+        meta = read_meta(loaded_version) if loaded_version else None
+        return {
+            "version": loaded_version.name if loaded_version else None,
+            "chunks": vector_store.index.ntotal if vector_store is not None else 0,
+            "index": index_params_of(meta) if meta else None,
+            "building": self._building,
+            "last_update": {key: report[key] for key in ("mode", "added", "changed", "removed")} if report else None,
+            "last_error": self.last_build_error
+        }
+    
+    def _print_update_report(self):
+        """Print what the last build changed and how long each phase took."""
+        report = self.last_update_report
+        print(f"Vector store {report['mode']} update: "
+              f"{len(report['added'])} added, {len(report['changed'])} changed, "
+              f"{len(report['removed'])} removed, {len(report['unchanged'])} unchanged files; "
+              f"{report['chunks_added']} chunks indexed, {report['chunks_removed']} removed.")
+        for phase, seconds in report["timings"].items():
+            print(f"  {phase}: {seconds:.2f}s")
+            observe_stage(f"index_{phase}", seconds)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing recent embeddings of the same text."""
+        embedding = self.query_embedding_cache.get(query)
+        record_cache("query_embedding", embedding is not None)
+        if embedding is None:
+            with timed("embed_query"):
+                embedding = self.embeddings.embed_query(query)
+            self.query_embedding_cache.put(query, embedding)
+        return embedding
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries, sending those not in the query cache in batches of embed_batch_size."""
+        embeddings = [self.query_embedding_cache.get(query) for query in queries]
+        for embedding in embeddings:
+            record_cache("query_embedding", embedding is not None)
+        
+        # Repeated questions are embedded once
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        computed = {}
+        for start in range(0, len(missing), self.embed_batch_size):
+            batch = missing[start:start + self.embed_batch_size]
+            with timed("embed_queries"):
+                vectors = self.embeddings.embed_queries(batch)
+            for query, vector in zip(batch, vectors):
+                self.query_embedding_cache.put(query, vector)
+                computed[query] = vector
+        return [embedding if embedding is not None else computed[query]
+                for query, embedding in zip(queries, embeddings)]
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """Async embed_query; the embedding request does not block the event loop."""
+        embedding = self.query_embedding_cache.get(query)
+        record_cache("query_embedding", embedding is not None)
+        if embedding is None:
+            with timed("embed_query"):
+                embedding = await self.embeddings.aembed_query(query)
+            self.query_embedding_cache.put(query, embedding)
+        return embedding
+    
+    def _document_at(self, vector_store: FAISS, position: int) -> Document:
+        """Return the chunk stored at a vector position."""
+        return vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+    
+    def _get_keyword_index(self, vector_store: FAISS) -> BM25Index:
+        """Build the BM25 index over a store's chunks on first use."""
+        cached = self._keyword_index
+        if cached is not None and cached[0] is vector_store:
+            return cached[1]
+        with timed("bm25_build"):
+            texts = [self._document_at(vector_store, position).page_content
+                     for position in range(vector_store.index.ntotal)]
+            keyword_index = BM25Index(texts)
+        self._keyword_index = (vector_store, keyword_index)
+        return keyword_index
+    
+    def _dense_search(self, vector_store: FAISS, embedding: List[float], k: int) -> List[Tuple[int, float]]:
+        """Return up to k (position, distance) pairs from the FAISS index."""
+        return self._dense_search_many(vector_store, [embedding], k)[0]
+    
+    def _dense_search_many(self, vector_store: FAISS, embeddings: List[List[float]],
+                           k: int) -> List[List[Tuple[int, float]]]:
+        """_dense_search for many embeddings in a single FAISS call."""
+        if not embeddings:
+            return []
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with timed("faiss_search"):
+            distances, positions = vector_store.index.search(vectors, k)
+        return [[(int(position), float(distance)) for position, distance in zip(row_positions, row_distances)
+                 if position != -1]
+                for row_positions, row_distances in zip(positions, distances)]
+    
+    def _fuse(self, vector_store: FAISS, dense_hits: List[Tuple[int, float]],
+              keyword_hits: List[Tuple[int, float]], k: int) -> List[Dict[str, Any]]:
+        """Combine dense and BM25 rankings with reciprocal rank fusion."""
+        fused = reciprocal_rank_fusion([
+            [position for position, _ in dense_hits],
+            [position for position, _ in keyword_hits]
+        ])
+        return [self._format_result(vector_store, position, score) for position, score in fused[:k]]
+    
+    def _serving_store(self) -> Optional[FAISS]:
+        """Return the store to answer a query with, loading a published one if none is served."""
+        vector_store = self.vector_store
+        if vector_store is None:
+            # Building never happens on a request; another worker may have published one though
+            vector_store = self.load_current()
+            if vector_store is None:
+                print("Vector store is not ready yet; answering without context.")
+        return vector_store
+    
+    def query_knowledge_base(self, query: str, k: int = 5, embedding: Optional[List[float]] = None,
+                             mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Query the knowledge base for relevant information.
+        
+        mode is "dense" (FAISS only), "hybrid" (FAISS and BM25 fused with
+        reciprocal rank fusion) or "keyword_first" (hybrid, but a confident
+        BM25 match is returned without embedding the query). In dense mode
+        score is the L2 distance (lower is better); otherwise it is the fused
+        score (higher is better).
+        """
+        # One store for the whole query, even if a new version is swapped in meanwhile
+        vector_store = self._serving_store()
+        if vector_store is None:
+            return []
+        mode = mode or self.retrieval_mode
+        
+        if mode == "dense":
+            # Perform similarity search, reusing the query embedding when the caller has one
+            if embedding is None:
+                embedding = self.embed_query(query)
+            ranked = self._dense_search(vector_store, embedding, k)
+            return [self._format_result(vector_store, position, score) for position, score in ranked]
+        
+        candidates = max(k * 4, 20)
+        keyword_index = self._get_keyword_index(vector_store)
+        with timed("bm25_search"):
+            keyword_hits = keyword_index.search(query, candidates)
+        
+        # Exact terms like course codes or scholarship names do not need the embedding round trip
+        if (mode == "keyword_first" and embedding is None
+                and keyword_index.is_confident(query, keyword_hits, self.keyword_confidence)):
+            return [self._format_result(vector_store, position, score) for position, score in keyword_hits[:k]]
+        
+        if embedding is None:
+            embedding = self.embed_query(query)
+        dense_hits = self._dense_search(vector_store, embedding, candidates)
+        return self._fuse(vector_store, dense_hits, keyword_hits, k)
+    
+    def query_knowledge_base_batch(self, queries: List[str], k: int = 5,
+                                   embeddings: Optional[List[List[float]]] = None,
+                                   mode: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """query_knowledge_base for many queries at once, e.g. for bulk evaluation.
+        
+        Queries are embedded in batches (unless embeddings are given) and
+        searched with one FAISS call; each query's results are the same as
+        query_knowledge_base would return.
+        """
+        vector_store = self._serving_store()
+        if vector_store is None:
+            return [[] for _ in queries]
+        mode = mode or self.retrieval_mode
+        
+        if mode == "dense":
+            if embeddings is None:
+                embeddings = self.embed_queries(queries)
+            return [[self._format_result(vector_store, position, score) for position, score in ranked]
+                    for ranked in self._dense_search_many(vector_store, embeddings, k)]
+        
+        candidates = max(k * 4, 20)
+        keyword_index = self._get_keyword_index(vector_store)
+        with timed("bm25_search"):
+            keyword_hits = [keyword_index.search(query, candidates) for query in queries]
+        
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        if mode == "keyword_first" and embeddings is None:
+            for i, query in enumerate(queries):
+                if keyword_index.is_confident(query, keyword_hits[i], self.keyword_confidence):
+                    results[i] = [self._format_result(vector_store, position, score)
+                                  for position, score in keyword_hits[i][:k]]
+        
+        # Embed and search only the queries keyword matching did not settle
+        remaining = [i for i, result in enumerate(results) if result is None]
+        if embeddings is None:
+            remaining_embeddings = self.embed_queries([queries[i] for i in remaining])
+        else:
+            remaining_embeddings = [embeddings[i] for i in remaining]
+        dense_hits = self._dense_search_many(vector_store, remaining_embeddings, candidates)
+        for i, hits in zip(remaining, dense_hits):
+            results[i] = self._fuse(vector_store, hits, keyword_hits[i], k)
+        return results
+    
+    def _format_result(self, vector_store: FAISS, position: int, score: float) -> Dict[str, Any]:
+        """Turn a vector position and score into a result dictionary."""
+        doc = self._document_at(vector_store, position)
+        
+        # Extract filename from path
+        source = doc.metadata.get("source", "Unknown")
+        filename = os.path.basename(source) if source != "Unknown" else "Unknown"
+        
+        return {
+            "content": doc.page_content,
+            "source": filename,
+            "section": doc.metadata.get("section", ""),
+            "score": float(score)  # Convert to float for JSON serialization
+        }
+    
+    async def aquery_knowledge_base(self, query: str, k: int = 5, embedding: Optional[List[float]] = None,
+                                    mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Async query_knowledge_base: the query is embedded asynchronously and the
+        CPU-bound FAISS/BM25 search runs in a worker thread.
+        """
+        mode = mode or self.retrieval_mode
+        
+        # keyword_first may not need an embedding at all, so let the search decide
+        if embedding is None and mode != "keyword_first":
+            embedding = await self.aembed_query(query)
+        return await asyncio.to_thread(self.query_knowledge_base, query, k, embedding, mode)
@@ -0,0 +1,36 @@
+import re
+
+# Wording that usually needs reasoning over several facts rather than a single lookup
+COMPLEX_PATTERN = re.compile(
+    r"\b(compare|comparison|difference|differences|differ|versus|vs|better|explain|why|"
+    r"pros|cons|advantages?|disadvantages?|recommend|suggest|should i|plan|steps|"
+    r"procedure|process|eligib\w*|calculate|if i)\b"
+)
+
+
+class ModelRouter:
+    def __init__(self, small_model: str, large_model: str, max_simple_words: int = 14, enabled: bool = True):
+        """Send simple factual lookups to a small, fast model and the rest to the large one.
+
+        With enabled=False every query goes to the large model.
+        """
+        self.small_model = small_model
+        self.large_model = large_model
+        self.max_simple_words = max_simple_words
+        self.enabled = enabled
+
+    def is_simple(self, query: str) -> bool:
+        """Return True for short, single questions such as "When does the library open?"."""
+        text = query.lower()
+        if len(text.split()) > self.max_simple_words:
+            return False
+        # Several questions at once need a longer, structured answer
+        if text.count("?") > 1 or " and also " in text:
+            return False
+        return COMPLEX_PATTERN.search(text) is None
+
+    def route(self, query: str) -> str:
+        """Return the model name to answer query with."""
+        if self.enabled and self.is_simple(query):
+            return self.small_model
+        return self.large_model
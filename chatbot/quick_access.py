@@ -0,0 +1,99 @@
+import threading
+from typing import Dict, Any, Optional
+
+from .chat_service import ChatService
+from .voice_service import VoiceService
+
+
+class QuickAccessService:
+    def __init__(self, chat_service: ChatService, queries: Dict[str, str], ttl_seconds: int = 3600,
+                 voice_service: Optional[VoiceService] = None, retry_seconds: int = 30):
+        """Serve precomputed answers for the fixed quick-access categories from memory.
+
+        A background thread regenerates every answer at background priority
+        when the TTL expires or the vector store changes. Answers that were
+        shed, or would be built before a vector store is loaded, are not
+        kept; they are retried after retry_seconds. If voice_service is
+        given, the answer audio is synthesized too so it is already in the
+        audio cache when requested.
+        """
+        self.chat_service = chat_service
+        self.queries = queries
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self.voice_service = voice_service
+
+        self._lock = threading.Lock()
+        self._answers: Dict[str, Dict[str, Any]] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # A rebuilt index makes every precomputed answer stale
+        self.chat_service.knowledge_base.add_index_listener(self._wake.set)
+
+    def start(self):
+        """Precompute the answers in the background and keep them fresh."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="quick-access-refresh", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            complete = self.refresh()
+            # Sleep until the TTL expires or the index changes; retry sooner if answers are missing
+            self._wake.wait(timeout=self.ttl_seconds if complete else self.retry_seconds)
+
+    def _store_ready(self) -> bool:
+        """Return True if answers would be built with context from a loaded vector store."""
+        return self.chat_service.knowledge_base.load_current() is not None
+
+    def refresh(self) -> bool:
+        """Regenerate every quick-access answer; return False if any is missing afterwards."""
+        if not self._store_ready():
+            print("Vector store is not ready yet; quick access answers will be precomputed once it is.")
+            return False
+
+        generated = 0
+        for category, query in self.queries.items():
+            try:
+                answer = self._generate(query)
+            except Exception as e:
+                print(f"Error precomputing quick access answer for {category}: {str(e)}")
+                continue
+            if answer is None:
+                continue
+            with self._lock:
+                self._answers[category] = answer
+            generated += 1
+        print(f"Precomputed {generated}/{len(self.queries)} quick access answers.")
+        return generated == len(self.queries)
+
+    def _generate(self, query: str) -> Optional[Dict[str, Any]]:
+        """Answer query at background priority, so live users go first; return None if the call was shed."""
+        answer = self.chat_service.get_response(query, use_cache=False, channel="background")
+        if answer.get("shed"):
+            return None
+        if self.voice_service is not None:
+            self.voice_service.text_to_speech_for_twilio(answer["response"], channel="background")
+        return answer
+
+    def get(self, category: str) -> Optional[Dict[str, Any]]:
+        """Return the answer for a category, or None if the category is unknown."""
+        if category not in self.queries:
+            return None
+
+        with self._lock:
+            answer = self._answers.get(category)
+        if answer is not None:
+            return answer
+
+        # Not precomputed yet (e.g. a request raced startup): answer this request, and keep the
+        # answer only if it is a real one
+        ready = self._store_ready()
+        answer = self.chat_service.get_response(self.queries[category], use_cache=False)
+        if ready and not answer.get("shed"):
+            with self._lock:
+                self._answers.setdefault(category, answer)
+        return answer
@@ -0,0 +1,240 @@
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from .metrics import REGISTRY, observe_stage
+
+SHED = REGISTRY.counter(
+    "chatbot_shed_requests_total", "Upstream calls refused instead of queued, by reason.",
+    ["scheduler", "channel", "reason"])
+
+# Lower runs first: a caller on the phone cannot wait, a web user can
+CHANNEL_PRIORITIES = {"voice": 0, "sms": 1, "web": 2, "background": 3}
+
+
+class Overloaded(Exception):
+    """Raised when a call is shed rather than queued; callers fall back to a cached or canned answer."""
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """Rate limit in units per minute (tokens for OpenAI, characters for ElevenLabs).
+
+        capacity is the burst allowance and defaults to one minute's worth,
+        matching how the upstream quotas are enforced. A rate of 0 or less
+        disables the limit.
+        """
+        self.enabled = rate_per_minute > 0
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float, max_wait: float) -> Optional[float]:
+        """Take amount units and return how long to wait before using them, or None if that is over max_wait.
+
+        Reservations may drive the bucket negative, so waiting callers are
+        served in the order they reserved.
+        """
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            amount = min(amount, self.capacity)
+            wait = max(0.0, (amount - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= amount
+            return wait
+
+    def drain(self):
+        """Empty the bucket after the upstream rate limited us, so the next calls back off."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+class _Waiter:
+    def __init__(self, channel: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.channel = channel
+        self.granted = False
+        self.cancelled = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def grant(self):
+        """Hand the waiter a slot. Caller holds the scheduler lock."""
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class PriorityScheduler:
+    def __init__(self, name: str, max_concurrent: int = 8, max_queue: int = 20,
+                 max_wait: Optional[Dict[str, float]] = None, bucket: Optional[TokenBucket] = None,
+                 priorities: Optional[Dict[str, int]] = None):
+        """Admit upstream calls (LLM, TTS) by channel priority within a concurrency limit and rate limit.
+
+        At most max_concurrent calls run at once; the rest wait in a queue
+        ordered by channel priority, bounded to max_queue waiters per
+        channel. A call that cannot be queued, or would wait longer than its
+        channel's max_wait (seconds) for a slot or for the rate limit,
+        raises Overloaded straight away instead of timing out upstream.
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait or {}
+        self.bucket = bucket
+        self.priorities = priorities or CHANNEL_PRIORITIES
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queue: List[tuple] = []  # (priority, arrival, waiter)
+        self._queued: Dict[str, int] = {}
+        self._arrivals = itertools.count()
+
+    def _deadline(self, channel: str) -> float:
+        return time.monotonic() + self.max_wait.get(channel, 30.0)
+
+    def _shed(self, channel: str, reason: str):
+        SHED.inc(scheduler=self.name, channel=channel, reason=reason)
+        raise Overloaded(f"{self.name} overloaded ({reason}) for {channel}")
+
+    def _try_enter(self, channel: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Waiter]:
+        """Take a free slot and return None, or queue and return the waiter. Sheds if the queue is full."""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._queue:
+                self._active += 1
+                return None
+            if self._queued.get(channel, 0) >= self.max_queue:
+                self._shed(channel, "queue_full")
+            waiter = _Waiter(channel, loop)
+            heapq.heappush(self._queue, (self.priorities.get(channel, len(self.priorities)), next(self._arrivals), waiter))
+            self._queued[channel] = self._queued.get(channel, 0) + 1
+            return waiter
+
+    def _give_up(self, waiter: _Waiter) -> bool:
+        """Withdraw a waiter that timed out; return False if it was granted a slot meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            self._queued[waiter.channel] -= 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to the highest priority waiters. Caller holds the lock."""
+        while self._queue and self._active < self.max_concurrent:
+            _, _, waiter = heapq.heappop(self._queue)
+            if waiter.cancelled:
+                continue
+            self._queued[waiter.channel] -= 1
+            self._active += 1
+            waiter.grant()
+
+    def _reserve(self, channel: str, cost: float, deadline: float) -> float:
+        """Reserve rate limit for a call holding a slot and return the wait, shedding if it is too long.
+
+        The caller releases the slot if this raises.
+        """
+        if self.bucket is None:
+            return 0.0
+        wait = self.bucket.reserve(cost, max(0.0, deadline - time.monotonic()))
+        if wait is None:
+            self._shed(channel, "rate_limit")
+        return wait
+
+    def _check_upstream_error(self, e: Exception):
+        # A 429 means our limits are looser than the real quota; back off for everyone
+        if self.bucket is not None and getattr(e, "status_code", None) == 429:
+            self.bucket.drain()
+
+    @contextmanager
+    def slot(self, channel: str, cost: float = 1) -> Iterator[None]:
+        """Hold an upstream slot for the block, waiting by priority; raises Overloaded if shed."""
+        start = time.monotonic()
+        deadline = self._deadline(channel)
+        waiter = self._try_enter(channel)
+        if waiter is not None:
+            if not waiter.event.wait(max(0.0, deadline - time.monotonic())) and self._give_up(waiter):
+                self._shed(channel, "timeout")
+
+        # From here on the slot is held, so whatever happens it must be released
+        try:
+            wait = self._reserve(channel, cost, deadline)
+            if wait:
+                time.sleep(wait)
+            observe_stage(f"{self.name}_queue", time.monotonic() - start)
+            try:
+                yield
+            except Exception as e:
+                self._check_upstream_error(e)
+                raise
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self, channel: str, cost: float = 1) -> AsyncIterator[None]:
+        """Async slot(): waiting does not block the event loop."""
+        start = time.monotonic()
+        deadline = self._deadline(channel)
+        waiter = self._try_enter(channel, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(waiter.future, max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                if self._give_up(waiter):
+                    self._shed(channel, "timeout")
+            except asyncio.CancelledError:
+                # The caller went away; hand back the slot if it was granted meanwhile
+                if not self._give_up(waiter):
+                    self._release()
+                raise
+
+        # From here on the slot is held, so whatever happens (cancellation included) it must be released
+        try:
+            wait = self._reserve(channel, cost, deadline)
+            if wait:
+                await asyncio.sleep(wait)
+            observe_stage(f"{self.name}_queue", time.monotonic() - start)
+            try:
+                yield
+            except Exception as e:
+                self._check_upstream_error(e)
+                raise
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self._active,
+                "max_concurrent": self.max_concurrent,
+                "queued": {channel: count for channel, count in self._queued.items() if count}
+            }
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from .metrics import REGISTRY
+
+COALESCED = REGISTRY.counter(
+    "chatbot_coalesced_requests_total", "Calls that joined an identical call already in flight.", ["kind"])
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        """Coalesce concurrent calls with the same key into one execution.
+
+        The first caller for a key runs the function; callers arriving
+        while it is in flight wait for and share its result (or exception).
+        Nothing is kept once the call finishes, so this is not a cache.
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) unless an identical call is in flight, then share its result."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            COALESCED.inc(kind=self.name)
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Async do(); the shared call runs as a task so one caller disconnecting does not cancel it for the rest."""
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None
+            if leader:
+                task = self._tasks[key] = asyncio.get_running_loop().create_task(fn(*args, **kwargs))
+                task.add_done_callback(lambda _: self._forget_task(key, task))
+
+        if not leader:
+            COALESCED.inc(kind=self.name)
+        return await asyncio.shield(task)
+
+    def _forget_task(self, key: Hashable, task: asyncio.Task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
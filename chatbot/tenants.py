@@ -0,0 +1,149 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .chat_service import ChatService
+from .single_flight import SingleFlight
+
+# Tenant-scoped URLs look like /t/<tenant>/api/chat
+TENANT_PREFIX = re.compile(r"^/t/([A-Za-z0-9_-]{1,64})(?=/|$)")
+
+
+def split_tenant_prefix(path: str) -> Tuple[Optional[str], str]:
+    """Split "/t/<tenant>/rest" into (tenant, "/rest"); other paths give (None, path)."""
+    match = TENANT_PREFIX.match(path)
+    if match is None:
+        return None, path
+    return match.group(1), path[match.end():] or "/"
+
+
+def tenant_from_root(root_path: str) -> Optional[str]:
+    """Return the tenant of a script root / ASGI root_path ending in /t/<tenant>."""
+    match = re.search(r"/t/([A-Za-z0-9_-]{1,64})$", root_path or "")
+    return match.group(1) if match else None
+
+
+class TenantPrefixMiddleware:
+    def __init__(self, wsgi_app):
+        """Serve /t/<tenant>/... with the unprefixed routes, keeping the prefix in SCRIPT_NAME.
+
+        url_for() then generates tenant-prefixed links, and the tenant can
+        be read back from request.script_root.
+        """
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        tenant, path = split_tenant_prefix(environ.get("PATH_INFO", ""))
+        if tenant is not None:
+            environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + f"/t/{tenant}"
+            environ["PATH_INFO"] = path
+        return self.wsgi_app(environ, start_response)
+
+
+class TenantRegistry:
+    def __init__(self, tenants: Dict[str, Dict[str, Any]], factory: Callable[[str, Dict[str, Any]], ChatService],
+                 default_tenant: str, memory_budget_bytes: int = 1024 * 1024 * 1024):
+        """Chat services for several colleges, each with its own knowledge base.
+
+        tenants maps a tenant id to its settings ("name", "data_dir",
+        "twilio_numbers"); factory builds a tenant's ChatService on first
+        use, outside the registry lock so a cold tenant never holds up the
+        others. Indexes load on their first query, and once the estimated
+        size of the resident ones exceeds memory_budget_bytes the least
+        recently used are unloaded until their next query.
+        """
+        self.tenants = tenants
+        self.factory = factory
+        self.default_tenant = default_tenant
+        self.memory_budget_bytes = memory_budget_bytes
+
+        self._lock = threading.Lock()
+        self._services: Dict[str, ChatService] = {}
+        self._building = SingleFlight("tenant")
+        # Estimated index size of each tenant, with the store version it was estimated for
+        self._sizes: Dict[str, Tuple[Any, int]] = {}
+        # Tenant ids, least recently used first
+        self._last_used: "OrderedDict[str, None]" = OrderedDict()
+        self._numbers = {self._normalize_number(number): tenant_id
+                         for tenant_id, tenant in tenants.items()
+                         for number in tenant.get("twilio_numbers") or []}
+
+    @staticmethod
+    def _normalize_number(number: str) -> str:
+        return re.sub(r"[^\d+]", "", number or "")
+
+    def add(self, tenant_id: str, chat_service: ChatService):
+        """Register a chat service built elsewhere (e.g. the default tenant's)."""
+        with self._lock:
+            self._services[tenant_id] = chat_service
+
+    def resolve(self, root_path: str = "", called_number: Optional[str] = None) -> str:
+        """Return the tenant of a request: its URL prefix, else the Twilio number called, else the default."""
+        tenant_id = tenant_from_root(root_path)
+        if tenant_id is not None:
+            return tenant_id
+        return self._numbers.get(self._normalize_number(called_number), self.default_tenant)
+
+    def chat_service(self, tenant_id: str) -> Optional[ChatService]:
+        """Return a tenant's chat service, creating it on first use; None for an unknown tenant."""
+        if tenant_id not in self.tenants:
+            return None
+        chat_service = self._services.get(tenant_id)
+        if chat_service is None:
+            # Concurrent first requests for the same tenant share one build
+            chat_service = self._building.do(tenant_id, self._build, tenant_id)
+        with self._lock:
+            self._last_used[tenant_id] = None
+            self._last_used.move_to_end(tenant_id)
+            self._enforce_budget(tenant_id)
+        return chat_service
+
+    def _build(self, tenant_id: str) -> ChatService:
+        with self._lock:
+            chat_service = self._services.get(tenant_id)
+        if chat_service is None:
+            chat_service = self.factory(tenant_id, self.tenants[tenant_id])
+            with self._lock:
+                chat_service = self._services.setdefault(tenant_id, chat_service)
+        return chat_service
+
+    def _size(self, tenant_id: str) -> int:
+        """Return a tenant's estimated index size, re-estimated only when it loads another store version."""
+        version = self._services[tenant_id].knowledge_base.loaded_version
+        cached = self._sizes.get(tenant_id)
+        if cached is None or cached[0] != version:
+            cached = self._sizes[tenant_id] = (version, self._services[tenant_id].knowledge_base.estimated_memory_bytes())
+        return cached[1]
+
+    def _enforce_budget(self, current: str):
+        """Unload least recently used indexes to make room for current's. Caller holds the lock."""
+        sizes = {}
+        for tenant_id in self._last_used:
+            if tenant_id == current or self._services[tenant_id].knowledge_base.vector_store is not None:
+                sizes[tenant_id] = self._size(tenant_id)
+            else:
+                self._sizes.pop(tenant_id, None)
+        total = sum(sizes.values())
+        for tenant_id in list(self._last_used):
+            if total <= self.memory_budget_bytes:
+                break
+            if tenant_id == current or tenant_id not in sizes:
+                continue
+            self._services[tenant_id].knowledge_base.unload()
+            self._sizes.pop(tenant_id, None)
+            total -= sizes[tenant_id]
+            print(f"Unloaded index of tenant {tenant_id} to stay within the memory budget.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resident = {tenant_id: self._size(tenant_id)
+                        for tenant_id, service in self._services.items()
+                        if service.knowledge_base.vector_store is not None}
+            return {
+                "tenants": len(self.tenants),
+                "created": len(self._services),
+                "resident": sorted(resident),
+                "resident_bytes": sum(resident.values()),
+                "memory_budget_bytes": self.memory_budget_bytes
+            }
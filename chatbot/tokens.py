@@ -0,0 +1,26 @@
+from typing import List
+
+import tiktoken
+
+
+class ApproximateEncoding:
+    """Stand-in tokenizer at roughly four characters per token."""
+
+    def encode(self, text: str) -> List[str]:
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def decode(self, tokens: List[str]) -> str:
+        return "".join(tokens)
+
+
+def get_encoding(model: str):
+    """Return the tokenizer for a model, falling back to the GPT-4 one for unknown names."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # tiktoken downloads its vocabulary on first use; estimate rather than fail offline
+        print(f"Error loading tokenizer for {model}: {str(e)}. Estimating token counts.")
+        return ApproximateEncoding()
@@ -0,0 +1,238 @@
+import os
+import json
+import mmap
+import time
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain.docstore.document import Document
+from langchain_community.docstore.base import Docstore
+
+from .ann_index import build_index, build_params, is_exact, resolve_index_params, set_search_params
+
+FORMAT_NAME = "native-v1"
+
+# File layout of a native vector store directory
+INDEX_FILE = "index.faiss"      # FAISS index, written with faiss.write_index
+CHUNKS_FILE = "chunks.jsonl"    # one JSON record per vector, in index order
+OFFSETS_FILE = "offsets.u64"    # n + 1 little-endian uint64 byte offsets into chunks.jsonl
+META_FILE = "meta.json"         # format marker, counts and index parameters, written last
+
+# Published stores live in versioned directories next to the base path ("<name>.v<ns>"), and
+# "<name>.current" names the one to serve. Replacing that file is the atomic switch-over.
+POINTER_SUFFIX = ".current"
+
+
+def read_meta(path: Path) -> Optional[Dict[str, Any]]:
+    """Return the meta record of a native vector store, or None if path does not hold one."""
+    meta_path = Path(path) / META_FILE
+    if not meta_path.exists():
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta if meta.get("format") == FORMAT_NAME else None
+
+
+def is_native_store(path: Path) -> bool:
+    """Return True if path holds a vector store in the native format."""
+    return read_meta(path) is not None
+
+
+def index_params_of(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the index parameters recorded in a store's meta; stores without them hold a flat index."""
+    return meta.get("index") or resolve_index_params(None, meta["count"], meta["dim"])
+
+
+def save_native(vector_store: FAISS, path: Path, index_params: Optional[Dict[str, Any]] = None):
+    """Write a FAISS vector store as index + offsets + JSON lines, without pickle.
+
+    The store being saved holds an exact flat index; with index_params the
+    saved index is an approximate or compressed one built from its vectors.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    suffix = f".{os.getpid()}.tmp"
+    count = vector_store.index.ntotal
+
+    if index_params is not None and not is_exact(index_params) and count:
+        index, resolved = build_index(vector_store.index.reconstruct_n(0, count), index_params)
+    else:
+        index, resolved = vector_store.index, resolve_index_params(None, count, vector_store.index.d)
+        # Record what was configured, so KnowledgeBase._index_outdated does not see a mismatch
+        resolved["requested"] = build_params(index_params)
+    faiss.write_index(index, str(path / (INDEX_FILE + suffix)))
+
+    offsets = np.zeros(count + 1, dtype="<u8")
+    with open(path / (CHUNKS_FILE + suffix), "wb") as f:
+        for position in range(count):
+            doc_id = vector_store.index_to_docstore_id[position]
+            doc = vector_store.docstore.search(doc_id)
+            record = json.dumps(
+                {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False
+            ).encode("utf-8") + b"\n"
+            f.write(record)
+            offsets[position + 1] = offsets[position] + len(record)
+    offsets.tofile(path / (OFFSETS_FILE + suffix))
+
+    with open(path / (META_FILE + suffix), "w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT_NAME, "count": count, "dim": vector_store.index.d, "index": resolved}, f)
+
+    # Data files first, meta last: a store is only valid once meta.json matches
+    for name in (INDEX_FILE, CHUNKS_FILE, OFFSETS_FILE, META_FILE):
+        os.replace(path / (name + suffix), path / name)
+
+    # A leftover pickle from the old format must never be loaded again
+    legacy_pickle = path / "index.pkl"
+    if legacy_pickle.exists():
+        legacy_pickle.unlink()
+
+
+class _PositionIds(dict):
+    """index_to_docstore_id for a native store: vector position i maps to id str(i)."""
+
+    def __init__(self, count: int):
+        super().__init__()
+        self.count = count
+
+    def __missing__(self, position: int) -> str:
+        if 0 <= position < self.count:
+            return str(position)
+        raise KeyError(position)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.count))
+
+    def __contains__(self, position: Any) -> bool:
+        return isinstance(position, (int, np.integer)) and 0 <= position < self.count
+
+    def values(self):
+        return (str(position) for position in range(self.count))
+
+    def items(self):
+        return ((position, str(position)) for position in range(self.count))
+
+
+class MappedDocstore(Docstore):
+    def __init__(self, path: Path):
+        """Read chunk records lazily, by vector position, from a memory-mapped file."""
+        path = Path(path)
+        self.offsets = np.memmap(path / OFFSETS_FILE, dtype="<u8", mode="r")
+        with open(path / CHUNKS_FILE, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._chunks = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def record(self, position: int) -> Dict[str, Any]:
+        """Return the raw record stored at a vector position."""
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return json.loads(self._chunks[start:end])
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Return the document for an id produced by _PositionIds."""
+        try:
+            position = int(search)
+        except ValueError:
+            return f"ID {search} not found."
+        if not 0 <= position < len(self):
+            return f"ID {search} not found."
+        record = self.record(position)
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        raise NotImplementedError("Memory-mapped stores are read-only; load with mmap_index=False to modify.")
+
+    def delete(self, ids: list) -> None:
+        raise NotImplementedError("Memory-mapped stores are read-only; load with mmap_index=False to modify.")
+
+
+def load_native(path: Path, embeddings, mmap_index: bool = True,
+                search_params: Optional[Dict[str, Any]] = None) -> FAISS:
+    """Open a native vector store.
+
+    With mmap_index (the serving mode) the FAISS index is memory-mapped read
+    only and chunk records are read on demand, so workers share pages through
+    the OS cache; search_params override the persisted nprobe/ef_search.
+    Otherwise everything is read into memory so the store can be updated and
+    saved again, with an exact flat index: approximate or compressed indexes
+    cannot be edited in place, so their vectors are re-read through
+    embeddings, which serves them from the embedding cache.
+    """
+    path = Path(path)
+    meta = read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"No native vector store at {path}")
+    index_params = index_params_of(meta)
+
+    if mmap_index:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(str(path / INDEX_FILE), flags)
+        set_search_params(index, {**index_params, **(search_params or {})})
+        docstore = MappedDocstore(path)
+        return FAISS(embeddings, index, docstore, _PositionIds(len(docstore)))
+
+    mapped = MappedDocstore(path)
+    documents = {}
+    index_to_docstore_id = {}
+    for position in range(len(mapped)):
+        record = mapped.record(position)
+        documents[record["id"]] = Document(id=record["id"], page_content=record["page_content"],
+                                           metadata=record["metadata"])
+        index_to_docstore_id[position] = record["id"]
+
+    if is_exact(index_params):
+        index = faiss.read_index(str(path / INDEX_FILE))
+    else:
+        texts = [documents[index_to_docstore_id[position]].page_content for position in range(len(mapped))]
+        index = faiss.IndexFlatL2(meta["dim"])
+        if texts:
+            index.add(np.asarray(embeddings.embed_documents(texts), dtype=np.float32))
+    return FAISS(embeddings, index, InMemoryDocstore(documents), index_to_docstore_id)
+
+
+def _pointer_path(base_path: Path) -> Path:
+    return base_path.with_name(base_path.name + POINTER_SUFFIX)
+
+
+def current_store_path(base_path: Path) -> Path:
+    """Return the directory of the published store, or base_path itself if none was published."""
+    base_path = Path(base_path)
+    try:
+        name = _pointer_path(base_path).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return base_path
+    return base_path.with_name(name) if name else base_path
+
+
+def new_version_path(base_path: Path) -> Path:
+    """Return a fresh directory to build the next version of a store in."""
+    base_path = Path(base_path)
+    return base_path.with_name(f"{base_path.name}.v{time.time_ns()}")
+
+
+def publish_version(base_path: Path, version_path: Path):
+    """Make version_path the store every worker serves."""
+    pointer = _pointer_path(Path(base_path))
+    tmp_path = pointer.with_name(f"{pointer.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(Path(version_path).name, encoding="utf-8")
+    os.replace(tmp_path, pointer)
+
+
+def remove_old_versions(base_path: Path, keep: int = 2):
+    """Delete all but the newest keep versions; the previous one stays for workers still switching over."""
+    base_path = Path(base_path)
+    current = current_store_path(base_path)
+    versions = sorted(path for path in base_path.parent.glob(f"{base_path.name}.v*") if path.is_dir())
+    for path in versions[:-keep]:
+        if path != current:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,200 @@
+import os
+import json
+import asyncio
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from .chat_service import ChatService
+from .voice_service import VoiceService
+
+
+class VoicePrompts:
+    def __init__(self, voice_service: VoiceService, prompts: Dict[str, str]):
+        """Fixed call prompts, synthesized once and reused by every call."""
+        self.voice_service = voice_service
+        self.prompts = prompts
+        self._urls: Dict[str, str] = {}
+
+    def warm(self):
+        """Synthesize every prompt; the audio cache makes repeat runs free."""
+        for name, text in self.prompts.items():
+            audio_url = self.voice_service.text_to_speech_for_twilio(text, channel="background")
+            if audio_url:
+                self._urls[name] = audio_url
+
+    def warm_in_background(self):
+        threading.Thread(target=self.warm, name="voice-prompts", daemon=True).start()
+
+    def add_to(self, twiml, name: str):
+        """Play a prompt on a TwiML verb, falling back to Twilio <Say> until it is synthesized."""
+        audio_url = self._urls.get(name)
+        if audio_url:
+            twiml.play(audio_url)
+        else:
+            twiml.say(self.prompts[name], voice="female")
+
+
+class LocalJobResults:
+    def __init__(self, results_dir: Path):
+        """Keep voice job results as JSON files in a local directory, shared by the workers of one host."""
+        self.results_dir = results_dir
+
+        # Create results directory if it doesn't exist
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, job_id: str) -> Path:
+        return self.results_dir / f"{job_id}.json"
+
+    def write(self, job_id: str, data: bytes):
+        """Write a result atomically so readers never see a partial file."""
+        path = self._path(job_id)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def read(self, job_id: str) -> Optional[bytes]:
+        """Return a stored result, or None if there is none yet."""
+        try:
+            return self._path(job_id).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def cleanup(self, cutoff: float):
+        """Remove results written before cutoff (a Unix time)."""
+        for entry in os.scandir(self.results_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class S3JobResults:
+    def __init__(self, s3_client, bucket: str, prefix: str = "voice_jobs/"):
+        """Keep voice job results as private objects in an S3 bucket, shared by every instance."""
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def write(self, job_id: str, data: bytes):
+        self.s3.put_object(Body=data, Bucket=self.bucket, Key=self.prefix + f"{job_id}.json",
+                           ContentType="application/json")
+
+    def read(self, job_id: str) -> Optional[bytes]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.prefix + f"{job_id}.json")
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def cleanup(self, cutoff: float):
+        """Remove results written before cutoff (a Unix time)."""
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                if obj["LastModified"].timestamp() < cutoff:
+                    self.s3.delete_object(Bucket=self.bucket, Key=obj["Key"])
+
+
+class VoiceJobQueue:
+    def __init__(self, chat_service: ChatService, voice_service: VoiceService, results_dir: Path,
+                 max_workers: int = 4, ttl_seconds: int = 600, stream_audio: bool = False,
+                 results_store=None):
+        """Generate voice answers in the background so Twilio webhooks return immediately.
+
+        Results are written to results_store (JSON files in results_dir by
+        default) so the follow-up webhook can be served by any worker, not
+        only the one that started the job. Local files only reach the
+        workers of one host; with several instances pass an S3JobResults.
+        With stream_audio the job finishes as soon as the answer text is
+        ready and Twilio plays a sentence-pipelined stream.
+        """
+        self.chat_service = chat_service
+        self.voice_service = voice_service
+        self.results = results_store or LocalJobResults(results_dir)
+        self.ttl_seconds = ttl_seconds
+        self.stream_audio = stream_audio
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="voice-job")
+        self._tasks = set()
+        self._cleaned_at = 0.0
+
+    def submit(self, question: str, conversation_id: Optional[str] = None,
+               chat_service: Optional[ChatService] = None) -> str:
+        """Start answering a question and return the job id; chat_service overrides the default tenant's."""
+        self._cleanup()
+        job_id = uuid.uuid4().hex
+        self.executor.submit(self._run, job_id, question, conversation_id, chat_service or self.chat_service)
+        return job_id
+
+    def _run(self, job_id: str, question: str, conversation_id: Optional[str], chat_service: ChatService):
+        try:
+            response_text = chat_service.get_response(
+                question, channel="voice", conversation_id=conversation_id)["response"]
+            if self.stream_audio:
+                audio_url = self.voice_service.stream_url(response_text)
+            else:
+                audio_url = self.voice_service.text_to_speech_for_twilio(response_text)
+            result = {"response": response_text, "audio_url": audio_url}
+        except Exception as e:
+            print(f"Error in voice job {job_id}: {str(e)}")
+            result = {"error": str(e)}
+        self._write_result(job_id, result)
+
+    def asubmit(self, question: str, conversation_id: Optional[str] = None,
+                chat_service: Optional[ChatService] = None) -> str:
+        """Start answering a question as a task on the running event loop and return the job id."""
+        self._cleanup()
+        job_id = uuid.uuid4().hex
+        task = asyncio.get_running_loop().create_task(
+            self._arun(job_id, question, conversation_id, chat_service or self.chat_service))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _arun(self, job_id: str, question: str, conversation_id: Optional[str], chat_service: ChatService):
+        try:
+            response_text = (await chat_service.aget_response(
+                question, channel="voice", conversation_id=conversation_id))["response"]
+            if self.stream_audio:
+                audio_url = self.voice_service.stream_url(response_text)
+            else:
+                audio_url = await self.voice_service.atext_to_speech_for_twilio(response_text)
+            result = {"response": response_text, "audio_url": audio_url}
+        except Exception as e:
+            print(f"Error in voice job {job_id}: {str(e)}")
+            result = {"error": str(e)}
+        self._write_result(job_id, result)
+
+    def _write_result(self, job_id: str, result: Dict[str, Any]):
+        try:
+            self.results.write(job_id, json.dumps(result).encode("utf-8"))
+        except Exception as e:
+            print(f"Error storing result of voice job {job_id}: {str(e)}")
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the finished result of a job, or None if it is still running."""
+        # Job ids are generated by us; reject anything that could escape the directory
+        if not job_id.isalnum():
+            return {"error": "Unknown job"}
+        data = self.results.read(job_id)
+        return None if data is None else json.loads(data)
+
+    def _cleanup(self):
+        """Remove results older than the TTL, at most every tenth of it and off the webhook's path."""
+        now = time.time()
+        if now - self._cleaned_at < self.ttl_seconds / 10:
+            return
+        self._cleaned_at = now
+        self.executor.submit(self._remove_expired, now - self.ttl_seconds)
+
+    def _remove_expired(self, cutoff: float):
+        try:
+            self.results.cleanup(cutoff)
+        except Exception as e:
+            print(f"Error removing expired voice job results: {str(e)}")
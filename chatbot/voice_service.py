@@ -1,127 +1,282 @@
 import os
+import re
+import asyncio
+import contextlib
 import time
-import uuid
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-import requests
-import json
-import boto3
+from typing import Iterator, List, Optional
+
+from .audio_cache import AudioCache, LocalAudioStore, S3AudioStore
+from .clients import ElevenLabsClient, RateLimited, get_s3_client
+from .metrics import STAGE_ERRORS, record_cache, timed
+from .scheduler import Overloaded, PriorityScheduler
+from .single_flight import SingleFlight
 
 class VoiceService:
-    def __init__(self, api_key: str, voice_id: str, cache_dir: Path):
-        """Initialize voice service with ElevenLabs API key and voice ID."""
+    def __init__(self, api_key: str, voice_id: str, cache_dir: Path, cache_max_bytes: int = 200 * 1024 * 1024,
+                 stream_dir: Optional[Path] = None, stream_workers: int = 3,
+                 tts_client: Optional[ElevenLabsClient] = None, s3_client=None, s3_bucket: Optional[str] = None,
+                 s3_public_url: Optional[str] = None, scheduler: Optional[PriorityScheduler] = None):
+        """Initialize voice service with ElevenLabs API key and voice ID.
+        
+        tts_client and s3_client default to the shared pooled clients; pass
+        s3_bucket to store Twilio audio in S3 instead of the local cache.
+        scheduler admits ElevenLabs calls by channel priority; a shed call
+        returns no audio so callers fall back as they do on TTS errors.
+        """
         self.api_key = api_key
         self.voice_id = voice_id
         self.cache_dir = cache_dir
+        self.model_id = "eleven_multilingual_v2"
+        self.voice_settings = {
+            "stability": 0.5,
+            "similarity_boost": 0.5
+        }
+        self.tts_client = tts_client or ElevenLabsClient(api_key)
+        self.scheduler = scheduler
+        
+        # Concurrent requests for the same text share one synthesis and upload
+        self._in_flight = SingleFlight("tts")
+
+        # Local cache always exists; text_to_speech needs a file path
+        base_url = os.getenv("BASE_URL", "http://localhost:5000")
+        self.base_url = base_url
+        self.local_cache = AudioCache(LocalAudioStore(self.cache_dir, base_url), cache_max_bytes)
+
+        # Use S3 (for production) or local (for development)
+        if s3_bucket:
+            s3 = s3_client or get_s3_client()
+            self.twilio_cache = AudioCache(S3AudioStore(s3, s3_bucket, s3_public_url), cache_max_bytes)
+        else:
+            self.twilio_cache = self.local_cache
+        
+        # Texts registered for sentence-pipelined streaming
+        self.stream_workers = stream_workers
+        self.stream_dir = stream_dir or self.cache_dir.parent / "tts_streams"
+        self.stream_dir.mkdir(parents=True, exist_ok=True)
+
+    def _cache_key(self, text: str) -> str:
+        """Return the content-addressed cache key for text in the current voice."""
+        return AudioCache.make_key(text, self.voice_id, self.model_id, self.voice_settings)
+
+    def _synthesize(self, text: str, channel: str = "voice") -> Optional[bytes]:
+        """Render text with ElevenLabs and return the MP3 bytes.
         
-        # Create cache directory if it doesn't exist
-        if not self.cache_dir.exists():
-            self.cache_dir.mkdir(parents=True)
+        Returns None quickly while the ElevenLabs circuit is open or the
+        call is shed, so callers fall back to Twilio <Say>. Concurrent calls
+        for the same text share one request.
+        """
+        return self._in_flight.do(("audio", self._cache_key(text)), self._synthesize_uncoalesced, text, channel)
+    
+    def _synthesize_uncoalesced(self, text: str, channel: str) -> Optional[bytes]:
+        try:
+            with self._tts_slot(channel, len(text)), timed("tts_synthesize"):
+                audio = self.tts_client.synthesize(self.voice_id, text, self.model_id, self.voice_settings)
+        except Overloaded:
+            return None
+        except RateLimited:
+            # The slot has drained the TTS bucket; fall back like any other failed call
+            audio = None
+        if audio is None:
+            STAGE_ERRORS.inc(stage="tts_synthesize")
+        return audio
+    
+    async def _asynthesize(self, text: str, channel: str = "voice") -> Optional[bytes]:
+        """Async _synthesize."""
+        return await self._in_flight.ado(("audio", self._cache_key(text)), self._asynthesize_uncoalesced, text, channel)
+    
+    async def _asynthesize_uncoalesced(self, text: str, channel: str) -> Optional[bytes]:
+        try:
+            async with self._atts_slot(channel, len(text)):
+                with timed("tts_synthesize"):
+                    audio = await self.tts_client.asynthesize(self.voice_id, text, self.model_id, self.voice_settings)
+        except Overloaded:
+            return None
+        except RateLimited:
+            # The slot has drained the TTS bucket; fall back like any other failed call
+            audio = None
+        if audio is None:
+            STAGE_ERRORS.inc(stage="tts_synthesize")
+        return audio
+
+    def _tts_slot(self, channel: str, characters: int):
+        """Hold a scheduler slot for an ElevenLabs call; a no-op without a scheduler."""
+        return self.scheduler.slot(channel, characters) if self.scheduler is not None else contextlib.nullcontext()
     
+    def _atts_slot(self, channel: str, characters: int):
+        return self.scheduler.aslot(channel, characters) if self.scheduler is not None else contextlib.nullcontext()
+
     def text_to_speech(self, text: str) -> Optional[str]:
         """Convert text to speech and return the path to the audio file."""
         try:
-            # Generate a unique filename
-            filename = f"tts_{int(time.time())}.mp3"
-            file_path = self.cache_dir / filename
-            
-            # Generate audio using ElevenLabs API directly
-            url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}"
-            
-            headers = {
-                "Accept": "audio/mpeg",
-                "Content-Type": "application/json",
-                "xi-api-key": self.api_key
-            }
-            
-            data = {
-                "text": text,
-                "model_id": "eleven_multilingual_v2",
-                "voice_settings": {
-                    "stability": 0.5,
-                    "similarity_boost": 0.5
-                }
-            }
-            
-            response = requests.post(url, json=data, headers=headers)
-            
-            if response.status_code != 200:
-                print(f"Error from ElevenLabs API: {response.text}")
-                return None
-            
-            # Save audio to file
-            with open(file_path, "wb") as f:
-                f.write(response.content)
-            
+            key = self._cache_key(text)
+
+            # Reuse an earlier rendering of the same text
+            cached = self.local_cache.get(key) is not None
+            record_cache("audio", cached)
+            if not cached:
+                audio = self._synthesize(text, channel="web")
+                if audio is None:
+                    return None
+                with timed("tts_store"):
+                    self.local_cache.put(key, audio)
+
             # Return path to audio file
-            return str(file_path)
+            return str(self.local_cache.store.path(key))
         except Exception as e:
             print(f"Error in text-to-speech conversion: {str(e)}")
             return None
+
+    def text_to_speech_for_twilio(self, text: str, channel: str = "voice") -> Optional[str]:
+        """Convert text to speech and return URL for Twilio to play.
+        
+        channel sets the scheduling priority of the synthesis.
+        """
+        return self._in_flight.do(("url", self._cache_key(text)), self._text_to_speech_for_twilio, text, channel)
     
-    def text_to_speech_for_twilio(self, text: str) -> Optional[str]:
-        """Convert text to speech and return URL for Twilio to play."""
+    def _text_to_speech_for_twilio(self, text: str, channel: str) -> Optional[str]:
         try:
-            # Generate a unique filename
-            filename = f"tts_{uuid.uuid4()}.mp3"
-            
-            # Generate audio using ElevenLabs API directly
-            url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}"
-            
-            headers = {
-                "Accept": "audio/mpeg",
-                "Content-Type": "application/json",
-                "xi-api-key": self.api_key
-            }
-            
-            data = {
-                "text": text,
-                "model_id": "eleven_multilingual_v2",
-                "voice_settings": {
-                    "stability": 0.5,
-                    "similarity_boost": 0.5
-                }
-            }
-            
-            response = requests.post(url, json=data, headers=headers)
-            
-            if response.status_code != 200:
-                print(f"Error from ElevenLabs API: {response.text}")
+            key = self._cache_key(text)
+
+            # Reuse an earlier rendering of the same text
+            with timed("tts_cache_lookup"):
+                audio_url = self.twilio_cache.get(key)
+            record_cache("audio", bool(audio_url))
+            if audio_url:
+                return audio_url
+
+            audio = self._synthesize(text, channel)
+            if audio is None:
                 return None
-                
-            # Check if we should use S3 (for production) or local (for development)
-            s3_bucket = os.getenv("S3_BUCKET_NAME")
-            aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-            aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-            
-            if s3_bucket and aws_access_key and aws_secret_key:
-                # Upload to S3
-                s3 = boto3.client(
-                    's3', 
-                    aws_access_key_id=aws_access_key,
-                    aws_secret_access_key=aws_secret_key
-                )
-                
-                s3.put_object(
-                    Body=response.content,
-                    Bucket=s3_bucket,
-                    Key=filename,
-                    ContentType='audio/mpeg',
-                    ACL='public-read'
-                )
-                
-                # Return the public URL
-                return f"https://{s3_bucket}.s3.amazonaws.com/{filename}"
-            else:
-                # Local file fallback for development
-                file_path = self.cache_dir / filename
-                with open(file_path, "wb") as f:
-                    f.write(response.content)
-                
-                # Return URL for local development
-                base_url = os.getenv("BASE_URL", "http://localhost:5000")
-                return f"{base_url}/static/audio_cache/{file_path.name}"
-                
+
+            # Store in S3 (production) or the local cache directory (development)
+            with timed("tts_store"):
+                return self.twilio_cache.put(key, audio)
+
         except Exception as e:
             print(f"Error in text-to-speech conversion: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+    
+    async def atext_to_speech_for_twilio(self, text: str, channel: str = "voice") -> Optional[str]:
+        """Async text_to_speech_for_twilio: synthesis is awaited and cache/S3 I/O runs in a thread."""
+        return await self._in_flight.ado(("url", self._cache_key(text)), self._atext_to_speech_for_twilio, text, channel)
+    
+    async def _atext_to_speech_for_twilio(self, text: str, channel: str) -> Optional[str]:
+        try:
+            key = self._cache_key(text)
+
+            # Reuse an earlier rendering of the same text
+            with timed("tts_cache_lookup"):
+                audio_url = await asyncio.to_thread(self.twilio_cache.get, key)
+            record_cache("audio", bool(audio_url))
+            if audio_url:
+                return audio_url
+
+            audio = await self._asynthesize(text, channel)
+            if audio is None:
+                return None
+
+            with timed("tts_store"):
+                return await asyncio.to_thread(self.twilio_cache.put, key, audio)
+
+        except Exception as e:
+            print(f"Error in text-to-speech conversion: {str(e)}")
+            return None
+    
+    @staticmethod
+    def split_sentences(text: str, min_length: int = 40) -> List[str]:
+        """Split text into sentences for pipelined synthesis, merging very short ones."""
+        # Drop markdown emphasis and list markers that would be read out
+        text = re.sub(r"[*_#`]", "", text)
+        text = re.sub(r"^\s*(?:[-\u2022]|\d+\.)\s+", "", text, flags=re.MULTILINE)
+        
+        pieces = [piece.strip() for piece in re.split(r"(?<=[.!?])\s+|\n+", text) if piece.strip()]
+        sentences = []
+        for piece in pieces:
+            if sentences and len(sentences[-1]) < min_length:
+                sentences[-1] = f"{sentences[-1]} {piece}"
+            else:
+                sentences.append(piece)
+        return sentences
+    
+    def synthesize_cached(self, text: str, channel: str = "voice") -> Optional[bytes]:
+        """Return MP3 bytes for text from the local cache, synthesizing on a miss."""
+        key = self._cache_key(text)
+        if self.local_cache.get(key) is not None:
+            try:
+                audio = self.local_cache.store.path(key).read_bytes()
+                record_cache("audio", True)
+                return audio
+            except FileNotFoundError:
+                pass  # Evicted by another worker in the meantime
+        record_cache("audio", False)
+        
+        audio = self._synthesize(text, channel)
+        if audio is not None:
+            self.local_cache.put(key, audio)
+        return audio
+    
+    def stream_speech(self, text: str, channel: str = "voice") -> Iterator[bytes]:
+        """Yield MP3 audio sentence by sentence as soon as each one is ready.
+        
+        Sentences are synthesized concurrently but yielded in order, so the
+        first audio arrives after one sentence rather than the whole answer.
+        Every sentence goes through the audio cache.
+        """
+        sentences = self.split_sentences(text)
+        executor = ThreadPoolExecutor(max_workers=self.stream_workers, thread_name_prefix="tts-stream")
+        try:
+            futures = [executor.submit(self.synthesize_cached, sentence, channel) for sentence in sentences]
+            for sentence, future in zip(sentences, futures):
+                try:
+                    audio = future.result()
+                except Exception as e:
+                    print(f"Error synthesizing sentence {sentence[:40]!r}: {str(e)}")
+                    continue
+                if audio:
+                    yield audio
+        finally:
+            # Stop pending sentences if the client went away
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def register_stream(self, text: str) -> str:
+        """Save text for streaming and return its stream id.
+        
+        The id is content-addressed and the text lives on disk, so the GET
+        that plays the stream can be served by any worker.
+        """
+        stream_id = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+        path = self.stream_dir / f"{stream_id}.txt"
+        if not path.exists():
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, path)
+        else:
+            os.utime(path)  # Keep it past the cleanup TTL
+        self._cleanup_streams()
+        return stream_id
+    
+    def stream_text(self, stream_id: str) -> Optional[str]:
+        """Return the text registered under a stream id, or None."""
+        if not stream_id.isalnum():
+            return None
+        try:
+            return (self.stream_dir / f"{stream_id}.txt").read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+    
+    def stream_url(self, text: str) -> str:
+        """Register text and return an absolute URL that streams its audio (e.g. for Twilio <Play>)."""
+        return f"{self.base_url}/api/speak/stream/{self.register_stream(text)}?channel=voice"
+    
+    def _cleanup_streams(self, ttl_seconds: int = 3600):
+        """Remove registered stream texts older than the TTL."""
+        cutoff = time.time() - ttl_seconds
+        for entry in os.scandir(self.stream_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
@@ -1,4 +1,5 @@
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -15,6 +16,43 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "EXAVITQu4vr4xnSDxMaL")
 
+ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io")
+
+# Outbound HTTP clients (shared keep-alive pool, timeouts in seconds, retries with backoff)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+ELEVENLABS_CONNECT_TIMEOUT = float(os.getenv("ELEVENLABS_CONNECT_TIMEOUT", "3"))
+ELEVENLABS_READ_TIMEOUT = float(os.getenv("ELEVENLABS_READ_TIMEOUT", "30"))
+
+# ElevenLabs circuit breaker: open after this many consecutive failures, probe again after the reset time
+ELEVENLABS_BREAKER_FAILURES = int(os.getenv("ELEVENLABS_BREAKER_FAILURES", "5"))
+ELEVENLABS_BREAKER_RESET = float(os.getenv("ELEVENLABS_BREAKER_RESET", "30"))
+
+# Admission control: OpenAI and ElevenLabs calls run by channel priority (voice > sms > web > background)
+# within these per-process limits; set the per-minute rates to your quota divided by the worker count
+# (0 disables a rate limit). Calls that would queue past the channel's wait (seconds) are shed.
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "8"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "80000"))
+TTS_MAX_CONCURRENT = int(os.getenv("TTS_MAX_CONCURRENT", "4"))
+ELEVENLABS_CHARACTERS_PER_MINUTE = int(os.getenv("ELEVENLABS_CHARACTERS_PER_MINUTE", "20000"))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "20"))  # waiting calls per channel
+SCHEDULER_MAX_WAIT = {
+    "voice": float(os.getenv("SCHEDULER_MAX_WAIT_VOICE", "6")),
+    "sms": float(os.getenv("SCHEDULER_MAX_WAIT_SMS", "10")),
+    "web": float(os.getenv("SCHEDULER_MAX_WAIT_WEB", "15")),
+    "background": float(os.getenv("SCHEDULER_MAX_WAIT_BACKGROUND", "60"))
+}
+
+# S3 audio storage (used when bucket and credentials are set; endpoint URL allows MinIO/moto)
+S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
+AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+AWS_REGION = os.getenv("AWS_REGION")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")
+USE_S3 = bool(S3_BUCKET_NAME and AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY)
+
 # Twilio configuration
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
@@ -24,20 +62,159 @@ TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
 DEBUG = os.getenv("DEBUG", "True") == "True"
 BASE_URL = os.getenv("BASE_URL", "http://localhost:5000")
 
+# Request tracing: return X-Trace-Id and Server-Timing headers, and log requests slower than this
+TRACE_HEADERS = os.getenv("TRACE_HEADERS", "True") == "True"
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "5"))
+
 # File paths
 DATA_DIR = BASE_DIR / "data" / "pune_university"
 VECTOR_STORE_DIR = BASE_DIR / "vector_stores"
 AUDIO_CACHE_DIR = BASE_DIR / "static" / "audio_cache"
+EMBEDDING_CACHE_DIR = VECTOR_STORE_DIR / "embedding_cache"
+
+# Tenants: the affiliated colleges this deployment serves, each with its own documents and index, reached
+# under /t/<tenant>/ or through their Twilio numbers. TENANTS_FILE holds more as JSON:
+# {"<tenant>": {"name": "...", "data_dir": "...", "twilio_numbers": ["+91..."]}}
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "pune_university")
+TENANTS = {
+    DEFAULT_TENANT: {
+        "name": "Savitribai Phule Pune University",
+        "data_dir": str(DATA_DIR),
+        "twilio_numbers": [TWILIO_PHONE_NUMBER] if TWILIO_PHONE_NUMBER else []
+    }
+}
+if os.getenv("TENANTS_FILE"):
+    with open(os.getenv("TENANTS_FILE"), "r", encoding="utf-8") as f:
+        TENANTS.update(json.load(f))
+TENANT_STORE_DIR = VECTOR_STORE_DIR / "tenants"
+TENANT_MEMORY_BUDGET = int(os.getenv("TENANT_MEMORY_BUDGET", str(1024 * 1024 * 1024)))  # bytes of resident indexes
+
+# Index updates: each worker checks for a newly published store every interval (seconds); with auto
+# rebuild, changed data files are indexed in the background. ADMIN_TOKEN enables /api/admin/* endpoints.
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "30"))
+INDEX_AUTO_REBUILD = os.getenv("INDEX_AUTO_REBUILD", "True") == "True"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Batch queries (POST /api/batch with the admin token, or batch_query.py): embedded and retrieved BATCH_SIZE
+# at a time, answered with at most BATCH_CONCURRENCY LLM calls at background priority
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "256"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "10000"))
+
+# Document ingestion (worker processes for text extraction; empty means one per CPU)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS")) if os.getenv("INGEST_WORKERS") else None
+
+# Chunking: documents are split by heading section and table into chunks of at most CHUNK_TOKENS, each
+# prefixed with its heading path; changing either setting rebuilds the vector store in the background
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# Retrieval: "dense", "hybrid" (dense + BM25) or "keyword_first" (skip embedding on confident keyword hits)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+KEYWORD_CONFIDENCE = float(os.getenv("KEYWORD_CONFIDENCE", "0.6"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+# Vector index: "flat" (exact), "ivf" or "hnsw", with vectors stored as "float32", "float16" or "pq"
+# (product quantized). Approximate indexes only pay off from tens of thousands of chunks; compare recall and
+# latency with python -m benchmarks.ann. Changing the build parameters re-indexes in the background.
+INDEX_PARAMS = {
+    "type": os.getenv("INDEX_TYPE", "flat"),
+    "storage": os.getenv("INDEX_STORAGE", "float32"),
+    "nlist": int(os.getenv("INDEX_NLIST", "0")),  # 0: about 4 * sqrt(chunks)
+    "nprobe": int(os.getenv("INDEX_NPROBE", "16")),
+    "hnsw_m": int(os.getenv("INDEX_HNSW_M", "32")),
+    "ef_search": int(os.getenv("INDEX_EF_SEARCH", "64")),
+    "pq_m": int(os.getenv("INDEX_PQ_M", "0"))  # 0: dimension / 16
+}
+
+# Audio cache configuration (bytes kept before least recently used clips are evicted)
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Streaming TTS: sentences synthesized concurrently per stream
+TTS_STREAM_WORKERS = int(os.getenv("TTS_STREAM_WORKERS", "3"))
+
+# Voice job results go to S3 when USE_S3 so any instance can answer the poll; these local
+# directories (and VOICE_STREAM_AUDIO streams) only reach one host, so without S3 run a
+# single instance or enable sticky sessions on the load balancer
+VOICE_JOBS_DIR = BASE_DIR / "voice_jobs"
+TTS_STREAM_DIR = BASE_DIR / "tts_streams"
 
 # Create directories if they don't exist
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 VECTOR_STORE_DIR.mkdir(parents=True, exist_ok=True)
 AUDIO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+VOICE_JOBS_DIR.mkdir(parents=True, exist_ok=True)
+TTS_STREAM_DIR.mkdir(parents=True, exist_ok=True)
+
+# Chat models: simple factual lookups are routed to the small model, everything else to the large one
+CHAT_MODEL_LARGE = os.getenv("CHAT_MODEL_LARGE", "gpt-4")
+CHAT_MODEL_SMALL = os.getenv("CHAT_MODEL_SMALL", "gpt-4o-mini")
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "True") == "True"
+
+# Prompt context: chunks retrieved per query, and the token budget they are merged and trimmed into
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "8"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "800"))
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "4"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))  # 1.0 = relevance only, lower = more diverse
+
+# Per-channel generation profiles (max_tokens, temperature, formatting rules; "model" pins a model,
+# "context_tokens" overrides CONTEXT_TOKEN_BUDGET)
+CHANNEL_PROFILES = {
+    "web": {
+        "max_tokens": 700,
+        "temperature": 0.7,
+        "format_rules": "Format important information in a structured way with bullet points or numbered lists when appropriate."
+    },
+    "sms": {
+        "max_tokens": 200,
+        "temperature": 0.3,
+        "format_rules": "This answer is sent as an SMS: reply in plain text in at most 3 short sentences (under 600 characters), with no markdown, bullet points or headings.",
+        "context_tokens": 500
+    },
+    "voice": {
+        "max_tokens": 150,
+        "temperature": 0.3,
+        "format_rules": "This answer is read aloud on a phone call: reply in 2 or 3 short conversational sentences, with no lists, markdown, URLs or symbols.",
+        "context_tokens": 500
+    }
+}
+
+# Conversation memory: recent turns per web session or phone number, older ones summarized
+CONVERSATION_MAX = int(os.getenv("CONVERSATION_MAX", "5000"))
+CONVERSATION_TTL = int(os.getenv("CONVERSATION_TTL", "1800"))
+CONVERSATION_TURNS = int(os.getenv("CONVERSATION_TURNS", "4"))
+
+# Semantic answer cache configuration
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# Quick access categories and the query each one runs
+QUICK_ACCESS_QUERIES = {
+    "Admission Process": "What is the admission process at Pune University?",
+    "Exam Schedule": "Tell me about the exam schedule at Pune University.",
+    "Fee Structure": "What is the fee structure at Pune University?",
+    "Scholarship Info": "What scholarships are available at Pune University?"
+}
+QUICK_ACCESS_CATEGORIES = list(QUICK_ACCESS_QUERIES)
+
+# Quick access answers are precomputed at startup and refreshed after this many seconds
+QUICK_ACCESS_TTL = int(os.getenv("QUICK_ACCESS_TTL", "3600"))
+QUICK_ACCESS_PRECOMPUTE_AUDIO = os.getenv("QUICK_ACCESS_PRECOMPUTE_AUDIO", "False") == "True"
+
+# Voice calls: answers are generated in the background while the caller hears a hold prompt
+VOICE_JOB_WORKERS = int(os.getenv("VOICE_JOB_WORKERS", "4"))
+VOICE_MAX_POLLS = int(os.getenv("VOICE_MAX_POLLS", "20"))  # one-second pauses before giving up
+VOICE_STREAM_AUDIO = os.getenv("VOICE_STREAM_AUDIO", "False") == "True"  # <Play> a sentence-pipelined stream
 
-# Quick access categories
-QUICK_ACCESS_CATEGORIES = [
-    "Admission Process",
-    "Exam Schedule", 
-    "Fee Structure", 
-    "Scholarship Info"
-]
\ No newline at end of file
+# Fixed call prompts, synthesized once at startup
+VOICE_PROMPTS = {
+    "welcome": "Welcome to Pune University Support Hub. Please ask your question after the beep.",
+    "no_input": "We didn't receive any input. Goodbye!",
+    "hold": "One moment while I look that up.",
+    "another_question": "Do you have another question? If so, please ask after the beep.",
+    "goodbye": "Thank you for using Pune University Support Hub. Goodbye!",
+    "not_understood": "I'm sorry, I couldn't understand what you said. Goodbye!",
+    "failed": "I'm sorry, I couldn't find an answer right now. Please try again later."
+}
@@ -9,6 +9,18 @@ document.addEventListener('DOMContentLoaded', function() {
     const tabContents = document.querySelectorAll('.tab-content');
     const audioPlayer = document.getElementById('audio-player');
     
+    // Prefix of the college's site, e.g. /t/<college>, so API calls reach its knowledge base
+    const apiBase = document.body.dataset.apiBase || '';
+    
+    // Conversation id for this tab, so the server can resolve follow-up questions
+    let sessionId = sessionStorage.getItem('chatSessionId');
+    if (!sessionId) {
+        sessionId = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+        sessionStorage.setItem('chatSessionId', sessionId);
+    }
+    
     // Initialize quick action buttons
     document.querySelectorAll('.quick-action-button').forEach(button => {
         button.addEventListener('click', function() {
@@ -90,7 +102,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const loadingMessage = addLoadingMessage();
         
         // Send request to server
-        fetch(`/api/quick-access/${category}`)
+        fetch(`${apiBase}/api/quick-access/${category}`)
             .then(response => response.json())
             .then(data => {
                 // Remove loading message
@@ -124,13 +136,104 @@ document.addEventListener('DOMContentLoaded', function() {
         // Show loading indicator
         const loadingMessage = addLoadingMessage();
         
-        // Send request to server
-        fetch('/api/chat', {
+        // Stream the response so text appears as soon as the first tokens arrive
+        streamChatResponse(message, loadingMessage)
+        .catch(error => {
+            console.error('Error:', error);
+            loadingMessage.remove();
+            addMessage('Sorry, there was an error processing your request.', 'bot');
+        });
+    }
+    
+    // Request a streamed chat response and render tokens incrementally
+    function streamChatResponse(message, loadingMessage) {
+        return fetch(apiBase + '/api/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ message: message }),
+            body: JSON.stringify({ message: message, session_id: sessionId }),
+        })
+        .then(response => {
+            // Fall back to the blocking endpoint if streaming is unavailable
+            if (!response.ok || !response.body) {
+                return fetchChatResponse(message, loadingMessage);
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let streamedText = '';
+            let streamingMessage = null;
+            let finished = false;
+            
+            // Handle one Server-Sent Event block
+            function handleEvent(block) {
+                let eventName = 'message';
+                let dataLines = [];
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        eventName = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        dataLines.push(line.slice(5).trim());
+                    }
+                });
+                if (dataLines.length === 0) return;
+                const data = JSON.parse(dataLines.join('\n'));
+                
+                if (eventName === 'token') {
+                    // Replace the loading dots with the message on the first token
+                    if (!streamingMessage) {
+                        loadingMessage.remove();
+                        streamingMessage = addStreamingMessage();
+                    }
+                    streamedText += data.token;
+                    renderMessageText(streamingMessage.querySelector('.message-bubble'), streamedText);
+                    scrollToBottom();
+                } else if (eventName === 'done') {
+                    finished = true;
+                    loadingMessage.remove();
+                    if (streamingMessage) streamingMessage.remove();
+                    
+                    // Re-render the final message with sources and the speak button
+                    addMessage(data.response, 'bot', data.sources);
+                    scrollToBottom();
+                } else if (eventName === 'error') {
+                    if (streamingMessage) streamingMessage.remove();
+                    throw new Error(data.error);
+                }
+            }
+            
+            function read() {
+                return reader.read().then(({ done, value }) => {
+                    if (done) {
+                        if (!finished) {
+                            if (streamingMessage) streamingMessage.remove();
+                            throw new Error('Stream ended before the response was complete');
+                        }
+                        return;
+                    }
+                    
+                    buffer += decoder.decode(value, { stream: true });
+                    const blocks = buffer.split('\n\n');
+                    buffer = blocks.pop();
+                    blocks.forEach(handleEvent);
+                    return read();
+                });
+            }
+            
+            return read();
+        });
+    }
+    
+    // Request a complete chat response in one JSON payload
+    function fetchChatResponse(message, loadingMessage) {
+        return fetch(apiBase + '/api/chat', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message: message, session_id: sessionId }),
         })
         .then(response => response.json())
         .then(data => {
@@ -142,22 +245,27 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Scroll to bottom
             scrollToBottom();
-        })
-        .catch(error => {
-            console.error('Error:', error);
-            loadingMessage.remove();
-            addMessage('Sorry, there was an error processing your request.', 'bot');
         });
     }
     
-    // Add a message to the chat
-    function addMessage(text, sender, sources = []) {
+    // Add an empty bot message that is filled in while a response streams
+    function addStreamingMessage() {
         const messageDiv = document.createElement('div');
-        messageDiv.classList.add('message', sender);
+        messageDiv.classList.add('message', 'bot');
         
         const messageBubble = document.createElement('div');
         messageBubble.classList.add('message-bubble');
         
+        messageDiv.appendChild(messageBubble);
+        chatMessages.appendChild(messageDiv);
+        
+        return messageDiv;
+    }
+    
+    // Render markdown-like text into a message bubble as paragraphs
+    function renderMessageText(messageBubble, text) {
+        messageBubble.innerHTML = '';
+        
         // Parse markdown-like formatting
         let formattedText = text
             .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>')
@@ -173,6 +281,17 @@ document.addEventListener('DOMContentLoaded', function() {
                 messageBubble.appendChild(p);
             }
         });
+    }
+    
+    // Add a message to the chat
+    function addMessage(text, sender, sources = []) {
+        const messageDiv = document.createElement('div');
+        messageDiv.classList.add('message', sender);
+        
+        const messageBubble = document.createElement('div');
+        messageBubble.classList.add('message-bubble');
+        
+        renderMessageText(messageBubble, text);
         
         messageDiv.appendChild(messageBubble);
         
@@ -252,8 +371,17 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
         
-        // Request speech synthesis from server
-        fetch('/api/speak', {
+        // Reset the speak button icon
+        function resetButton() {
+            if (clickedButton) {
+                const icon = clickedButton.querySelector('i');
+                icon.classList.remove('fa-spinner', 'fa-spin');
+                icon.classList.add('fa-volume-up');
+            }
+        }
+        
+        // Request a sentence-by-sentence audio stream so playback starts after the first sentence
+        fetch(apiBase + '/api/speak/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -262,27 +390,38 @@ document.addEventListener('DOMContentLoaded', function() {
         })
         .then(response => response.json())
         .then(data => {
-            if (data.audio_url) {
-                audioPlayer.src = data.audio_url;
-                audioPlayer.play();
-                
-                // Reset button state when audio starts playing
-                if (clickedButton) {
-                    const icon = clickedButton.querySelector('i');
-                    icon.classList.remove('fa-spinner', 'fa-spin');
-                    icon.classList.add('fa-volume-up');
-                }
+            if (!data.stream_url) {
+                throw new Error(data.error || 'Streaming speech unavailable');
             }
+            audioPlayer.src = data.stream_url;
+            return audioPlayer.play();
         })
+        .then(resetButton)
         .catch(error => {
-            console.error('Error:', error);
+            console.error('Streaming speech failed, falling back:', error);
             
-            // Reset button state on error
-            if (clickedButton) {
-                const icon = clickedButton.querySelector('i');
-                icon.classList.remove('fa-spinner', 'fa-spin');
-                icon.classList.add('fa-volume-up');
-            }
+            // Fall back to synthesizing the whole answer at once
+            fetch(apiBase + '/api/speak', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ text: text }),
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.audio_url) {
+                    audioPlayer.src = data.audio_url;
+                    audioPlayer.play();
+                }
+                resetButton();
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                
+                // Reset button state on error
+                resetButton();
+            });
         });
     }
     
@@ -354,7 +493,7 @@ document.addEventListener('DOMContentLoaded', function() {
         resourcesList.innerHTML = '<div class="loading">Loading resources...</div>';
         
         // Fetch resources from server
-        fetch('/api/resources')
+        fetch(apiBase + '/api/resources')
             .then(response => response.json())
             .then(data => {
                 // Clear loading state
@@ -393,7 +532,7 @@ document.addEventListener('DOMContentLoaded', function() {
         notificationsList.innerHTML = '<div class="loading">Loading notifications...</div>';
         
         // Fetch notifications from server
-        fetch('/api/notifications')
+        fetch(apiBase + '/api/notifications')
             .then(response => response.json())
             .then(data => {
                 // Clear loading state
@@ -455,7 +594,7 @@ document.addEventListener('DOMContentLoaded', function() {
             resultContainer.innerHTML = '<div class="loading">Loading information...</div>';
             
             // Fetch data from server
-            fetch(`/api/quick-access/${category}`)
+            fetch(`${apiBase}/api/quick-access/${category}`)
                 .then(response => response.json())
                 .then(data => {
                     // Format and display the result